@@ -1,24 +1,26 @@
 # app.py
 
 import os
+import time
+import click
 from flask import Flask
 from flask_migrate import Migrate
 from flask_restful import Api
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from models import db
 from resources.auth import Register, Login, Me  
-from resources.users import Users, UserById, UserStatus, UserRole
-from resources.events import EventList, EventDetail, MyEvents, PendingEvents, ApproveEvent
+from resources.users import Users, UserById, UserStatus, UserRole, UserImport
+from resources.events import EventList, EventDetail, EventSearch, MyEvents, PendingEvents, ApproveEvent
 from resources.tickets import TicketList, TicketDetail
 from resources.orders import OrderList, OrderDetail
-from resources.payments import STKPush, STKCallback
+from resources.payments import STKPush, STKCallback, PaymentStatus
+from resources.checkin import CheckIn, GateIndex, GateSync
 from resources.reviews import AddReview, EventReviews
-from resources.admin import AdminDashboard, AdminReports, AllUsers
+from resources.admin import AdminDashboard, AdminSales, AdminReports, ReportJobList, ReportJobDetail, ReportJobDownload, AllUsers
 
 from resources.profile import MyProfile, ViewUserProfile
 from resources.organizer_dashboard import OrganizerOverview, OrganizerEventStats
@@ -27,12 +29,27 @@ from resources.logs import AdminLogs
 from resources.organizer_dashboard import (
     OrganizerOverview,
     OrganizerEventStats,
+    OrganizerSales,
     OrganizerEventsByStatus,
     OrganizerEventHistory
 )
 
 from resources.organizer_dashboard import OrganizerEventsByStatus, OrganizerEventHistory
 from resources.attendee_routes import UpcomingAttendeeEvents,PastAttendeeEvents
+from utils.holds import expire_holds
+from utils.cache import response_cache
+from utils.metrics import reconcile_metrics
+from utils.reports import report_jobs, run_queued_reports
+from utils.rollups import rebuild_sales_rollups
+from utils.audit import audit_log
+from utils.passwords import passwords
+from utils.log_archive import archive_logs
+from utils.payments import payment_workers, process_all_callbacks
+from utils.daraja import daraja
+from utils.reconciliation import CHUNK_SIZE, reconcile_statement
+from utils.passes import issue_missing_passes
+from utils.checkin import gate
+from utils.workers import start_workers
 
 
 
@@ -49,13 +66,51 @@ app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///development.db"  # dev only
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["JWT_SECRET_KEY"] = "your_jwt_secret"  # temp secret
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=24)
+app.config["ORDER_HOLD_MINUTES"] = int(os.getenv("ORDER_HOLD_MINUTES", 15))
+app.config["BACKGROUND_WORKERS"] = os.getenv("BACKGROUND_WORKERS", "0") == "1"  # 1 = web processes also run the `flask run-workers` loops
+app.config["HOLD_SWEEP_INTERVAL"] = int(os.getenv("HOLD_SWEEP_INTERVAL", 30))  # seconds, 0 disables
+app.config["RESPONSE_CACHE_URL"] = os.getenv("RESPONSE_CACHE_URL")  # e.g. redis://localhost:6379/0
+# seconds, 0 disables; off by default without Redis, since a per-process cache misses other workers' writes
+app.config["RESPONSE_CACHE_TTL"] = int(os.getenv("RESPONSE_CACHE_TTL", 30 if app.config["RESPONSE_CACHE_URL"] else 0))
+app.config["RESPONSE_CACHE_SIZE"] = int(os.getenv("RESPONSE_CACHE_SIZE", 2048))
+app.config["BCRYPT_LOG_ROUNDS"] = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))  # cost of new password hashes
+app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", 0))  # 0 = one per CPU
+app.config["AUDIT_FLUSH_INTERVAL"] = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))  # seconds, 0 = write synchronously
+app.config["AUDIT_BATCH_SIZE"] = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+app.config["AUDIT_QUEUE_SIZE"] = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+app.config["LOG_ARCHIVE_DIR"] = os.getenv("LOG_ARCHIVE_DIR", os.path.join(app.instance_path, "log-archive"))
+app.config["REPORT_WORKERS"] = int(os.getenv("REPORT_WORKERS", 2))  # report job threads, 0 = only `flask run-reports`
+app.config["REPORT_POLL_INTERVAL"] = int(os.getenv("REPORT_POLL_INTERVAL", 60))  # seconds; `flask run-workers` reruns queued/stuck jobs, 0 disables
+app.config["PAYMENT_WORKERS"] = int(os.getenv("PAYMENT_WORKERS", 2))  # callback inbox threads in `flask run-workers`, 0 = only `flask process-payments`
+app.config["PAYMENT_BATCH_SIZE"] = int(os.getenv("PAYMENT_BATCH_SIZE", 200))
+app.config["PAYMENT_POLL_INTERVAL"] = float(os.getenv("PAYMENT_POLL_INTERVAL", 2.0))  # seconds
+app.config["MPESA_CALLBACK_TOKEN"] = os.getenv("MPESA_CALLBACK_TOKEN")  # required as ?token= on /payments/callback when set
+app.config["MPESA_BASE_URL"] = os.getenv("MPESA_BASE_URL", "https://sandbox.safaricom.co.ke")
+app.config["MPESA_CONSUMER_KEY"] = os.getenv("MPESA_CONSUMER_KEY")  # unset = STK push stays mocked
+app.config["MPESA_CONSUMER_SECRET"] = os.getenv("MPESA_CONSUMER_SECRET")
+app.config["MPESA_SHORTCODE"] = os.getenv("MPESA_SHORTCODE")
+app.config["MPESA_PASSKEY"] = os.getenv("MPESA_PASSKEY")
+app.config["MPESA_CALLBACK_URL"] = os.getenv("MPESA_CALLBACK_URL")  # public URL of /payments/callback
+app.config["MPESA_TIMEOUT"] = float(os.getenv("MPESA_TIMEOUT", 10))  # seconds per gateway call
+app.config["MPESA_PUSH_WORKERS"] = int(os.getenv("MPESA_PUSH_WORKERS", 8))  # concurrent pushes, 0 = inside the request
+app.config["MPESA_MAX_PENDING"] = int(os.getenv("MPESA_MAX_PENDING", 64))  # queued pushes before 503
+app.config["PASS_CODE_SECRET"] = os.getenv("PASS_CODE_SECRET", "your_pass_code_secret")  # temp secret; keys EventPass codes, never change it once passes exist
+app.config["CHECKIN_MAX_EVENTS"] = int(os.getenv("CHECKIN_MAX_EVENTS", 32))  # pass indexes kept in memory
 
 # Extensions
 db.init_app(app)
-bcrypt = Bcrypt(app)
+passwords.init_app(app)
 jwt = JWTManager(app)
 migrate = Migrate(app, db)
-CORS(app)
+response_cache.init_app(app)
+report_jobs.init_app(app)
+audit_log.init_app(app)
+payment_workers.init_app(app)
+daraja.init_app(app)
+gate.init_app(app)
+# Browsers hide response headers from cross-origin scripts unless exposed:
+# X-Next-Cursor pages /events, /admin/reports and /admin/logs.
+CORS(app, expose_headers=["X-Next-Cursor", "ETag", "Location", "Retry-After"])
 api = Api(app)
 
 # Health Check
@@ -63,6 +118,92 @@ api = Api(app)
 def home():
     return {"message": "Event Ticketing Backend running"}
 
+# Background loops start with the first request, never at import
+@app.before_request
+def start_background_workers():
+    if app.config["BACKGROUND_WORKERS"]:
+        start_workers(app)
+
+@app.cli.command("run-workers")
+def run_workers_command():
+    """Run the background loops (hold sweeper, payment workers, report poller) in this process until interrupted."""
+    threads = start_workers(app)
+    print(f"Running {len(threads)} background workers, Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command("expire-holds")
+def expire_holds_command():
+    """Expire overdue order holds once (for cron instead of the sweeper thread)."""
+    print(f"Expired {expire_holds()} order holds")
+
+@app.cli.command("reconcile-metrics")
+def reconcile_metrics_command():
+    """Recompute the admin dashboard counters from scratch and fix any drift."""
+    drift = reconcile_metrics()
+    db.session.commit()
+    print(f"Corrected {drift}" if drift else "No drift")
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the hourly and daily sales buckets from paid orders."""
+    orders = rebuild_sales_rollups()
+    db.session.commit()
+    print(f"Rebuilt sales rollups from {orders} paid orders")
+
+@app.cli.command("archive-logs")
+@click.option("--days", default=90, show_default=True, help="Keep this many days of logs in the table.")
+def archive_logs_command(days):
+    """Move older audit log rows into a compressed file under LOG_ARCHIVE_DIR."""
+    before = datetime.now() - timedelta(days=days)
+    path, count = archive_logs(before, app.config["LOG_ARCHIVE_DIR"])
+    print(f"Archived {count} log rows to {path}" if count else "No log rows to archive")
+
+@app.cli.command("run-reports")
+def run_reports_command():
+    """Run queued and stuck report jobs in this process (after a restart, or with REPORT_WORKERS=0)."""
+    print(f"Ran {run_queued_reports()} report jobs")
+
+@app.cli.command("process-payments")
+def process_payments_command():
+    """Settle every M-Pesa callback waiting in the inbox (or run with PAYMENT_WORKERS=0)."""
+    print(f"Processed {process_all_callbacks()} payment callbacks")
+
+@app.cli.command("issue-passes")
+def issue_passes_command():
+    """Issue EventPasses for paid orders that have none (orders paid before passes were issued)."""
+    print(f"Issued {issue_missing_passes()} event passes")
+
+@app.cli.command("reconcile-payments")
+@click.argument("statement", type=click.Path(exists=True, dir_okay=False))
+@click.option("--report", type=click.Path(dir_okay=False), help="Write every issue found to this CSV.")
+@click.option("--chunk-size", default=CHUNK_SIZE, show_default=True, help="Statement rows per query and commit.")
+@click.option("--dry-run", is_flag=True, help="Match and report, but change nothing.")
+def reconcile_payments_command(statement, report, chunk_size, dry_run):
+    """Match orders against an M-Pesa statement CSV and settle payments whose callback was lost."""
+    import resource
+
+    report_file = open(report, "w", newline="", encoding="utf-8") if report else None
+    try:
+        with open(statement, newline="", encoding="utf-8-sig") as lines:
+            summary = reconcile_statement(lines, report_file, chunk_size, dry_run)
+    finally:
+        if report_file:
+            report_file.close()
+    if not dry_run:
+        audit_log.record("Reconciled payments", statement=os.path.basename(statement),
+                         rows=summary["rows"], recovered=summary["recovered"], issues=summary["issues"])
+
+    print(f"{summary['rows']} statement rows in {summary['seconds']}s ({summary['rows_per_second']} rows/s), "
+          f"peak memory {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
+    print(f"Matched {summary['matched']}, recovered {summary['recovered']} lost payments"
+          + (" (dry run, nothing saved)" if dry_run else ""))
+    for kind, count in summary["issues"].items():
+        print(f"  {kind}: {count}")
+
 # JWT error handler
 @jwt.unauthorized_loader
 def missing_token(error):
@@ -89,6 +230,7 @@ api.add_resource(UserRole, "/users/<int:id>/role")
 # event routes
 
 api.add_resource(EventList, "/events")
+api.add_resource(EventSearch, "/events/search")
 api.add_resource(EventDetail, "/events/<int:id>")
 api.add_resource(MyEvents, "/organizer/events")
 api.add_resource(PendingEvents, "/admin/events/pending")
@@ -100,6 +242,10 @@ api.add_resource(OrderList, "/orders")
 api.add_resource(OrderDetail, "/orders/<int:id>")
 api.add_resource(STKPush, "/payments/stk-push")
 api.add_resource(STKCallback, "/payments/callback")
+api.add_resource(PaymentStatus, "/payments/<string:order_id>")
+api.add_resource(CheckIn, "/events/<int:event_id>/checkin")
+api.add_resource(GateIndex, "/events/<int:event_id>/gate")
+api.add_resource(GateSync, "/events/<int:event_id>/gate/sync")
 
 
 api.add_resource(AddReview, "/events/<int:event_id>/review")
@@ -107,8 +253,13 @@ api.add_resource(EventReviews, "/events/<int:event_id>/reviews")
 
 
 api.add_resource(AdminDashboard, "/admin/dashboard")
+api.add_resource(AdminSales, "/admin/dashboard/sales")
 api.add_resource(AdminReports, "/admin/reports")
+api.add_resource(ReportJobList, "/admin/reports/jobs")
+api.add_resource(ReportJobDetail, "/admin/reports/jobs/<int:id>")
+api.add_resource(ReportJobDownload, "/admin/reports/jobs/<int:id>/download")
 api.add_resource(AllUsers, "/admin/users")
+api.add_resource(UserImport, "/admin/users/import")
 
 
 
@@ -122,6 +273,7 @@ api.add_resource(ViewUserProfile, "/users/<int:id>")
 
 api.add_resource(OrganizerOverview, "/organizer/overview")
 api.add_resource(OrganizerEventStats, "/organizer/stats")
+api.add_resource(OrganizerSales, "/organizer/stats/sales")
 api.add_resource(OrganizerEventsByStatus, "/organizer/events/<string:status>")
 api.add_resource(OrganizerEventHistory, "/organizer/events/history")
 
@@ -0,0 +1,33 @@
+"""Add ticket_shards for sharded ticket counters
+
+Revision ID: 14a211128a36
+Revises: ccd0f25735e2
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '14a211128a36'
+down_revision = 'ccd0f25735e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_shards',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('shard_no', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('sold', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ticket_id'], ['tickets.id'], name=op.f('fk_ticket_shards_ticket_id_tickets'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_ticket_shards')),
+    sa.UniqueConstraint('ticket_id', 'shard_no', name=op.f('uq_ticket_shards_ticket_id'))
+    )
+
+
+def downgrade():
+    op.drop_table('ticket_shards')
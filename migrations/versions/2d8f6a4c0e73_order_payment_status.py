@@ -0,0 +1,32 @@
+"""Pollable STK push status on orders
+
+Revision ID: 2d8f6a4c0e73
+Revises: 7e3a9c5b1d24
+Create Date: 2026-10-18 22:14:05.331870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d8f6a4c0e73'
+down_revision = '7e3a9c5b1d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('payment_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('payment_error', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('payment_requested_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE orders SET payment_status = 'paid' WHERE status = 'paid'")
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('payment_requested_at')
+        batch_op.drop_column('payment_error')
+        batch_op.drop_column('payment_status')
@@ -0,0 +1,72 @@
+"""Composite index pack for hot filter paths
+
+Revision ID: 3b8d0f6a2c71
+Revises: a7c3e9d41b06
+Create Date: 2026-10-18 11:20:45.630914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8d0f6a2c71'
+down_revision = 'a7c3e9d41b06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index('ix_events_is_approved_start_time', ['is_approved', 'start_time'], unique=False)
+        batch_op.create_index('ix_events_organizer_id_start_time', ['organizer_id', 'start_time'], unique=False)
+        batch_op.create_index('ix_events_organizer_id_status', ['organizer_id', 'status'], unique=False)
+        batch_op.create_index('ix_events_status', ['status'], unique=False)
+        batch_op.create_index('ix_events_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tickets_event_id'), ['event_id'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_attendee_id_created_at', ['attendee_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_orders_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_items_ticket_id'), ['ticket_id'], unique=False)
+
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.create_index('ix_reviews_event_id_attendee_id', ['event_id', 'attendee_id'], unique=False)
+
+    with op.batch_alter_table('logs', schema=None) as batch_op:
+        batch_op.create_index('ix_logs_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_logs_created_at')
+
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_reviews_event_id_attendee_id')
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_items_ticket_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_created_at')
+        batch_op.drop_index('ix_orders_attendee_id_created_at')
+
+    with op.batch_alter_table('tickets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tickets_event_id'))
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index('ix_events_created_at')
+        batch_op.drop_index('ix_events_status')
+        batch_op.drop_index('ix_events_organizer_id_status')
+        batch_op.drop_index('ix_events_organizer_id_start_time')
+        batch_op.drop_index('ix_events_is_approved_start_time')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_created_at')
@@ -0,0 +1,101 @@
+"""Hourly and daily sales rollups
+
+Revision ID: 3e7a1c9d5f62
+Revises: 8b4f2d6e9a17
+Create Date: 2026-10-18 18:02:33.740215
+
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e7a1c9d5f62'
+down_revision = '8b4f2d6e9a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(length=10), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('tickets', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], name=op.f('fk_sales_rollups_event_id_events'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['ticket_id'], ['tickets.id'], name=op.f('fk_sales_rollups_ticket_id_tickets'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_sales_rollups')),
+    sa.UniqueConstraint('granularity', 'ticket_id', 'bucket', name=op.f('uq_sales_rollups_granularity'))
+    )
+    with op.batch_alter_table('sales_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_rollups_event_id', ['event_id', 'granularity', 'bucket'], unique=False)
+
+    op.create_table('platform_sales_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(length=10), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('tickets', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_platform_sales_rollups')),
+    sa.UniqueConstraint('granularity', 'bucket', 'shard', name=op.f('uq_platform_sales_rollups_granularity'))
+    )
+
+    # Backfill from paid orders (same as utils/rollups.rebuild_sales_rollups).
+    # Bucketing is done here rather than in SQL, which has no portable
+    # date_trunc.
+    bind = op.get_bind()
+    lines = bind.execute(sa.text(
+        "SELECT o.id, o.created_at AS created_at, oi.ticket_id, t.event_id, sum(oi.quantity), sum(oi.quantity * t.price) "
+        "FROM orders o JOIN order_items oi ON oi.order_id = o.id JOIN tickets t ON t.id = oi.ticket_id "
+        "WHERE o.status = 'paid' "
+        "GROUP BY o.id, o.created_at, oi.ticket_id, t.event_id ORDER BY o.id"
+    ).columns(created_at=sa.DateTime))
+    tickets = defaultdict(lambda: [0, 0, 0])
+    platform = defaultdict(lambda: [0, 0, 0])
+    event_of = {}
+    last_order = None
+    for order_id, created_at, ticket_id, event_id, quantity, revenue in lines:
+        hour = created_at.replace(minute=0, second=0, microsecond=0)
+        new_order = order_id != last_order
+        last_order = order_id
+        event_of[ticket_id] = event_id
+        for granularity, bucket in (('hour', hour), ('day', hour.replace(hour=0))):
+            for totals in (tickets[granularity, ticket_id, bucket], platform[granularity, bucket]):
+                totals[1] += quantity
+                totals[2] += revenue
+            tickets[granularity, ticket_id, bucket][0] += 1
+            platform[granularity, bucket][0] += new_order
+
+    sales_rollups = sa.table('sales_rollups',
+        sa.column('granularity', sa.String), sa.column('bucket', sa.DateTime), sa.column('orders', sa.Integer),
+        sa.column('tickets', sa.Integer), sa.column('revenue', sa.Float),
+        sa.column('event_id', sa.Integer), sa.column('ticket_id', sa.Integer))
+    platform_sales_rollups = sa.table('platform_sales_rollups',
+        sa.column('granularity', sa.String), sa.column('bucket', sa.DateTime), sa.column('shard', sa.Integer),
+        sa.column('orders', sa.Integer), sa.column('tickets', sa.Integer), sa.column('revenue', sa.Float))
+    if tickets:
+        op.bulk_insert(sales_rollups, [
+            {'granularity': g, 'ticket_id': t, 'event_id': event_of[t], 'bucket': b,
+             'orders': o, 'tickets': q, 'revenue': r}
+            for (g, t, b), (o, q, r) in tickets.items()
+        ])
+    if platform:
+        op.bulk_insert(platform_sales_rollups, [
+            {'granularity': g, 'bucket': b, 'shard': 0, 'orders': o, 'tickets': q, 'revenue': r}
+            for (g, b), (o, q, r) in platform.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('platform_sales_rollups')
+    with op.batch_alter_table('sales_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_rollups_event_id')
+    op.drop_table('sales_rollups')
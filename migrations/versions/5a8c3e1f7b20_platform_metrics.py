@@ -0,0 +1,44 @@
+"""Sharded platform counters for the admin dashboard
+
+Revision ID: 5a8c3e1f7b20
+Revises: 9d2e7b5a1c48
+Create Date: 2026-10-18 16:04:51.218877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a8c3e1f7b20'
+down_revision = '9d2e7b5a1c48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('platform_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_platform_metrics')),
+    sa.UniqueConstraint('name', 'shard', name=op.f('uq_platform_metrics_name'))
+    )
+
+    # Backfill shard 0 with the current totals (same as utils/metrics.actual_metrics).
+    op.execute(
+        "INSERT INTO platform_metrics (name, shard, value) "
+        "SELECT 'users', 0, count(*) FROM users "
+        "UNION ALL SELECT 'revenue', 0, coalesce(sum(total_amount), 0) FROM orders WHERE status = 'paid' "
+        "UNION ALL SELECT 'ticket_sales', 0,"
+        " coalesce((SELECT sum(sold) FROM tickets WHERE id NOT IN (SELECT ticket_id FROM ticket_shards)), 0)"
+        " + coalesce((SELECT sum(sold) FROM ticket_shards), 0) "
+        "UNION ALL SELECT 'events_pending', 0, count(*) FROM events WHERE status = 'pending' "
+        "UNION ALL SELECT 'events_active', 0, count(*) FROM events WHERE status = 'active' "
+        "UNION ALL SELECT 'events_rejected', 0, count(*) FROM events WHERE status = 'rejected'"
+    )
+
+
+def downgrade():
+    op.drop_table('platform_metrics')
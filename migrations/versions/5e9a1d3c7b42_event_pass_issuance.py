@@ -0,0 +1,43 @@
+"""Event passes issued on payment
+
+Revision ID: 5e9a1d3c7b42
+Revises: 9b4e2f7a6c18
+Create Date: 2026-10-19 10:52:37.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9a1d3c7b42'
+down_revision = '9b4e2f7a6c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # event_passes was only ever created by db.create_all(), so databases
+    # built from migrations alone do not have it yet.
+    if not sa.inspect(op.get_bind()).has_table('event_passes'):
+        op.create_table('event_passes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ticket_code', sa.String(length=50), nullable=False),
+        sa.Column('attendee_first_name', sa.String(length=100), nullable=False),
+        sa.Column('attendee_last_name', sa.String(length=100), nullable=False),
+        sa.Column('attendee_email', sa.String(length=150), nullable=False),
+        sa.Column('attendee_phone', sa.String(length=20), nullable=False),
+        sa.Column('att_status', sa.Boolean(), nullable=True),
+        sa.Column('order_item_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['order_item_id'], ['order_items.id'], name=op.f('fk_event_passes_order_item_id_order_items')),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_event_passes')),
+        sa.UniqueConstraint('ticket_code', name=op.f('uq_event_passes_ticket_code'))
+        )
+
+    with op.batch_alter_table('event_passes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_event_passes_order_item_id'), ['order_item_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('event_passes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_event_passes_order_item_id'))
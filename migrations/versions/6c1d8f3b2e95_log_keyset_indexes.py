@@ -0,0 +1,32 @@
+"""Keyset indexes for the audit log viewer
+
+Revision ID: 6c1d8f3b2e95
+Revises: 3e7a1c9d5f62
+Create Date: 2026-10-18 19:10:52.604718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1d8f3b2e95'
+down_revision = '3e7a1c9d5f62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_logs_created_at')
+        batch_op.create_index('ix_logs_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_logs_user_id_created_at_id', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_logs_action_created_at_id', ['action', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_logs_action_created_at_id')
+        batch_op.drop_index('ix_logs_user_id_created_at_id')
+        batch_op.drop_index('ix_logs_created_at_id')
+        batch_op.create_index('ix_logs_created_at', ['created_at'], unique=False)
@@ -0,0 +1,64 @@
+"""Payment callback inbox and unique M-Pesa receipts
+
+Revision ID: 7e3a9c5b1d24
+Revises: 6c1d8f3b2e95
+Create Date: 2026-10-18 21:02:37.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3a9c5b1d24'
+down_revision = '6c1d8f3b2e95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_callbacks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('checkout_request_id', sa.String(length=100), nullable=True),
+    sa.Column('mpesa_receipt', sa.String(length=50), nullable=True),
+    sa.Column('result_code', sa.Integer(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.Column('outcome', sa.String(length=30), nullable=True),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], name=op.f('fk_payment_callbacks_order_id_orders'), ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_payment_callbacks'))
+    )
+    with op.batch_alter_table('payment_callbacks', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_callbacks_status_id', ['status', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_payment_callbacks_checkout_request_id'), ['checkout_request_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_payment_callbacks_mpesa_receipt'), ['mpesa_receipt'], unique=False)
+
+    # Seeded orders got random receipts, so a few may repeat; keep the first
+    # and suffix the rest before the receipt becomes unique.
+    op.execute(
+        "UPDATE orders SET mpesa_receipt = mpesa_receipt || '-DUP' || id "
+        "WHERE mpesa_receipt IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM orders WHERE mpesa_receipt IS NOT NULL GROUP BY mpesa_receipt)"
+    )
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('checkout_request_id', sa.String(length=100), nullable=True))
+        batch_op.create_unique_constraint(batch_op.f('uq_orders_mpesa_receipt'), ['mpesa_receipt'])
+        batch_op.create_unique_constraint(batch_op.f('uq_orders_checkout_request_id'), ['checkout_request_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('uq_orders_checkout_request_id'), type_='unique')
+        batch_op.drop_constraint(batch_op.f('uq_orders_mpesa_receipt'), type_='unique')
+        batch_op.drop_column('checkout_request_id')
+
+    with op.batch_alter_table('payment_callbacks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payment_callbacks_mpesa_receipt'))
+        batch_op.drop_index(batch_op.f('ix_payment_callbacks_checkout_request_id'))
+        batch_op.drop_index('ix_payment_callbacks_status_id')
+
+    op.drop_table('payment_callbacks')
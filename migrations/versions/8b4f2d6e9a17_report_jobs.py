@@ -0,0 +1,41 @@
+"""Report jobs: status, params and output format on reports
+
+Revision ID: 8b4f2d6e9a17
+Revises: 5a8c3e1f7b20
+Create Date: 2026-10-18 17:21:40.530912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4f2d6e9a17'
+down_revision = '5a8c3e1f7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('kind', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('params', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('format', sa.String(length=10), nullable=True))
+        # Existing rows are finished plain-text reports.
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='done'))
+        batch_op.add_column(sa.Column('row_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('error', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('completed_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_reports_admin_id_generated_at', ['admin_id', 'generated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index('ix_reports_admin_id_generated_at')
+        batch_op.drop_column('completed_at')
+        batch_op.drop_column('error')
+        batch_op.drop_column('row_count')
+        batch_op.drop_column('status')
+        batch_op.drop_column('format')
+        batch_op.drop_column('params')
+        batch_op.drop_column('kind')
@@ -0,0 +1,26 @@
+"""Reconciliation stamp on orders
+
+Revision ID: 9b4e2f7a6c18
+Revises: 2d8f6a4c0e73
+Create Date: 2026-10-18 23:40:12.518304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e2f7a6c18'
+down_revision = '2d8f6a4c0e73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reconciled_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('reconciled_at')
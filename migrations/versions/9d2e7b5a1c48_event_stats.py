@@ -0,0 +1,47 @@
+"""Per-event dashboard aggregates
+
+Revision ID: 9d2e7b5a1c48
+Revises: e2f4b6c8a913
+Create Date: 2026-10-18 15:12:08.331650
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2e7b5a1c48'
+down_revision = 'e2f4b6c8a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_stats',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('review_sum', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], name=op.f('fk_event_stats_event_id_events'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', name=op.f('pk_event_stats'))
+    )
+
+    # Backfill from paid orders and reviews (same as utils/event_stats.rebuild_event_stats).
+    op.execute(
+        "INSERT INTO event_stats (event_id, tickets_sold, revenue, review_count, review_sum) "
+        "SELECT e.id, "
+        " coalesce((SELECT sum(oi.quantity) FROM order_items oi"
+        "  JOIN tickets t ON t.id = oi.ticket_id JOIN orders o ON o.id = oi.order_id"
+        "  WHERE t.event_id = e.id AND o.status = 'paid'), 0), "
+        " coalesce((SELECT sum(oi.quantity * t.price) FROM order_items oi"
+        "  JOIN tickets t ON t.id = oi.ticket_id JOIN orders o ON o.id = oi.order_id"
+        "  WHERE t.event_id = e.id AND o.status = 'paid'), 0), "
+        " (SELECT count(*) FROM reviews r WHERE r.event_id = e.id), "
+        " coalesce((SELECT sum(r.rating) FROM reviews r WHERE r.event_id = e.id), 0) "
+        "FROM events e"
+    )
+
+
+def downgrade():
+    op.drop_table('event_stats')
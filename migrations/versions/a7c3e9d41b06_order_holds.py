@@ -0,0 +1,56 @@
+"""Order holds: expires_at and sweeper indexes
+
+Revision ID: a7c3e9d41b06
+Revises: 14a211128a36
+Create Date: 2026-10-18 10:02:17.118342
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d41b06'
+down_revision = '14a211128a36'
+branch_labels = None
+depends_on = None
+
+HOLD_MINUTES = 15  # utils.holds.HOLD_MINUTES when this migration was written
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_orders_status_expires_at', ['status', 'expires_at'], unique=False)
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_items_order_id'), ['order_id'], unique=False)
+
+    # Orders left pending before holds existed get the hold they would have
+    # had. Computed here rather than in SQL: created_at is naive local time
+    # (datetime.now), the clock the sweeper compares against, while SQLite's
+    # CURRENT_TIMESTAMP is UTC.
+    orders = sa.table('orders', sa.column('id', sa.Integer), sa.column('status', sa.String),
+                      sa.column('created_at', sa.DateTime), sa.column('expires_at', sa.DateTime))
+    conn = op.get_bind()
+    now = datetime.now()
+    pending = conn.execute(
+        sa.select(orders.c.id, orders.c.created_at).where(orders.c.status == 'pending')
+    ).all()
+    if pending:
+        conn.execute(
+            orders.update().where(orders.c.id == sa.bindparam('order_id')),
+            [{'order_id': order_id, 'expires_at': (created_at or now) + timedelta(minutes=HOLD_MINUTES)}
+             for order_id, created_at in pending],
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_items_order_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_status_expires_at')
+        batch_op.drop_column('expires_at')
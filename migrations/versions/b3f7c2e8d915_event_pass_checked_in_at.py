@@ -0,0 +1,26 @@
+"""Gate check-in time on event passes
+
+Revision ID: b3f7c2e8d915
+Revises: 5e9a1d3c7b42
+Create Date: 2026-10-19 15:26:48.911730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f7c2e8d915'
+down_revision = '5e9a1d3c7b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event_passes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('checked_in_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('event_passes', schema=None) as batch_op:
+        batch_op.drop_column('checked_in_at')
@@ -0,0 +1,52 @@
+"""Full-text search index over approved events
+
+Revision ID: c5e17a90d3f4
+Revises: 3b8d0f6a2c71
+Create Date: 2026-10-18 12:41:08.257019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e17a90d3f4'
+down_revision = '3b8d0f6a2c71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Kept in step with utils/search.py, which maintains these incrementally.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TABLE event_search ("
+            " event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,"
+            " document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX ix_event_search_document ON event_search USING GIN (document)")
+        op.execute(
+            "INSERT INTO event_search (event_id, document) SELECT id, "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', replace(coalesce(tags, ''), ',', ' ')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(location, '')), 'C') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'D') "
+            "FROM events WHERE is_approved"
+        )
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE events_fts USING fts5("
+            "title, description, tags, location, tokenize='porter unicode61')"
+        )
+        op.execute(
+            "INSERT INTO events_fts (rowid, title, description, tags, location) "
+            "SELECT id, title, description, replace(coalesce(tags, ''), ',', ' '), location "
+            "FROM events WHERE is_approved = 1"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TABLE event_search")
+    else:
+        op.execute("DROP TABLE events_fts")
@@ -0,0 +1,26 @@
+"""Report jobs: claimed_at, so stuck jobs can be claimed again
+
+Revision ID: d8a4f1c6b305
+Revises: b3f7c2e8d915
+Create Date: 2026-10-19 18:04:12.550217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a4f1c6b305'
+down_revision = 'b3f7c2e8d915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
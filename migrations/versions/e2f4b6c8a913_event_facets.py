@@ -0,0 +1,76 @@
+"""Normalized event facets and precomputed facet counts
+
+Revision ID: e2f4b6c8a913
+Revises: c5e17a90d3f4
+Create Date: 2026-10-18 13:55:42.904127
+
+"""
+from collections import Counter
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f4b6c8a913'
+down_revision = 'c5e17a90d3f4'
+branch_labels = None
+depends_on = None
+
+
+def _normalize(value):
+    return " ".join((value or "").split()).lower()
+
+
+def upgrade():
+    event_facets = op.create_table('event_facets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('facet', sa.String(length=20), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], name=op.f('fk_event_facets_event_id_events'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_event_facets'))
+    )
+    with op.batch_alter_table('event_facets', schema=None) as batch_op:
+        batch_op.create_index('ix_event_facets_facet_value_event_id', ['facet', 'value', 'event_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_event_facets_event_id'), ['event_id'], unique=False)
+
+    facet_counts = op.create_table('facet_counts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('facet', sa.String(length=20), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_facet_counts')),
+    sa.UniqueConstraint('facet', 'value', name=op.f('uq_facet_counts_facet'))
+    )
+    with op.batch_alter_table('facet_counts', schema=None) as batch_op:
+        batch_op.create_index('ix_facet_counts_facet_count', ['facet', 'count'], unique=False)
+
+    # Backfill from approved events (same rules as utils/facets.facet_values).
+    events = sa.table('events',
+        sa.column('id', sa.Integer), sa.column('category', sa.String),
+        sa.column('location', sa.String), sa.column('tags', sa.String),
+        sa.column('is_approved', sa.Boolean))
+    rows, counts = [], Counter()
+    for event in op.get_bind().execute(sa.select(events).where(events.c.is_approved == sa.true())):
+        values = {("category", _normalize(event.category)), ("location", _normalize(event.location))}
+        values |= {("tag", _normalize(t)) for t in (event.tags or "").split(",")}
+        for facet, value in values:
+            if value:
+                rows.append({"event_id": event.id, "facet": facet, "value": value})
+                counts[(facet, value)] += 1
+    if rows:
+        op.bulk_insert(event_facets, rows)
+        op.bulk_insert(facet_counts, [{"facet": f, "value": v, "count": n} for (f, v), n in counts.items()])
+
+
+def downgrade():
+    with op.batch_alter_table('facet_counts', schema=None) as batch_op:
+        batch_op.drop_index('ix_facet_counts_facet_count')
+
+    op.drop_table('facet_counts')
+    with op.batch_alter_table('event_facets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_event_facets_event_id'))
+        batch_op.drop_index('ix_event_facets_facet_value_event_id')
+
+    op.drop_table('event_facets')
@@ -0,0 +1,39 @@
+"""Per-ticket-type dashboard aggregates
+
+Revision ID: f1c3a7d9e264
+Revises: d8a4f1c6b305
+Create Date: 2026-10-20 10:41:27.903118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c3a7d9e264'
+down_revision = 'd8a4f1c6b305'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_stats',
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['ticket_id'], ['tickets.id'], name=op.f('fk_ticket_stats_ticket_id_tickets'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ticket_id', name=op.f('pk_ticket_stats'))
+    )
+
+    # Backfill from paid orders (same as utils/event_stats.rebuild_event_stats).
+    op.execute(
+        "INSERT INTO ticket_stats (ticket_id, tickets_sold, revenue) "
+        "SELECT oi.ticket_id, sum(oi.quantity), "
+        " sum(o.total_amount * oi.quantity / (SELECT sum(q.quantity) FROM order_items q WHERE q.order_id = o.id)) "
+        "FROM order_items oi JOIN orders o ON o.id = oi.order_id JOIN tickets t ON t.id = oi.ticket_id "
+        "WHERE o.status = 'paid' GROUP BY oi.ticket_id"
+    )
+
+
+def downgrade():
+    op.drop_table('ticket_stats')
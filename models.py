@@ -24,15 +24,20 @@ class EventPass(db.Model, SerializerMixin):
     __tablename__ = "event_passes"
     serialize_rules = ("-order_item.event_passes",)
 
+    # Issued by utils/passes.py when the order is paid; ticket_code is
+    # derived from (order_item_id, seat), see there.
+
     id = db.Column(db.Integer, primary_key=True)
     ticket_code = db.Column(db.String(50), unique=True, nullable=False)
     attendee_first_name = db.Column(db.String(100), nullable=False)
     attendee_last_name = db.Column(db.String(100), nullable=False)
     attendee_email = db.Column(db.String(150), nullable=False)
     attendee_phone = db.Column(db.String(20), nullable=False)
+    # Checked in at the gate (utils/checkin.py); single use.
     att_status = db.Column(db.Boolean, default=False)
+    checked_in_at = db.Column(db.DateTime)
 
-    order_item_id = db.Column(db.Integer, db.ForeignKey("order_items.id"), nullable=False)
+    order_item_id = db.Column(db.Integer, db.ForeignKey("order_items.id"), nullable=False, index=True)
     order_item = db.relationship("OrderItem", back_populates="event_passes")
 
 # ------------------ User ------------------
@@ -47,6 +52,7 @@ class User(db.Model, SerializerMixin):
         "-logs.user",
         "-reports.admin"
     )
+    __table_args__ = (db.Index("ix_users_created_at", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
@@ -70,22 +76,35 @@ class User(db.Model, SerializerMixin):
 
     @validates("email")
     def validate_email(self, key, value):
-        normalized = value.strip().lower()
-        reg = r"[A-Za-z][A-Za-z0-9]*(\.[A-Za-z0-9]+)*@[A-Za-z0-9]+\.[a-z]{2,}"
-        if not re.match(reg, normalized):
-            raise ValueError("Invalid email format")
-        return normalized
+        return normalize_email(value)
+
+
+# Also used by bulk imports, which insert without going through the model.
+def normalize_email(value):
+    normalized = value.strip().lower()
+    reg = r"[A-Za-z][A-Za-z0-9]*(\.[A-Za-z0-9]+)*@[A-Za-z0-9]+\.[a-z]{2,}"
+    if not re.match(reg, normalized):
+        raise ValueError("Invalid email format")
+    return normalized
 
 # ------------------ Event ------------------
 class Event(db.Model, SerializerMixin):
     __tablename__ = "events"
     serialize_rules = (
         "-organizer.events",
+        "-organizer.orders",
         "-tickets.event",
         "-reviews.event",
         "-saved_events.event",
         "-reports.event"
     )
+    __table_args__ = (
+        db.Index("ix_events_is_approved_start_time", "is_approved", "start_time"),
+        db.Index("ix_events_organizer_id_start_time", "organizer_id", "start_time"),
+        db.Index("ix_events_organizer_id_status", "organizer_id", "status"),
+        db.Index("ix_events_status", "status"),
+        db.Index("ix_events_created_at", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String, nullable=False)
@@ -108,10 +127,97 @@ class Event(db.Model, SerializerMixin):
     saved_events = db.relationship("SavedEvent", back_populates="event", cascade="all, delete")
     reports = db.relationship("Report", back_populates="event")
 
+# ------------------ EventFacet ------------------
+class EventFacet(db.Model, SerializerMixin):
+    __tablename__ = "event_facets"
+    __table_args__ = (
+        db.Index("ix_event_facets_facet_value_event_id", "facet", "value", "event_id", unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    facet = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String, nullable=False)
+
+    event_id = db.Column(db.Integer, db.ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
+
+# ------------------ FacetCount ------------------
+class FacetCount(db.Model, SerializerMixin):
+    __tablename__ = "facet_counts"
+    __table_args__ = (
+        db.UniqueConstraint("facet", "value"),
+        db.Index("ix_facet_counts_facet_count", "facet", "count"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    facet = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# ------------------ EventStats ------------------
+class EventStats(db.Model, SerializerMixin):
+    __tablename__ = "event_stats"
+
+    event_id = db.Column(db.Integer, db.ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    tickets_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    review_sum = db.Column(db.Integer, nullable=False, default=0)
+
+# ------------------ TicketStats ------------------
+class TicketStats(db.Model, SerializerMixin):
+    __tablename__ = "ticket_stats"
+
+    ticket_id = db.Column(db.Integer, db.ForeignKey("tickets.id", ondelete="CASCADE"), primary_key=True)
+    tickets_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+# ------------------ PlatformMetric ------------------
+class PlatformMetric(db.Model, SerializerMixin):
+    __tablename__ = "platform_metrics"
+    __table_args__ = (db.UniqueConstraint("name", "shard"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    shard = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+# ------------------ Sales rollups ------------------
+# Hourly and daily buckets of paid sales (utils/rollups.py). `bucket` is the
+# start of the hour or day the order was placed in.
+class SalesRollup(db.Model, SerializerMixin):
+    __tablename__ = "sales_rollups"
+    __table_args__ = (
+        db.UniqueConstraint("granularity", "ticket_id", "bucket"),
+        db.Index("ix_sales_rollups_event_id", "event_id", "granularity", "bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    tickets = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    event_id = db.Column(db.Integer, db.ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey("tickets.id", ondelete="CASCADE"), nullable=False)
+
+class PlatformSalesRollup(db.Model, SerializerMixin):
+    __tablename__ = "platform_sales_rollups"
+    __table_args__ = (db.UniqueConstraint("granularity", "bucket", "shard"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)
+    shard = db.Column(db.Integer, nullable=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    tickets = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
 # ------------------ Ticket ------------------
 class Ticket(db.Model, SerializerMixin):
     __tablename__ = "tickets"
-    serialize_rules = ("-event.tickets", "-order_items.ticket")
+    # Never serialize order_items: they lead to buyers and their pass codes.
+    serialize_rules = ("-event.tickets", "-order_items")
 
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String, nullable=False)
@@ -120,26 +226,74 @@ class Ticket(db.Model, SerializerMixin):
     sold = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
-    event_id = db.Column(db.Integer, db.ForeignKey("events.id"))
+    event_id = db.Column(db.Integer, db.ForeignKey("events.id"), index=True)
     event = db.relationship("Event", back_populates="tickets")
     order_items = db.relationship("OrderItem", back_populates="ticket")
 
+# ------------------ TicketShard ------------------
+class TicketShard(db.Model, SerializerMixin):
+    __tablename__ = "ticket_shards"
+    __table_args__ = (db.UniqueConstraint("ticket_id", "shard_no"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    shard_no = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    sold = db.Column(db.Integer, nullable=False, default=0)
+
+    ticket_id = db.Column(db.Integer, db.ForeignKey("tickets.id", ondelete="CASCADE"), nullable=False)
+
 # ------------------ Order ------------------
 class Order(db.Model, SerializerMixin):
     __tablename__ = "orders"
     serialize_rules = ("-attendee.orders", "-order_items.order")
+    __table_args__ = (
+        db.Index("ix_orders_status_expires_at", "status", "expires_at"),
+        db.Index("ix_orders_attendee_id_created_at", "attendee_id", "created_at"),
+        db.Index("ix_orders_created_at", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.String, nullable=False, unique=True)
     status = db.Column(db.String, default="pending")
-    mpesa_receipt = db.Column(db.String)
+    # One order per M-Pesa receipt: the idempotency key for callbacks.
+    mpesa_receipt = db.Column(db.String, unique=True)
+    # Daraja's id for the STK push; callbacks only carry this.
+    checkout_request_id = db.Column(db.String(100), unique=True)
+    # Progress of the STK push (utils/daraja.py), polled by the client:
+    # pushing -> awaiting_callback -> paid / declined, or push_failed.
+    payment_status = db.Column(db.String(20))
+    payment_error = db.Column(db.String(200))
+    payment_requested_at = db.Column(db.DateTime)
+    # Last reconciliation run whose M-Pesa statement matched this order.
+    reconciled_at = db.Column(db.DateTime)
     total_amount = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
+    expires_at = db.Column(db.DateTime)
 
     attendee_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     attendee = db.relationship("User", back_populates="orders")
     order_items = db.relationship("OrderItem", back_populates="order", cascade="all, delete")
 
+# ------------------ PaymentCallback ------------------
+class PaymentCallback(db.Model, SerializerMixin):
+    __tablename__ = "payment_callbacks"
+    __table_args__ = (db.Index("ix_payment_callbacks_status_id", "status", "id"),)
+
+    # Raw Daraja STK callbacks, one row per delivery (retries included). The
+    # callback endpoint only inserts; utils/payments.py workers claim rows
+    # (status new -> processing -> done) and record what they did.
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    checkout_request_id = db.Column(db.String(100), index=True)
+    mpesa_receipt = db.Column(db.String(50), index=True)
+    result_code = db.Column(db.Integer)
+    received_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    status = db.Column(db.String(20), default="new", nullable=False)
+    claimed_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+    outcome = db.Column(db.String(30))
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id", ondelete="SET NULL"))
+
 # ------------------ OrderItem ------------------
 class OrderItem(db.Model, SerializerMixin):
     __tablename__ = "order_items"
@@ -148,8 +302,8 @@ class OrderItem(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     quantity = db.Column(db.Integer, nullable=False)
 
-    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"))
-    ticket_id = db.Column(db.Integer, db.ForeignKey("tickets.id"))
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), index=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey("tickets.id"), index=True)
 
     order = db.relationship("Order", back_populates="order_items")
     ticket = db.relationship("Ticket", back_populates="order_items")
@@ -161,6 +315,7 @@ class OrderItem(db.Model, SerializerMixin):
 class Review(db.Model, SerializerMixin):
     __tablename__ = "reviews"
     serialize_rules = ("-attendee.reviews", "-event.reviews")
+    __table_args__ = (db.Index("ix_reviews_event_id_attendee_id", "event_id", "attendee_id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Integer, nullable=False)
@@ -191,11 +346,24 @@ class SavedEvent(db.Model, SerializerMixin):
 class Report(db.Model, SerializerMixin):
     __tablename__ = "reports"
     serialize_rules = ("-admin.reports", "-event.reports")
+    __table_args__ = (db.Index("ix_reports_admin_id_generated_at", "admin_id", "generated_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     generated_at = db.Column(db.DateTime, default=datetime.now)
     report_data = db.Column(db.Text)
 
+    # Report jobs (utils/reports.py): report_data holds the zlib-compressed,
+    # base64-encoded output once status is "done". Rows without a kind are
+    # plain-text reports.
+    kind = db.Column(db.String(50))
+    params = db.Column(db.Text)
+    format = db.Column(db.String(10))
+    status = db.Column(db.String(20), default="done", nullable=False)
+    row_count = db.Column(db.Integer)
+    error = db.Column(db.String)
+    claimed_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+
     admin_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     event_id = db.Column(db.Integer, db.ForeignKey("events.id"))
 
@@ -206,6 +374,13 @@ class Report(db.Model, SerializerMixin):
 class Log(db.Model, SerializerMixin):
     __tablename__ = "logs"
     serialize_rules = ("-user.logs",)
+    # Keyset pages of AdminLogs walk (created_at, id) newest first, optionally
+    # within one user's or one action's rows.
+    __table_args__ = (
+        db.Index("ix_logs_created_at_id", "created_at", "id"),
+        db.Index("ix_logs_user_id_created_at_id", "user_id", "created_at", "id"),
+        db.Index("ix_logs_action_created_at_id", "action", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     action = db.Column(db.String)
@@ -1,42 +1,41 @@
 # resources/admin.py
 
-from models import db, User, Event, Ticket, Order, OrderItem
+from models import db, User, Event, Ticket, Order, OrderItem, Report
+from utils.auth import role_required, current_principal
+from utils.metrics import read_metrics
+from utils.rollups import sales_window, platform_sales_series
+from utils.audit import audit_log
+from utils.export import EXPORT_FORMATS, export_response, attachment
+from utils.pagination import page_size, encode_cursor, decode_cursor
+from utils.reports import (
+    REPORT_COLUMNS, ORDERS_REPORT, report_orders, report_rows, report_query, export_rows,
+    job_params, find_report_job, create_report_job, report_jobs, report_output, compressed_output
+)
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import request
+from flask import request, make_response, jsonify
 from datetime import datetime
-from sqlalchemy import func
-from functools import wraps
-
-def admin_required(fn):
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user = User.query.get(get_jwt_identity())
-        if not user or user.role != "admin":
-            return {"message": "Admin access only"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
+import json
+from sqlalchemy import func, or_
+
+admin_required = role_required("admin", "Admin access only")
+
 
 class AdminDashboard(Resource):
     @admin_required
     def get(self):
-        total_users = User.query.count()
-        total_revenue = db.session.query(func.sum(Order.total_amount)).scalar() or 0
-        ticket_sales = db.session.query(func.sum(Ticket.sold)).scalar() or 0
-        active_events = Event.query.filter_by(status="approved").count()
-        pending_events = Event.query.filter_by(status="pending").count()
+        metrics = read_metrics()
 
         recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
         recent_events = Event.query.order_by(Event.created_at.desc()).limit(5).all()
 
         return {
             "totals": {
-                "users": total_users,
-                "revenue": total_revenue,
-                "ticket_sales": ticket_sales,
-                "active_events": active_events,
-                "pending_events": pending_events,
+                "users": int(metrics["users"]),
+                "revenue": metrics["revenue"],
+                "ticket_sales": int(metrics["ticket_sales"]),
+                "active_events": int(metrics["events_active"]),
+                "pending_events": int(metrics["events_pending"]),
             },
             "recent_users": [
                 {"name": f"{u.first_name} {u.last_name}", "email": u.email}
@@ -48,39 +47,147 @@ class AdminDashboard(Resource):
             ]
         }, 200
 
-class AdminReports(Resource):
+class AdminSales(Resource):
     @admin_required
     def get(self):
-        start_date = request.args.get("start_date")
-        end_date = request.args.get("end_date")
-        event_name = request.args.get("event_name")
+        # Platform-wide paid sales per hour or day: ?granularity=hour|day&start=&end=
+        try:
+            granularity, start, end = sales_window(request.args)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        return {"granularity": granularity, "series": platform_sales_series(granularity, start, end)}, 200
 
-        query = db.session.query(Order).join(Order.order_items).join(OrderItem.ticket).join(Ticket.event).join(Order.attendee)
-
-        if start_date:
-            start = datetime.fromisoformat(start_date)
-            query = query.filter(Order.created_at >= start)
+class AdminReports(Resource):
+    @admin_required
+    def get(self):
+        # One row per order, with the titles of every event it bought tickets for.
+        #   ?start_date=2025-01-01&end_date=2025-12-31&event_name=jazz&limit=100&cursor=<X-Next-Cursor>
+        # &format=csv|ndjson streams every matching order instead of one page.
+        fmt = request.args.get("format")
+        if fmt and fmt not in EXPORT_FORMATS:
+            return {"message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
 
-        if end_date:
-            end = datetime.fromisoformat(end_date)
-            query = query.filter(Order.created_at <= end)
+        try:
+            orders = report_orders(
+                request.args.get("start_date"),
+                request.args.get("end_date"),
+                request.args.get("event_name"),
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
 
-        if event_name:
-            query = query.filter(Event.title.ilike(f"%{event_name}%"))
+        if fmt:
+            return export_response(export_rows(orders), REPORT_COLUMNS, fmt, "orders-report")
 
-        results = query.all()
+        limit = page_size(request.args.get("limit"), default=100, maximum=1000)
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                after_created, after_id = decode_cursor(cursor, datetime, int)
+            except ValueError as e:
+                return {"message": str(e)}, 400
+            orders = orders.where(
+                Order.created_at >= after_created,
+                or_(Order.created_at > after_created, Order.id > after_id)
+            )
+        # Page over orders first, then join only that page's line items.
+        page = orders.order_by(Order.created_at, Order.id).limit(limit + 1).subquery()
+        rows = list(report_rows(report_query(page)))
 
-        return [
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        body = [
             {
-                "order_id": o.order_id,
-                "amount": o.total_amount,
-                "status": o.status,
-                "event": o.order_items[0].ticket.event.title if o.order_items else None,
-                "attendee": f"{o.attendee.first_name} {o.attendee.last_name}" if o.attendee else None,
-                "date": o.created_at.isoformat()
+                "order_id": order_id,
+                "amount": amount,
+                "status": status,
+                "event": titles[0] if titles else None,
+                "events": titles,
+                "attendee": attendee,
+                "date": created_at.isoformat()
             }
-            for o in results
-        ], 200
+            for _, order_id, amount, status, titles, attendee, created_at in rows
+        ]
+
+        response = make_response(jsonify(body), 200)
+        if has_more:
+            last_id, *_, last_created = rows[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(last_created, last_id)
+        return response
+
+def report_job_dict(report):
+    job = {
+        "id": report.id,
+        "kind": report.kind,
+        "params": json.loads(report.params or "{}"),
+        "format": report.format,
+        "status": report.status,
+        "row_count": report.row_count,
+        "error": report.error,
+        "created_at": report.generated_at.isoformat() if report.generated_at else None,
+        "completed_at": report.completed_at.isoformat() if report.completed_at else None,
+    }
+    if report.status == "done":
+        job["download"] = f"/admin/reports/jobs/{report.id}/download"
+    return job
+
+class ReportJobList(Resource):
+    @admin_required
+    def post(self):
+        # Build the orders report in the background. Same filters as
+        # GET /admin/reports, in the JSON body or the query string.
+        args = {**request.args, **(request.get_json(silent=True) or {})}
+        fmt = args.get("format") or "csv"
+        if fmt not in EXPORT_FORMATS:
+            return {"message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
+        try:
+            params = job_params(args)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        # An identical job that is still running, or finished moments ago, is
+        # returned instead of computing the same report again.
+        report = find_report_job(ORDERS_REPORT, params, fmt)
+        if report is not None:
+            return report_job_dict(report), 200
+
+        report = create_report_job(current_principal().id, ORDERS_REPORT, params, fmt)
+        db.session.commit()
+        report_jobs.submit(report.id)
+        audit_log.record("Queued report", report.admin_id, report_id=report.id, kind=report.kind, params=params)
+        return report_job_dict(report), 202, {"Location": f"/admin/reports/jobs/{report.id}"}
+
+    @admin_required
+    def get(self):
+        reports = Report.query.filter(Report.admin_id == current_principal().id, Report.kind.isnot(None))\
+            .order_by(Report.generated_at.desc()).limit(50).all()
+        return [report_job_dict(r) for r in reports], 200
+
+class ReportJobDetail(Resource):
+    @admin_required
+    def get(self, id):
+        report = db.session.get(Report, id)
+        if not report or report.kind is None:
+            return {"message": "Report job not found"}, 404
+        return report_job_dict(report), 200
+
+class ReportJobDownload(Resource):
+    @admin_required
+    def get(self, id):
+        report = db.session.get(Report, id)
+        if not report or report.kind is None:
+            return {"message": "Report job not found"}, 404
+        if report.status != "done":
+            return {"message": f"Report is {report.status}"}, 409
+
+        filename = f"{report.kind}-report-{report.id}"
+        # The stored zlib stream is a valid deflate body; clients that accept
+        # it get the bytes as stored.
+        if "deflate" in request.accept_encodings:
+            response = attachment(compressed_output(report), report.format, filename)
+            response.headers["Content-Encoding"] = "deflate"
+            return response
+        return attachment(report_output(report), report.format, filename)
 
 class AllUsers(Resource):
     @admin_required
@@ -1,6 +1,6 @@
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Event, OrderItem, Order, User, db
+from models import Event, OrderItem, Order, Ticket, User, db
 from datetime import datetime
 
 class UpcomingAttendeeEvents(Resource):
@@ -4,10 +4,14 @@ from flask_restful import Resource, reqparse
 from flask import request
 from flask_jwt_extended import create_access_token
 from models import User, db
-from flask_bcrypt import Bcrypt
+from sqlalchemy.exc import IntegrityError
+from utils.auth import token_claims
+from utils.metrics import bump_metric
+from utils.passwords import passwords, PasswordHasherBusy
+from utils.accounts import duplicate_field, DUPLICATE_MESSAGES
 from datetime import timedelta
 
-bcrypt = Bcrypt()
+BUSY = {"message": "Too many sign-in requests right now. Please try again shortly."}, 503, {"Retry-After": "1"}
 
 # ----------------- Parsers -----------------
 
@@ -29,33 +33,47 @@ class Register(Resource):
     def post(self):
         data = signup_parser.parse_args()
 
-        # Check if user already exists
-        if User.query.filter_by(email=data["email"]).first():
-            return {"message": "Email already registered."}, 400
-        if User.query.filter_by(phone=data["phone"]).first():
-            return {"message": "Phone number already registered."}, 400
-
         # Validate role
-        requested_role = data.get("role", "attendee").lower()
+        requested_role = (data.get("role") or "attendee").lower()
         if requested_role not in ["attendee", "organizer"]:
             requested_role = "attendee"
 
-        # Hash password
-        hashed_pw = bcrypt.generate_password_hash(data["password"]).decode("utf-8")
-
-        new_user = User(
-            first_name=data["first_name"],
-            last_name=data["last_name"],
-            email=data["email"],
-            phone=data["phone"],
-            password=hashed_pw,
-            role=requested_role
-        )
-
+        try:
+            new_user = User(
+                first_name=data["first_name"],
+                last_name=data["last_name"],
+                email=data["email"],
+                phone=data["phone"],
+                role=requested_role
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        # Hash password (on the bounded hashing pool)
+        try:
+            new_user.password = passwords.hash(data["password"])
+        except PasswordHasherBusy:
+            return BUSY
+
+        # No lookups first: the unique constraints on email and phone reject
+        # duplicates, including two signups racing for the same address.
         db.session.add(new_user)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            field = duplicate_field(e)
+            if field is None:
+                raise
+            return {"message": DUPLICATE_MESSAGES[field]}, 400
+        bump_metric("users", 1)
         db.session.commit()
 
-        token = create_access_token(identity=new_user.id, expires_delta=timedelta(hours=24))
+        token = create_access_token(
+            identity=new_user.id,
+            expires_delta=timedelta(hours=24),
+            additional_claims=token_claims(new_user)
+        )
 
         return {
             "message": "User registered successfully.",
@@ -77,10 +95,22 @@ class Login(Resource):
 
         user = User.query.filter_by(email=data["email"]).first()
 
-        if not user or not bcrypt.check_password_hash(user.password, data["password"]):
-            return {"message": "Invalid email or password."}, 401
-
-        token = create_access_token(identity=user.id, expires_delta=timedelta(hours=24))
+        try:
+            if not user or not passwords.verify(user.password, data["password"]):
+                return {"message": "Invalid email or password."}, 401
+            # Hashes from before a BCRYPT_LOG_ROUNDS change are upgraded now
+            # that the password is known.
+            if passwords.needs_rehash(user.password):
+                user.password = passwords.hash(data["password"])
+                db.session.commit()
+        except PasswordHasherBusy:
+            return BUSY
+
+        token = create_access_token(
+            identity=user.id,
+            expires_delta=timedelta(hours=24),
+            additional_claims=token_claims(user)
+        )
 
         return {
             "message": "Login successful.",
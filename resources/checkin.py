@@ -0,0 +1,92 @@
+# resources/checkin.py
+
+from datetime import datetime
+
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import get_jwt_identity
+from utils.auth import organizer_required
+from utils.checkin import gate, event_organizer, ADMITTED, ALREADY_USED, INVALID, UNKNOWN, WRONG_EVENT
+from utils.passes import normalize_code
+
+MAX_SYNC_SCANS = 10000
+STATUS_CODES = {ADMITTED: 200, ALREADY_USED: 409, WRONG_EVENT: 409, UNKNOWN: 404, INVALID: 400}
+
+
+def own_event(event_id):
+    """(organizer id, None) for one of the organizer's events, else (None, error response).
+
+    Checked before any index is loaded, so nobody can make us load, and
+    evict, other organizers' events.
+    """
+    index = gate.cached(event_id)
+    organizer_id = index.organizer_id if index is not None else event_organizer(event_id)
+    if organizer_id is None:
+        return None, ({"message": "Event not found"}, 404)
+    if organizer_id != get_jwt_identity():
+        return None, ({"message": "You are not authorized to check in at this event"}, 403)
+    return organizer_id, None
+
+
+class CheckIn(Resource):
+    @organizer_required
+    def post(self, event_id):
+        organizer_id, error = own_event(event_id)
+        if error:
+            return error
+        code = (request.get_json(silent=True) or {}).get("ticket_code")
+        if not isinstance(code, str):
+            return {"message": "ticket_code is required"}, 400
+
+        result, _, checked_in_at = gate.scan(gate.get(event_id, organizer_id), code)
+        return {
+            "result": result,
+            "ticket_code": normalize_code(code),
+            "checked_in_at": checked_in_at.isoformat() if checked_in_at else None,
+        }, STATUS_CODES[result]
+
+
+class GateIndex(Resource):
+    @organizer_required
+    def get(self, event_id):
+        # Everything an offline gate needs; see scripts/gate_offline.py.
+        # Reloaded, so it includes passes admitted by other processes.
+        organizer_id, error = own_event(event_id)
+        if error:
+            return error
+        return gate.load(event_id, organizer_id).export(), 200
+
+    @organizer_required
+    def put(self, event_id):
+        # Reload from the database, e.g. before the gates open.
+        organizer_id, error = own_event(event_id)
+        if error:
+            return error
+        return gate.load(event_id, organizer_id).summary(), 200
+
+
+class GateSync(Resource):
+    @organizer_required
+    def post(self, event_id):
+        organizer_id, error = own_event(event_id)
+        if error:
+            return error
+        scans = (request.get_json(silent=True) or {}).get("scans")
+        if not isinstance(scans, list) or not scans:
+            return {"message": "scans must be a non-empty list"}, 400
+        if len(scans) > MAX_SYNC_SCANS:
+            return {"message": f"At most {MAX_SYNC_SCANS} scans per sync"}, 413
+
+        parsed = []
+        for scan in scans:
+            try:
+                scanned_at = datetime.fromisoformat(scan["scanned_at"])
+                code = str(scan["ticket_code"])
+            except (KeyError, TypeError, ValueError):
+                return {"message": "Each scan needs ticket_code and an ISO scanned_at", "scan": scan}, 400
+            if scanned_at.tzinfo is not None:
+                # Check-in times are naive local time, like every other timestamp here.
+                scanned_at = scanned_at.astimezone().replace(tzinfo=None)
+            parsed.append((code, scanned_at))
+
+        return gate.sync(gate.get(event_id, organizer_id), parsed), 200
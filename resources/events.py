@@ -1,28 +1,25 @@
 from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Event, User, db
+from utils.auth import organizer_required, admin_required
 from datetime import datetime
+from functools import lru_cache
 from flask import request, make_response, jsonify
-
-# ------------------ Role-Based Decorators ------------------
-
-def organizer_required(fn):
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user = User.query.get(get_jwt_identity())
-        if not user or user.role != "organizer":
-            return {"message": "Organizer access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
-
-def admin_required(fn):
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user = User.query.get(get_jwt_identity())
-        if not user or user.role != "admin":
-            return {"message": "Admin access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
+from sqlalchemy import or_, select
+from utils.cache import (
+    cached_response, event_list_key, event_key, invalidate_event, invalidate_event_children
+)
+from utils.serializers import Serializer
+from utils.event_stats import create_event_stats, remove_event_stats
+from utils.metrics import bump_metric, event_status_changed
+from utils.rollups import remove_event_sales
+from utils.audit import audit_log
+from utils.pagination import page_size, encode_cursor, decode_cursor
+from utils.inventory import sold_counts
+from utils.search import index_event, remove_event, search_events, SEARCH_WINDOW
+from utils.facets import (
+    sync_event_facets, remove_event_facets, facet_filter, precomputed_counts, filtered_counts
+)
 
 # ------------------ Event Parser ------------------
 
@@ -36,20 +33,103 @@ event_parser.add_argument("category", required=True)
 event_parser.add_argument("tags", required=False)
 event_parser.add_argument("image_url", required=False)
 
+# ------------------ Public Serializers ------------------
+
+EVENT_LIST_FIELDS = (
+    "id", "title", "location", "start_time", "end_time", "category", "tags",
+    "status", "is_approved", "image_url", "organizer",
+)
+ORGANIZER_FIELDS = ("organizer.id", "organizer.first_name", "organizer.last_name")
+
+EVENT_DETAIL = Serializer(Event, (
+    "id", "title", "description", "location", "start_time", "end_time",
+    "category", "tags", "image_url", "status", "is_approved", "created_at",
+) + ORGANIZER_FIELDS)
+
+@lru_cache(maxsize=256)
+def event_list_serializer(fields):
+    dotted = []
+    for field in fields:
+        dotted += ORGANIZER_FIELDS if field == "organizer" else (field,)
+    return Serializer(Event, dotted)
+
+def parse_fields(raw):
+    if not raw:
+        return EVENT_LIST_FIELDS
+    fields = tuple(f.strip() for f in raw.split(",") if f.strip())
+    if not fields or any(f not in EVENT_LIST_FIELDS for f in fields):
+        return None
+    return fields
+
 # ------------------ Organizer: Events CRUD ------------------
 
 class EventList(Resource):
+    @cached_response(event_list_key)
     def get(self):
-        # Public endpoint: view approved events
-        events = [
-            e.to_dict(only=(
-                "id", "title", "location", "start_time", "end_time", "category",
-                "tags", "status", "is_approved", "image_url",
-                "organizer.id", "organizer.first_name", "organizer.last_name"
-            ))
-            for e in Event.query.filter_by(is_approved=True).all()
-        ]
-        return make_response(jsonify(events), 200)
+        # Public endpoint: view approved events, one keyset page at a time:
+        #   ?limit=20&cursor=<next_cursor>&fields=id,title,start_time,organizer
+        # Faceted filters (repeat tag= to require several tags):
+        #   ?category=Music&tag=live&location=Nairobi&from=2025-08-01&to=2025-09-01&facets=true
+        limit = page_size(request.args.get("limit"))
+        fields = parse_fields(request.args.get("fields"))
+        if fields is None:
+            return {"message": f"fields must be a subset of: {', '.join(EVENT_LIST_FIELDS)}"}, 400
+
+        filters = [Event.is_approved == True]
+        for facet, values in (
+            ("category", request.args.getlist("category")),
+            ("location", request.args.getlist("location")),
+            ("tag", request.args.getlist("tag")),
+        ):
+            filters += [facet_filter(facet, v) for v in values if v.strip()]
+        faceted = len(filters) > 1
+        try:
+            if request.args.get("from"):
+                filters.append(Event.start_time >= datetime.fromisoformat(request.args["from"]))
+                faceted = True
+            if request.args.get("to"):
+                filters.append(Event.start_time <= datetime.fromisoformat(request.args["to"]))
+                faceted = True
+        except ValueError:
+            return {"message": "from/to must be ISO dates"}, 400
+
+        serializer = event_list_serializer(fields)
+        query = serializer.query(Event.start_time.label("cursor_start"), Event.id.label("cursor_id"))
+        query = query.filter(*filters)
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                after_start, after_id = decode_cursor(cursor, datetime, int)
+            except ValueError as e:
+                return {"message": str(e)}, 400
+            query = query.filter(
+                Event.start_time >= after_start,
+                or_(Event.start_time > after_start, Event.id > after_id)
+            )
+
+        rows = query.order_by(Event.start_time, Event.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        events = serializer.rows(rows)
+
+        next_cursor = encode_cursor(rows[-1].cursor_start, rows[-1].cursor_id) if has_more else None
+
+        if request.args.get("facets", "").lower() in ("1", "true", "yes"):
+            # Unfiltered counts are maintained on write; filtered ones come from
+            # the event_facets index for the matching events.
+            if faceted:
+                facets = filtered_counts(select(Event.id).where(*filters))
+            else:
+                facets = precomputed_counts()
+            body = {"events": events, "facets": facets, "next_cursor": next_cursor}
+        else:
+            body = events
+
+        response = make_response(jsonify(body), 200)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
 
     @organizer_required
     def post(self):
@@ -71,22 +151,25 @@ class EventList(Resource):
                 is_approved=False
             )
             db.session.add(new_event)
+            db.session.flush()
+            index_event(new_event)
+            sync_event_facets(new_event)
+            create_event_stats(new_event.id)
+            event_status_changed(None, new_event.status)
             db.session.commit()
+            audit_log.record("Created event", organizer_id, event_id=new_event.id, title=new_event.title)
             return new_event.to_dict(), 201
         except Exception as e:
             return {"message": str(e)}, 400
 
 class EventDetail(Resource):
+    @cached_response(event_key)
     def get(self, id):
         event = Event.query.get(id)
         if not event:
             return {"message": "Event not found"}, 404
 
-        return event.to_dict(only=(
-            "id", "title", "description", "location", "start_time", "end_time",
-            "category", "tags", "image_url", "status", "is_approved", "created_at",
-            "organizer.id", "organizer.first_name", "organizer.last_name"
-        )), 200
+        return EVENT_DETAIL(event), 200
 
     @organizer_required
     def put(self, id):
@@ -105,7 +188,11 @@ class EventDetail(Resource):
         if "end_time" in data:
             event.end_time = datetime.fromisoformat(data["end_time"])
 
+        index_event(event)
+        sync_event_facets(event)
         db.session.commit()
+        invalidate_event(event.id, listing=event.is_approved)
+        audit_log.record("Updated event", event.organizer_id, event_id=event.id, fields=sorted(data))
         return event.to_dict(), 200
 
     @organizer_required
@@ -116,10 +203,53 @@ class EventDetail(Resource):
         if event.organizer_id != get_jwt_identity():
             return {"message": "Not authorized to delete this event"}, 403
 
+        listed = event.is_approved
+        remove_event(event.id)
+        remove_event_facets(event)
+        remove_event_stats(event.id)
+        remove_event_sales(event.id)
+        event_status_changed(event.status, None)
+        bump_metric("ticket_sales", -sum(sold_counts(event.tickets).values()))
+        title = event.title
         db.session.delete(event)
         db.session.commit()
+        invalidate_event(id, listing=listed)
+        invalidate_event_children(id)
+        audit_log.record("Deleted event", get_jwt_identity(), event_id=id, title=title)
         return {"message": "Event deleted successfully"}, 200
 
+class EventSearch(Resource):
+    def get(self):
+        # Public ranked search over approved events:
+        #   ?q=jazz nairobi&category=Music&tag=live&limit=20&offset=0
+        limit = page_size(request.args.get("limit"))
+        offset = max(request.args.get("offset", 0, type=int), 0)
+
+        result = search_events(
+            request.args.get("q"),
+            category=request.args.get("category"),
+            tag=request.args.get("tag"),
+            limit=limit,
+            offset=offset
+        )
+        if result is None:
+            return {"message": "Search query 'q' is required"}, 400
+
+        events, total, facets, facets_truncated = result
+        for e in events:
+            for key in ("start_time", "end_time"):
+                if e[key] is not None:
+                    e[key] = e[key].strftime(Event.datetime_format)
+            e["score"] = round(float(e["score"]), 6)
+
+        return {
+            "results": events,
+            "total": total,
+            "facets": facets,
+            "facets_truncated": facets_truncated,
+            "facet_window": SEARCH_WINDOW
+        }, 200
+
 class MyEvents(Resource):
     @organizer_required
     def get(self):
@@ -144,6 +274,7 @@ class ApproveEvent(Resource):
 
         data = request.get_json()
         approve = data.get("approve")
+        old_status = event.status
 
         if approve is True:
             event.is_approved = True
@@ -154,5 +285,11 @@ class ApproveEvent(Resource):
             event.status = "rejected"
             message = "Event rejected"
 
+        index_event(event)
+        sync_event_facets(event)
+        event_status_changed(old_status, event.status)
         db.session.commit()
+        invalidate_event(event.id)
+        audit_log.record("Approved event" if approve is True else "Rejected event", get_jwt_identity(),
+                         event_id=event.id, old_status=old_status)
         return {"message": message}
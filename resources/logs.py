@@ -1,26 +1,64 @@
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import request, make_response, jsonify
+from datetime import datetime
+from sqlalchemy import or_
 from models import Log, User
-from functools import wraps
+from utils.auth import role_required
+from utils.pagination import page_size, encode_cursor, decode_cursor
+
+admin_required = role_required("admin", "Admin access only")
 
-def admin_required(fn):
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user = User.query.get(get_jwt_identity())
-        if not user or user.role != "admin":
-            return {"message": "Admin access only"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
 
 class AdminLogs(Resource):
     @admin_required
     def get(self):
-        logs = Log.query.order_by(Log.created_at.desc()).limit(50).all()
-        return [{
+        # Newest first, keyset-paged on (created_at, id):
+        #   ?user_id=3&action=Banned user&start=2025-01-01&end=2025-02-01&limit=50&cursor=<X-Next-Cursor>
+        # Rows older than the archive cutoff live in the files written by
+        # `flask archive-logs`.
+        limit = page_size(request.args.get("limit"), default=50, maximum=500)
+        query = Log.query
+
+        user_id = request.args.get("user_id")
+        if user_id:
+            try:
+                query = query.filter(Log.user_id == int(user_id))
+            except ValueError:
+                return {"message": "user_id must be an integer"}, 400
+        action = request.args.get("action")
+        if action:
+            query = query.filter(Log.action == action)
+        try:
+            if request.args.get("start"):
+                query = query.filter(Log.created_at >= datetime.fromisoformat(request.args["start"]))
+            if request.args.get("end"):
+                query = query.filter(Log.created_at < datetime.fromisoformat(request.args["end"]))
+        except ValueError:
+            return {"message": "start/end must be ISO dates"}, 400
+
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                before_created, before_id = decode_cursor(cursor, datetime, int)
+            except ValueError as e:
+                return {"message": str(e)}, 400
+            query = query.filter(
+                Log.created_at <= before_created,
+                or_(Log.created_at < before_created, Log.id < before_id)
+            )
+
+        logs = query.order_by(Log.created_at.desc(), Log.id.desc()).limit(limit + 1).all()
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+
+        response = make_response(jsonify([{
             "id": l.id,
             "user_id": l.user_id,
             "action": l.action,
             "meta_data": l.meta_data,
             "created_at": l.created_at.isoformat()
-        } for l in logs], 200
+        } for l in logs]), 200)
+        if has_more:
+            response.headers["X-Next-Cursor"] = encode_cursor(logs[-1].created_at, logs[-1].id)
+        return response
@@ -2,6 +2,12 @@ from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import request
 from models import Order, OrderItem, Ticket, User, db
+from utils.inventory import reserve_tickets
+from utils.holds import hold_expiry
+from utils.cache import invalidate_tickets
+from utils.metrics import bump_metric
+from utils.passes import MAX_PASSES_PER_ITEM
+from utils.serializers import Serializer
 import uuid
 from datetime import datetime
 
@@ -9,43 +15,56 @@ order_parser = reqparse.RequestParser()
 order_parser.add_argument("ticket_id", type=int, required=True)
 order_parser.add_argument("quantity", type=int, required=True)
 
+ORDER_FIELDS = (
+    "id", "order_id", "status", "payment_status", "total_amount", "mpesa_receipt", "created_at", "expires_at",
+    "order_items.id", "order_items.quantity",
+    "order_items.ticket.id", "order_items.ticket.type", "order_items.ticket.price",
+    "order_items.ticket.event.id", "order_items.ticket.event.title"
+)
+ORDER = Serializer(Order, ORDER_FIELDS)
+# A group order can hold hundreds of passes, so only the detail view lists them.
+ORDER_DETAIL = Serializer(Order, ORDER_FIELDS + (
+    "order_items.event_passes.ticket_code", "order_items.event_passes.att_status"
+))
+
 
 class OrderList(Resource):
     @jwt_required()
     def get(self):
         user_id = get_jwt_identity()
-        orders = Order.query.filter_by(attendee_id=user_id).all()
-
-        return [
-            o.to_dict(only=(
-                "id", "order_id", "status", "total_amount", "mpesa_receipt", "created_at",
-                "order_items.id", "order_items.quantity",
-                "order_items.ticket.id", "order_items.ticket.type", "order_items.ticket.price",
-                "order_items.ticket.event.id", "order_items.ticket.event.title"
-            ))
-            for o in orders
-        ], 200
+        orders = Order.query.options(*ORDER.options).filter_by(attendee_id=user_id).all()
+
+        return ORDER.many(orders), 200
 
     @jwt_required()
     def post(self):
         data = order_parser.parse_args()
         user_id = get_jwt_identity()
+        if data["quantity"] > MAX_PASSES_PER_ITEM:
+            return {"message": f"At most {MAX_PASSES_PER_ITEM} tickets per order"}, 400
 
         ticket = Ticket.query.get(data["ticket_id"])
         if not ticket:
             return {"message": "Ticket not found"}, 404
 
-        if data["quantity"] > (ticket.quantity - ticket.sold):
+        # Conditional UPDATE on the ticket (or one of its shards); holds the
+        # row lock until commit so concurrent orders cannot oversell.
+        if not reserve_tickets(ticket.id, data["quantity"]):
+            db.session.rollback()
             return {"message": "Not enough tickets available"}, 400
 
         total = ticket.price * data["quantity"]
+        now = datetime.now()
 
+        # Seats are held until expires_at; the hold sweeper releases them if
+        # the order is still pending by then.
         order = Order(
             order_id=str(uuid.uuid4()),
             attendee_id=user_id,
             status="pending",
             total_amount=total,
-            created_at=datetime.now()
+            created_at=now,
+            expires_at=hold_expiry(now)
         )
 
         item = OrderItem(
@@ -54,21 +73,15 @@ class OrderList(Resource):
             order=order
         )
 
-        # Update sold count
-        ticket.sold += data["quantity"]
-
         db.session.add(order)
         db.session.add(item)
+        bump_metric("ticket_sales", data["quantity"])
         db.session.commit()
+        invalidate_tickets(ticket.event_id)
 
         return {
             "message": "Order placed. Proceed to payment.",
-            "order": order.to_dict(only=(
-                "id", "order_id", "status", "total_amount", "mpesa_receipt", "created_at",
-                "order_items.id", "order_items.quantity",
-                "order_items.ticket.id", "order_items.ticket.type", "order_items.ticket.price",
-                "order_items.ticket.event.id", "order_items.ticket.event.title"
-            ))
+            "order": ORDER(order)
         }, 201
 
 
@@ -76,14 +89,9 @@ class OrderDetail(Resource):
     @jwt_required()
     def get(self, id):
         user_id = get_jwt_identity()
-        order = Order.query.get(id)
+        order = Order.query.options(*ORDER_DETAIL.options).get(id)
 
         if not order or order.attendee_id != user_id:
             return {"message": "Order not found or unauthorized"}, 404
 
-        return order.to_dict(only=(
-            "id", "order_id", "status", "total_amount", "mpesa_receipt", "created_at",
-            "order_items.id", "order_items.quantity",
-            "order_items.ticket.id", "order_items.ticket.type", "order_items.ticket.price",
-            "order_items.ticket.event.id", "order_items.ticket.event.title"
-        )), 200
+        return ORDER_DETAIL(order), 200
@@ -1,22 +1,12 @@
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Event, Ticket, OrderItem, User, Review
-from sqlalchemy import func
+from models import db, Event, EventStats, TicketStats, Ticket, TicketShard
+from utils.auth import organizer_required
+from utils.rollups import sales_window, organizer_sales_series
+from flask import request
+from sqlalchemy import case, func, select
 from datetime import datetime
-from functools import wraps
-
-
-# ------------------ Auth Guard ------------------
-
-def organizer_required(fn):
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user = User.query.get(get_jwt_identity())
-        if not user or user.role != "organizer":
-            return {"message": "Organizer access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
+from itertools import groupby
 
 
 # ------------------ Overview & Stats ------------------
@@ -27,24 +17,20 @@ class OrganizerOverview(Resource):
         user_id = get_jwt_identity()
         now = datetime.now()
 
-        events = Event.query.filter_by(organizer_id=user_id).all()
-        event_ids = [e.id for e in events]
-
-        total_revenue = db.session.query(func.sum(Ticket.price * OrderItem.quantity))\
-            .join(OrderItem.ticket)\
-            .join(Ticket.event)\
+        # One pass over the organizer's events and their EventStats rows.
+        revenue, tickets_sold, upcoming, past = db.session.query(
+            func.coalesce(func.sum(EventStats.revenue), 0),
+            func.coalesce(func.sum(EventStats.tickets_sold), 0),
+            func.count(case((Event.start_time > now, 1))),
+            func.count(case((Event.start_time <= now, 1)))
+        ).select_from(Event)\
+            .outerjoin(EventStats, EventStats.event_id == Event.id)\
             .filter(Event.organizer_id == user_id)\
-            .scalar() or 0
-
-        total_tickets_sold = db.session.query(func.sum(Ticket.sold))\
-            .filter(Ticket.event_id.in_(event_ids)).scalar() or 0
-
-        upcoming = Event.query.filter(Event.organizer_id == user_id, Event.start_time > now).count()
-        past = Event.query.filter(Event.organizer_id == user_id, Event.start_time <= now).count()
+            .one()
 
         return {
-            "total_revenue": total_revenue,
-            "tickets_sold": total_tickets_sold,
+            "total_revenue": revenue,
+            "tickets_sold": tickets_sold,
             "upcoming_events": upcoming,
             "past_events": past
         }, 200
@@ -54,33 +40,70 @@ class OrganizerEventStats(Resource):
     @organizer_required
     def get(self):
         user_id = get_jwt_identity()
-        events = Event.query.filter_by(organizer_id=user_id).all()
 
-        stats = []
-        for e in events:
-            ticket_stats = []
-            for t in e.tickets:
-                ticket_stats.append({
-                    "type": t.type,
-                    "price": t.price,
-                    "sold": t.sold,
-                    "revenue": t.price * t.sold
-                })
-
-            average_rating = db.session.query(func.avg(Review.rating))\
-                .filter(Review.event_id == e.id).scalar()
+        # Seats taken, pending holds included, as on the ticket endpoints: a
+        # sharded ticket's Ticket.sold lags its shards until they are folded.
+        shard_sold = select(func.sum(TicketShard.sold))\
+            .where(TicketShard.ticket_id == Ticket.id).scalar_subquery()
+
+        # Events with their aggregates and ticket types with theirs, one row
+        # per ticket type.
+        rows = db.session.query(
+            Event.id, Event.title,
+            EventStats.revenue, EventStats.tickets_sold, EventStats.review_count, EventStats.review_sum,
+            Ticket.id.label("ticket_id"), Ticket.type, Ticket.price,
+            func.coalesce(shard_sold, Ticket.sold, 0).label("sold"),
+            TicketStats.tickets_sold.label("paid"), TicketStats.revenue.label("ticket_revenue")
+        ).select_from(Event)\
+            .outerjoin(EventStats, EventStats.event_id == Event.id)\
+            .outerjoin(Ticket, Ticket.event_id == Event.id)\
+            .outerjoin(TicketStats, TicketStats.ticket_id == Ticket.id)\
+            .filter(Event.organizer_id == user_id)\
+            .order_by(Event.id, Ticket.id)\
+            .all()
 
+        stats = []
+        for event_id, event_rows in groupby(rows, key=lambda r: r.id):
+            event_rows = list(event_rows)
+            first = event_rows[0]
+            review_count = first.review_count or 0
             stats.append({
-                "event_id": e.id,
-                "title": e.title,
-                "tickets": ticket_stats,
-                "total_event_revenue": sum(t["revenue"] for t in ticket_stats),
-                "average_rating": round(average_rating, 1) if average_rating else None
+                "event_id": event_id,
+                "title": first.title,
+                "tickets": [{
+                    "type": r.type,
+                    "price": r.price,
+                    "sold": r.sold,
+                    "paid": r.paid or 0,
+                    "revenue": r.ticket_revenue or 0
+                } for r in event_rows if r.ticket_id is not None],
+                "tickets_sold": first.tickets_sold or 0,
+                "total_event_revenue": first.revenue or 0,
+                "review_count": review_count,
+                "average_rating": round(first.review_sum / review_count, 1) if review_count else None
             })
 
         return stats, 200
 
 
+class OrganizerSales(Resource):
+    @organizer_required
+    def get(self):
+        # Paid sales per hour or day across the organizer's events, from the rollups.
+        #   ?granularity=hour|day&start=2025-06-01&end=2025-06-30&event_id=3&ticket_id=7
+        try:
+            granularity, start, end = sales_window(request.args)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        series = organizer_sales_series(
+            get_jwt_identity(), granularity, start, end,
+            event_id=request.args.get("event_id", type=int),
+            ticket_id=request.args.get("ticket_id", type=int)
+        )
+        return {"granularity": granularity, "series": series}, 200
+
+
 # ------------------ Event Lists by Status ------------------
 
 class OrganizerEventsByStatus(Resource):
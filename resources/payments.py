@@ -1,12 +1,30 @@
 # resources/payments.py
 
+import hmac
+
 from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Order, db
-from flask import request
+from flask import request, current_app
+from utils.payments import ACCEPTED, append_callback, payment_workers, settle_order
+from utils.daraja import daraja, DarajaBusy, claim_push, finish_push, msisdn
+
+MAX_CALLBACK_BYTES = 64 * 1024
+BUSY = {"message": "Too many payment requests right now. Please try again shortly."}, 503, {"Retry-After": "5"}
 
 payment_parser = reqparse.RequestParser()
 payment_parser.add_argument("order_id", required=True)
+payment_parser.add_argument("phone")
+
+
+def payment_dict(order):
+    return {
+        "order_id": order.order_id,
+        "status": order.status,
+        "payment_status": order.payment_status,
+        "mpesa_receipt": order.mpesa_receipt,
+        "error": order.payment_error,
+    }
 
 class STKPush(Resource):
     @jwt_required()
@@ -17,14 +35,71 @@ class STKPush(Resource):
         if not order:
             return {"message": "Order not found"}, 404
 
-        order.status = "paid"
-        order.mpesa_receipt = "MPESA-" + str(order.id)
+        if not daraja.enabled:
+            return mocked_payment(order)
+
+        try:
+            phone = msisdn(data.get("phone") or (order.attendee.phone if order.attendee else None))
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        # The gateway round trip happens off the request; the client polls
+        # the Location for payment_status.
+        location = {"Location": f"/payments/{order.order_id}"}
+        if not claim_push(order.id):
+            db.session.rollback()
+            order = db.session.get(Order, order.id)
+            if order.status == "paid":
+                return payment_dict(order), 200
+            if order.status != "pending":
+                return {"message": "Order hold expired. Please place a new order."}, 410
+            # A push for this order is already on its way.
+            return payment_dict(order), 202, location
         db.session.commit()
 
-        return {"message": "Payment successful (mocked)", "receipt": order.mpesa_receipt}, 200
+        try:
+            daraja.submit(order.id, phone)
+        except DarajaBusy:
+            finish_push(order.id, error="Payment gateway busy")
+            db.session.commit()
+            return BUSY
+        db.session.expire(order)
+        return payment_dict(order), 202, location
+
+
+def mocked_payment(order):
+    # No Daraja credentials configured (development): pay at once.
+    receipt = "MPESA-" + str(order.id)
+    if not settle_order(order, receipt):
+        db.session.rollback()
+        if db.session.get(Order, order.id).status == "paid":
+            return {"message": "Payment successful (mocked)", "receipt": receipt}, 200
+        return {"message": "Order hold expired. Please place a new order."}, 410
+    db.session.commit()
+
+    return {"message": "Payment successful (mocked)", "receipt": receipt}, 200
+
+
+class PaymentStatus(Resource):
+    @jwt_required()
+    def get(self, order_id):
+        order = Order.query.filter_by(order_id=order_id).first()
+        if not order or order.attendee_id != get_jwt_identity():
+            return {"message": "Order not found or unauthorized"}, 404
+        return payment_dict(order), 200
 
 
 class STKCallback(Resource):
     def post(self):
-        # Simulate MPESA callback (Daraja logic can go here later)
-        return {"message": "Callback received"}, 200
+        # Daraja retries until it gets a 200, so do as little as possible:
+        # store the raw body, ack, and let the payment workers settle it.
+        # Daraja does not sign callbacks; set MPESA_CALLBACK_TOKEN and put
+        # ?token=<it> in the registered CallBackURL.
+        token = current_app.config.get("MPESA_CALLBACK_TOKEN")
+        if token and not hmac.compare_digest(request.args.get("token", ""), token):
+            return {"message": "Forbidden"}, 403
+        if (request.content_length or 0) > MAX_CALLBACK_BYTES:
+            return {"message": "Callback too large"}, 413
+        append_callback(request.get_data(as_text=True))
+        payment_workers.notify()
+        return ACCEPTED, 200
@@ -1,20 +1,28 @@
 from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy.orm import joinedload
 from models import db, Event, Review, User
+from utils.auth import current_principal
+from utils.serializers import Serializer
+from utils.event_stats import record_review
+from utils.cache import cached_response, reviews_key, invalidate_reviews
 
 review_parser = reqparse.RequestParser()
 review_parser.add_argument("rating", type=int, required=True)
 review_parser.add_argument("comment", type=str, required=False)
 
+REVIEW = Serializer(Review, (
+    "id", "rating", "comment", "created_at",
+    "attendee.id", "attendee.first_name", "attendee.last_name"
+))
+
 
 class AddReview(Resource):
     @jwt_required()
     def post(self, event_id):
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal()
 
-        if user.role != "attendee":
+        if not user or user.role != "attendee":
             return {"message": "Only attendees can review"}, 403
 
         existing = Review.query.filter_by(attendee_id=user_id, event_id=event_id).first()
@@ -33,21 +41,15 @@ class AddReview(Resource):
         )
 
         db.session.add(new_review)
+        record_review(event_id, data["rating"])
         db.session.commit()
+        invalidate_reviews(event_id)
 
-        return new_review.to_dict(only=(
-            "id", "rating", "comment", "created_at",
-            "attendee.id", "attendee.first_name", "attendee.last_name"
-        )), 201
+        return REVIEW(new_review), 201
 
 
 class EventReviews(Resource):
+    @cached_response(reviews_key)
     def get(self, event_id):
-        reviews = Review.query.options(joinedload(Review.attendee)).filter_by(event_id=event_id).all()
-        return [
-            r.to_dict(only=(
-                "id", "rating", "comment", "created_at",
-                "attendee.id", "attendee.first_name", "attendee.last_name"
-            ))
-            for r in reviews
-        ], 200
+        reviews = Review.query.options(*REVIEW.options).filter_by(event_id=event_id).all()
+        return REVIEW.many(reviews), 200
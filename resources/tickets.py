@@ -2,20 +2,17 @@
 
 from flask_restful import Resource, reqparse
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Ticket, Event, User, db
+from models import Ticket, TicketShard, Event, User, db
+from utils.auth import organizer_required
+from utils.cache import cached_response, tickets_key, invalidate_tickets
+from utils.metrics import bump_metric
+from utils.rollups import remove_ticket_sales
+from utils.event_stats import remove_ticket_stats
+from utils.audit import audit_log
+from utils.inventory import shard_ticket, set_ticket_quantity, sold_counts, SHARD_MIN_QUANTITY
+from utils.serializers import Serializer
 from flask import request
 
-# ------------------ Organizer Decorator ------------------
-
-def organizer_required(fn):
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user = User.query.get(get_jwt_identity())
-        if not user or user.role != "organizer":
-            return {"message": "Organizer access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
-
 # ------------------ Parser ------------------
 
 ticket_parser = reqparse.RequestParser()
@@ -23,12 +20,25 @@ ticket_parser.add_argument("type", required=True)
 ticket_parser.add_argument("price", type=float, required=True)
 ticket_parser.add_argument("quantity", type=int, required=True)
 
+# ------------------ Serializers ------------------
+
+# Public, so an explicit field list: a ticket's relationships reach its
+# buyers and their pass codes.
+TICKET = Serializer(Ticket, ("id", "type", "price", "quantity", "sold", "event_id", "created_at"))
+
+
+def ticket_dicts(tickets):
+    """TICKET output with `sold` counted from the shards of sharded tickets."""
+    sold = sold_counts(tickets)
+    return [{**TICKET(t), "sold": sold[t.id]} for t in tickets]
+
 # ------------------ Resources ------------------
 
 class TicketList(Resource):
+    @cached_response(tickets_key)
     def get(self, event_id):
         tickets = Ticket.query.filter_by(event_id=event_id).all()
-        return [t.to_dict() for t in tickets], 200
+        return ticket_dicts(tickets), 200
 
     @organizer_required
     def post(self, event_id):
@@ -50,7 +60,16 @@ class TicketList(Resource):
 
         db.session.add(new_ticket)
         db.session.commit()
-        return new_ticket.to_dict(), 201
+
+        # Big ticket types get hit hardest in a flash sale; spread their counter.
+        if new_ticket.quantity >= SHARD_MIN_QUANTITY:
+            shard_ticket(new_ticket)
+            db.session.commit()
+
+        invalidate_tickets(event_id)
+        audit_log.record("Created ticket", organizer_id, event_id=event_id, ticket_id=new_ticket.id,
+                         type=new_ticket.type, price=new_ticket.price, quantity=new_ticket.quantity)
+        return ticket_dicts([new_ticket])[0], 201
 
 
 class TicketDetail(Resource):
@@ -65,12 +84,25 @@ class TicketDetail(Resource):
             return {"message": "Unauthorized"}, 403
 
         data = request.get_json()
-        for key in ["type", "price", "quantity"]:
+        for key in ["type", "price"]:
             if key in data:
                 setattr(ticket, key, data[key])
+        if "quantity" in data:
+            if not isinstance(data["quantity"], int) or data["quantity"] < 0:
+                db.session.rollback()
+                return {"message": "quantity must be a whole number"}, 400
+            try:
+                set_ticket_quantity(ticket, data["quantity"])
+            except ValueError as e:
+                db.session.rollback()
+                return {"message": str(e)}, 400
 
         db.session.commit()
-        return ticket.to_dict(), 200
+
+        invalidate_tickets(ticket.event_id)
+        audit_log.record("Updated ticket", user_id, event_id=ticket.event_id, ticket_id=ticket.id,
+                         **{k: data[k] for k in ["type", "price", "quantity"] if k in data})
+        return ticket_dicts([ticket])[0], 200
 
     @organizer_required
     def delete(self, id):
@@ -82,6 +114,13 @@ class TicketDetail(Resource):
         if ticket.event.organizer_id != user_id:
             return {"message": "Unauthorized"}, 403
 
+        event_id = ticket.event_id
+        bump_metric("ticket_sales", -sold_counts([ticket])[ticket.id])
+        TicketShard.query.filter_by(ticket_id=ticket.id).delete()
+        remove_ticket_sales(ticket.id)
+        remove_ticket_stats(ticket.id)
         db.session.delete(ticket)
         db.session.commit()
+        invalidate_tickets(event_id)
+        audit_log.record("Deleted ticket", user_id, event_id=event_id, ticket_id=id)
         return {"message": "Ticket deleted successfully"}, 200
\ No newline at end of file
@@ -3,20 +3,15 @@
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, db
-from functools import wraps
+from utils.auth import admin_required, invalidate_principal
+from utils.cache import invalidate_event, invalidate_event_children, invalidate_reviews
+from utils.audit import audit_log
+from utils.accounts import (
+    delete_user, import_users, plaintext_rows, MAX_IMPORT_ROWS, MAX_PLAINTEXT_IMPORT_ROWS
+)
 from flask import request
-
-
-# ----------------- Role-based Decorator -----------------
-def admin_required(fn):
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        user = User.query.get(get_jwt_identity())
-        if not user or user.role != "admin":
-            return {"message": "Admin access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
+import csv
+import io
 
 
 # ----------------- Resources -----------------
@@ -61,8 +56,17 @@ class UserById(Resource):
         if not user:
             return {"message": "User not found"}, 404
 
-        db.session.delete(user)
+        email = user.email
+        event_ids, reviewed_ids = delete_user(user)
         db.session.commit()
+        invalidate_principal(id)
+        actor = get_jwt_identity()
+        audit_log.record("Deleted user", None if actor == id else actor, target_user_id=id, email=email, events=event_ids)
+        for event_id in event_ids:
+            invalidate_event(event_id)
+            invalidate_event_children(event_id)
+        for event_id in reviewed_ids:
+            invalidate_reviews(event_id)
         return {"message": f"User {id} deleted successfully"}, 200
 
 
@@ -79,8 +83,12 @@ class UserStatus(Resource):
         if new_status not in ["active", "banned", "pending"]:
             return {"message": "Invalid status"}, 400
 
+        old_status = user.status
         user.status = new_status
         db.session.commit()
+        invalidate_principal(id)
+        audit_log.record("Banned user" if new_status == "banned" else "Changed user status", get_jwt_identity(),
+                         target_user_id=id, old_status=old_status, new_status=new_status)
         return {"message": f"User status updated to {new_status}"}
 
 
@@ -97,6 +105,35 @@ class UserRole(Resource):
         if new_role not in ["attendee", "organizer", "admin"]:
             return {"message": "Invalid role"}, 400
 
+        old_role = user.role
         user.role = new_role
         db.session.commit()
+        invalidate_principal(id)
+        audit_log.record("Changed role", get_jwt_identity(),
+                         target_user_id=id, old_role=old_role, new_role=new_role)
         return {"message": f"User role updated to {new_role}"}
+
+
+class UserImport(Resource):
+    @admin_required
+    def post(self):
+        # Bulk account creation, as JSON {"users": [{...}, ...]} or a CSV body
+        # (Content-Type: text/csv) with a header row. Fields: first_name,
+        # last_name, email, phone, role (default attendee) and either
+        # password or a bcrypt password_hash.
+        if request.mimetype == "text/csv":
+            records = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+        else:
+            body = request.get_json(silent=True)
+            records = body.get("users") if isinstance(body, dict) else body
+            if not isinstance(records, list):
+                return {"message": "Send {\"users\": [...]} or a text/csv body"}, 400
+        if len(records) > MAX_IMPORT_ROWS:
+            return {"message": f"At most {MAX_IMPORT_ROWS} users per import"}, 400
+        if plaintext_rows(records) > MAX_PLAINTEXT_IMPORT_ROWS:
+            return {"message": f"At most {MAX_PLAINTEXT_IMPORT_ROWS} users with a plaintext password "
+                               "per import; send a bcrypt password_hash for the rest"}, 400
+
+        created, skipped = import_users(records)
+        audit_log.record("Imported users", get_jwt_identity(), created=created, skipped=len(skipped))
+        return {"created": created, "skipped": skipped}, 201 if created else 200
@@ -0,0 +1,81 @@
+# scripts/bench_audit_log.py
+#
+# Compares the cost of audit_log.record() for the caller when every entry is
+# inserted synchronously (AUDIT_FLUSH_INTERVAL=0) and when entries go through
+# the queue and the batching writer thread. Several threads record at once,
+# like concurrent admin requests. After shutdown() every entry must be in
+# logs, including the ones written synchronously under backpressure with
+# --queue-size small.
+#
+#   python scripts/bench_audit_log.py
+#   python scripts/bench_audit_log.py --entries 50000 --threads 16 --queue-size 100
+
+import argparse
+import threading
+import time
+
+from common import build_app, temp_database_url
+from models import db, Log
+from utils.audit import AuditLog
+
+
+def run(app, entries, threads):
+    audit = AuditLog()
+    audit.init_app(app)
+    per_thread = entries // threads
+    latencies = []
+
+    def worker(n):
+        with app.app_context():
+            local = []
+            for i in range(per_thread):
+                started = time.perf_counter()
+                audit.record("Benchmark", None, thread=n, i=i)
+                local.append(time.perf_counter() - started)
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    recorded = time.perf_counter() - started
+    audit.shutdown()
+    written = time.perf_counter() - started
+
+    latencies.sort()
+    with app.app_context():
+        stored = db.session.query(Log).count()
+        db.session.query(Log).delete()
+        db.session.commit()
+    return recorded, written, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], stored
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_audit_log.db"))
+    app.config["AUDIT_QUEUE_SIZE"] = args.queue_size
+    app.config["AUDIT_BATCH_SIZE"] = args.batch_size
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    expected = args.entries // args.threads * args.threads
+    print(f"{'mode':<8}{'record s':>10}{'+ drain s':>11}{'p50 us':>9}{'p99 us':>9}{'rows':>9}")
+    for mode, interval in (("sync", 0), ("queued", 1.0)):
+        app.config["AUDIT_FLUSH_INTERVAL"] = interval
+        recorded, written, p50, p99, stored = run(app, args.entries, args.threads)
+        print(f"{mode:<8}{recorded:>10.2f}{written:>11.2f}{p50 * 1e6:>9.0f}{p99 * 1e6:>9.0f}{stored:>9}")
+        assert stored == expected, f"{mode}: {stored} of {expected} entries written"
+
+
+if __name__ == "__main__":
+    main()
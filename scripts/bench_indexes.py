@@ -0,0 +1,128 @@
+# scripts/bench_indexes.py
+#
+# Seeds a large synthetic dataset, then runs EXPLAIN and a timed execution
+# of each resource's hot query twice: once with only the primary/unique keys
+# and once with the index pack declared in models.py.
+#
+#   python scripts/bench_indexes.py                  # 1M orders on SQLite
+#   python scripts/bench_indexes.py --orders 100000
+#   python scripts/bench_indexes.py --database-url postgresql://...
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from common import build_app, bulk_seed, temp_database_url
+from sqlalchemy import func, select
+from models import db, User, Event, Ticket, Order, OrderItem, Review, Log
+
+
+def hot_queries():
+    now = datetime.now()
+    return [
+        ("EventList.get", select(Event).where(Event.is_approved == True)
+            .order_by(Event.start_time, Event.id).limit(20)),
+        ("PendingEvents.get", select(Event).where(Event.is_approved == False)),
+        ("MyEvents.get", select(Event).where(Event.organizer_id == 7)),
+        ("OrganizerEventsByStatus.get", select(Event)
+            .where(Event.organizer_id == 7, Event.status == "active")),
+        ("OrganizerOverview upcoming", select(func.count(Event.id))
+            .where(Event.organizer_id == 7, Event.start_time > now)),
+        ("OrganizerOverview revenue", select(func.sum(Ticket.price * OrderItem.quantity))
+            .join(OrderItem.ticket).join(Ticket.event).where(Event.organizer_id == 7)),
+        ("AdminDashboard pending count", select(func.count(Event.id)).where(Event.status == "pending")),
+        ("AdminDashboard recent events", select(Event).order_by(Event.created_at.desc()).limit(5)),
+        ("AdminDashboard recent users", select(User).order_by(User.created_at.desc()).limit(5)),
+        ("TicketList.get", select(Ticket).where(Ticket.event_id == 42)),
+        ("OrderList.get", select(Order).where(Order.attendee_id == 600).order_by(Order.created_at)),
+        ("OrderList items", select(OrderItem).where(OrderItem.order_id.in_([10, 20, 30]))),
+        ("AdminReports range", select(Order)
+            .where(Order.created_at >= now - timedelta(days=7), Order.created_at <= now)),
+        ("Hold sweeper", select(Order.id)
+            .where(Order.status == "pending", Order.expires_at <= now).limit(5000)),
+        ("EventReviews.get", select(Review).where(Review.event_id == 42)),
+        ("AddReview duplicate check", select(Review)
+            .where(Review.attendee_id == 600, Review.event_id == 42).limit(1)),
+        ("AdminLogs.get", select(Log).order_by(Log.created_at.desc(), Log.id.desc()).limit(51)),
+        ("AdminLogs by user", select(Log).where(Log.user_id == 7)
+            .order_by(Log.created_at.desc(), Log.id.desc()).limit(51)),
+        ("AdminLogs by action", select(Log).where(Log.action == "Banned user")
+            .order_by(Log.created_at.desc(), Log.id.desc()).limit(51)),
+    ]
+
+
+def secondary_indexes():
+    return [index for table in db.metadata.sorted_tables for index in table.indexes]
+
+
+def explain(stmt):
+    sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    if db.engine.dialect.name == "sqlite":
+        rows = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()
+        return [row[-1] for row in rows]
+    rows = db.session.connection().exec_driver_sql("EXPLAIN " + sql).all()
+    return [row[0] for row in rows]
+
+
+def timed(stmt, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        db.session.execute(stmt).all()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run(label, repeat):
+    print(f"\n==================== {label} ====================")
+    results = {}
+    for name, stmt in hot_queries():
+        plan = explain(stmt)
+        ms = timed(stmt, repeat)
+        results[name] = ms
+        print(f"\n{name}: {ms:.2f} ms")
+        for line in plan:
+            print(f"    {line}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--attendees", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_indexes.db"))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        indexes = secondary_indexes()
+        for index in indexes:
+            index.drop(bind=db.engine)
+
+        started = time.perf_counter()
+        bulk_seed(attendees=args.attendees, events=args.events, orders=args.orders,
+                  reviews=args.orders // 5, logs=args.orders // 5)
+        print(f"Seeded {args.orders} orders in {time.perf_counter() - started:.1f}s")
+
+        before = run("without index pack", args.repeat)
+
+        started = time.perf_counter()
+        for index in indexes:
+            index.create(bind=db.engine)
+        db.session.connection().exec_driver_sql("ANALYZE")
+        db.session.commit()
+        print(f"\nBuilt {len(indexes)} indexes in {time.perf_counter() - started:.1f}s")
+
+        after = run("with index pack", args.repeat)
+
+    print("\n==================== summary (ms) ====================")
+    print(f"{'query':<32}{'before':>10}{'after':>10}{'speedup':>10}")
+    for name, ms in before.items():
+        speedup = ms / after[name] if after[name] else float("inf")
+        print(f"{name:<32}{ms:>10.2f}{after[name]:>10.2f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# scripts/bench_pass_issuance.py
+#
+# Issues EventPasses for group orders the way settlement does: batches of
+# paid orders, each batch through utils/passes.issue_passes() and one commit.
+# Prints passes per second, queries per batch and peak memory, then checks
+# every code is unique and parses back to its order item.
+#
+# For comparison, --baseline passes are issued the usual naive way: a random
+# code, a SELECT to see whether it is taken, and an ORM insert per pass.
+#
+#   python scripts/bench_pass_issuance.py
+#   python scripts/bench_pass_issuance.py --orders 4000 --seats 250 --batch 200
+
+import argparse
+import random
+import resource
+import string
+import time
+
+from common import build_app, bulk_seed, count_queries, temp_database_url
+from sqlalchemy import func, insert, select
+from models import db, EventPass, Order, OrderItem
+from utils.passes import issue_passes, parse_code
+
+
+def seed_group_orders(count, seats):
+    last_id = db.session.scalar(select(func.coalesce(func.max(Order.id), 0)))
+    orders, items = [], []
+    for n in range(1, count + 1):
+        order_id = last_id + n
+        orders.append({"id": order_id, "order_id": f"GROUP-{order_id}", "status": "paid",
+                       "total_amount": 500.0 * seats, "attendee_id": 100 + n % 1000})
+        items.append({"id": order_id, "order_id": order_id, "ticket_id": 1 + n % 200, "quantity": seats})
+    db.session.execute(insert(Order), orders)
+    db.session.execute(insert(OrderItem), items)
+    db.session.commit()
+    return [o["id"] for o in orders]
+
+
+def naive_issue(order_ids, limit):
+    rng = random.Random(1)
+    issued = 0
+    for item in OrderItem.query.filter(OrderItem.order_id.in_(order_ids)):
+        for _ in range(item.quantity):
+            while True:
+                code = "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(10))
+                if not db.session.query(EventPass.id).filter_by(ticket_code=code).first():
+                    break
+            db.session.add(EventPass(ticket_code=code, attendee_first_name="A", attendee_last_name="B",
+                                     attendee_email="a@b.c", attendee_phone="0700000000",
+                                     att_status=False, order_item_id=item.id))
+            issued += 1
+            if issued >= limit:
+                db.session.commit()
+                return issued
+    db.session.commit()
+    return issued
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=4000)
+    parser.add_argument("--seats", type=int, default=250, help="passes per order")
+    parser.add_argument("--batch", type=int, default=200, help="orders per settlement batch")
+    parser.add_argument("--baseline", type=int, default=20000, help="passes to issue the naive way, 0 skips")
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_pass_issuance.db"))
+    app.config["JWT_SECRET_KEY"] = "bench-pass-issuance"
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        bulk_seed(attendees=2000, organizers=50, events=100, orders=0, reviews=0, logs=0)
+        order_ids = seed_group_orders(args.orders, args.seats)
+        total = args.orders * args.seats
+        print(f"{args.orders} orders x {args.seats} seats = {total} passes, {args.batch} orders per batch")
+
+        queries = []
+        started = time.perf_counter()
+        for start in range(0, len(order_ids), args.batch):
+            with count_queries(db.engine) as statements:
+                issue_passes(order_ids[start:start + args.batch])
+                db.session.commit()
+            queries.append(len(statements))
+        elapsed = time.perf_counter() - started
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+        print(f"issued in {elapsed:.1f}s: {total / elapsed:,.0f} passes/s, "
+              f"{max(queries)} queries per batch, peak RSS {peak_rss} MB")
+
+        issued, distinct = db.session.execute(
+            select(func.count(), func.count(func.distinct(EventPass.ticket_code)))
+        ).one()
+        assert issued == distinct == total, (issued, distinct, total)
+        sample = db.session.execute(
+            select(EventPass.ticket_code, EventPass.order_item_id).order_by(func.random()).limit(1000)
+        ).all()
+        assert all(parse_code(code)[0] == item_id for code, item_id in sample)
+        print(f"{issued} codes, all distinct; sampled codes parse back to their order item, e.g. {sample[0][0]}")
+
+        if args.baseline:
+            extra = seed_group_orders(args.baseline // args.seats + 1, args.seats)
+            started = time.perf_counter()
+            count = naive_issue(extra, args.baseline)
+            elapsed = time.perf_counter() - started
+            print(f"naive (random code + SELECT + ORM insert per pass): {count / elapsed:,.0f} passes/s "
+                  f"over {count} passes")
+
+
+if __name__ == "__main__":
+    main()
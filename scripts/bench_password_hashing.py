@@ -0,0 +1,82 @@
+# scripts/bench_password_hashing.py
+#
+# Logins per second through POST /login at several bcrypt costs, with
+# --clients concurrent callers and the hashing pool from utils/passwords.py.
+# Also reports the rate per core the pool is allowed to use, which is the
+# number to size workers with: peak logins/s ~= cores x logins/s/core.
+#
+#   python scripts/bench_password_hashing.py
+#   python scripts/bench_password_hashing.py --rounds 10 12 14 --clients 32 --logins 200
+
+import argparse
+import os
+import threading
+import time
+
+from common import build_app, temp_database_url
+from flask_jwt_extended import JWTManager
+from flask_restful import Api
+from models import db, User
+from resources.auth import Login
+from utils.passwords import passwords
+
+
+def run(client, logins, clients):
+    statuses = []
+    per_client = max(1, logins // clients)
+
+    def worker():
+        local = []
+        for _ in range(per_client):
+            response = client.post("/login", json={"email": "bench@bench.com", "password": "bench-password"})
+            local.append(response.status_code)
+        statuses.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return statuses, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=0, help="hashing threads, 0 = one per CPU")
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_password_hashing.db"))
+    app.config["JWT_SECRET_KEY"] = "bench-password-hashing"
+    app.config["PASSWORD_HASH_WORKERS"] = args.workers
+    app.config["PASSWORD_HASH_TIMEOUT"] = 60
+    JWTManager(app)
+    Api(app).add_resource(Login, "/login")
+    client = app.test_client()
+    workers = args.workers or os.cpu_count() or 1
+
+    print(f"{workers} hashing threads, {args.clients} clients, {os.cpu_count()} CPUs")
+    print(f"{'rounds':>6}{'logins':>8}{'seconds':>9}{'logins/s':>10}{'per core':>10}{'non-200':>9}")
+    for rounds in args.rounds:
+        app.config["BCRYPT_LOG_ROUNDS"] = rounds
+        passwords.init_app(app)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(User(first_name="Bench", last_name="User", email="bench@bench.com",
+                                phone="0799999999", password=passwords.hash("bench-password"), role="attendee"))
+            db.session.commit()
+
+        statuses, elapsed = run(client, args.logins, args.clients)
+        rate = len(statuses) / elapsed
+        cores = min(workers, os.cpu_count() or 1)
+        failed = sum(1 for s in statuses if s != 200)
+        print(f"{rounds:>6}{len(statuses):>8}{elapsed:>9.2f}{rate:>10.1f}{rate / cores:>10.1f}{failed:>9}")
+
+
+if __name__ == "__main__":
+    main()
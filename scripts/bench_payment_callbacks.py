@@ -0,0 +1,139 @@
+# scripts/bench_payment_callbacks.py
+#
+# Replays a burst of Daraja STK callbacks (built by fake_daraja.py) against
+# POST /payments/callback at a fixed offered rate, then drains the inbox with
+# utils/payments.process_all_callbacks. Every seeded order gets one successful
+# callback; --retries of them are delivered again and --declined orders get a
+# cancelled attempt first, like real Daraja traffic.
+#
+# Ack latency is measured from each callback's scheduled send time, so a
+# server that falls behind the offered rate shows it in the percentiles. The
+# run fails unless every order ends up paid exactly once.
+#
+#   python scripts/bench_payment_callbacks.py
+#   python scripts/bench_payment_callbacks.py --orders 50000 --rate 10000 --clients 16
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common import build_app, bulk_seed, temp_database_url
+from fake_daraja import mpesa_receipt, stk_callback
+from flask_restful import Api
+from sqlalchemy import func, text
+from models import db, Order, PaymentCallback
+from resources.payments import STKCallback
+from utils.metrics import read_metrics
+from utils.payments import process_all_callbacks
+
+
+def build_callbacks(orders, retries, declined, rng):
+    bodies = []
+    for checkout_request_id, amount in orders:
+        if rng.random() < declined:
+            bodies.append(stk_callback(checkout_request_id, result_code=1032))
+        body = stk_callback(checkout_request_id, amount, mpesa_receipt(rng))
+        bodies.append(body)
+        if rng.random() < retries:
+            bodies.append(body)
+    rng.shuffle(bodies)
+    return [json.dumps(b) for b in bodies]
+
+
+def replay(client, bodies, rate, clients):
+    latencies = []
+    statuses = []
+    interval = clients / rate
+    started = time.perf_counter()
+
+    def worker(n):
+        local, codes = [], []
+        for i, body in enumerate(bodies[n::clients]):
+            scheduled = started + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            response = client.post("/payments/callback", data=body, content_type="application/json")
+            local.append(time.perf_counter() - scheduled)
+            codes.append(response.status_code)
+        latencies.extend(local)
+        statuses.extend(codes)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return elapsed, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=10000, help="offered callbacks per second")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--retries", type=float, default=0.2, help="share of results delivered twice")
+    parser.add_argument("--declined", type=float, default=0.05, help="share of orders with a cancelled attempt first")
+    parser.add_argument("--tickets", type=int, default=10, help="ticket types the orders are spread over")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_payment_callbacks.db"))
+    Api(app).add_resource(STKCallback, "/payments/callback")
+    client = app.test_client()
+    rng = random.Random(7)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        bulk_seed(attendees=2000, organizers=100, events=2000, orders=args.orders, reviews=0, logs=0)
+        # A burst is one on-sale: orders placed in the last few minutes for
+        # a handful of tickets, all waiting for their payment result.
+        now = datetime.now()
+        db.session.execute(
+            text("UPDATE orders SET status = 'pending', mpesa_receipt = NULL, expires_at = :expires, "
+                 "created_at = :placed, checkout_request_id = 'ws_CO_' || id"),
+            {"expires": now + timedelta(minutes=15), "placed": now - timedelta(minutes=5)},
+        )
+        db.session.execute(text("UPDATE order_items SET ticket_id = 1 + id % :tickets"),
+                           {"tickets": args.tickets})
+        db.session.commit()
+        orders = db.session.query(Order.checkout_request_id, Order.total_amount).all()
+        expected_revenue = sum(amount for _, amount in orders)
+
+    bodies = build_callbacks(orders, args.retries, args.declined, rng)
+    elapsed, latencies, statuses = replay(client, bodies, args.rate, args.clients)
+    failed = sum(1 for s in statuses if s != 200)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"{len(bodies)} callbacks for {len(orders)} orders, offered at {args.rate:.0f}/s by {args.clients} clients")
+    print(f"ingest: {elapsed:.2f}s, {len(bodies) / elapsed:.0f} callbacks/s, non-200: {failed}")
+    print(f"ack latency ms: p50 {pct(0.5):.1f}  p99 {pct(0.99):.1f}  max {latencies[-1] * 1000:.1f}")
+
+    with app.app_context():
+        started = time.perf_counter()
+        processed = process_all_callbacks(args.batch_size)
+        settled = time.perf_counter() - started
+        outcomes = dict(db.session.query(PaymentCallback.outcome, func.count())
+                        .group_by(PaymentCallback.outcome).all())
+        paid = db.session.query(Order).filter(Order.status == "paid").count()
+        revenue = read_metrics(("revenue",))["revenue"]
+
+    print(f"settle: {processed} callbacks in {settled:.2f}s, {processed / settled:.0f} callbacks/s "
+          f"(batch {args.batch_size})")
+    print(f"outcomes: {outcomes}")
+    assert paid == len(orders) == outcomes.get("paid"), (paid, outcomes)
+    assert abs(revenue - expected_revenue) < 0.01, (revenue, expected_revenue)
+    print(f"ok: {paid} orders paid once each, revenue {revenue:.2f}")
+
+
+if __name__ == "__main__":
+    main()
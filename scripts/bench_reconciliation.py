@@ -0,0 +1,177 @@
+# scripts/bench_reconciliation.py
+#
+# Builds a synthetic M-Pesa statement in the org portal's CSV layout and runs
+# utils/reconciliation.py over it, printing throughput and peak memory.
+#
+# Every paid order (with a receipt, as if its callback arrived) gets a row;
+# --lost of the pending orders are paid on the statement but never got their
+# callback, and must end up recovered. A few rows pay the wrong amount, pay an
+# order twice, reverse an earlier payment or belong to no order, and some
+# paid orders are left off the statement, so each issue kind shows up. Bank
+# charges and withdrawals are mixed in and skipped. The statement is written
+# straight to disk, so its size is limited only by the seeded orders.
+#
+# The run fails unless exactly the lost payments are recovered and every
+# planted issue is reported. Memory should not grow with --orders.
+#
+#   python scripts/bench_reconciliation.py
+#   python scripts/bench_reconciliation.py --orders 2000000 --chunk-size 10000
+
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+
+from common import build_app, bulk_seed, temp_database_url
+from sqlalchemy import func, text
+from models import db, Order
+from utils.daraja import account_reference
+from utils.rollups import rebuild_sales_rollups
+from utils.reconciliation import reconcile_statement
+
+PORTAL_HEADER = ("Receipt No.", "Completion Time", "Initiation Time", "Details", "Transaction Status",
+                 "Paid In", "Withdrawn", "Balance", "Balance Confirmed", "Reason Type",
+                 "Other Party Info", "Linked Transaction ID", "A/C No.")
+
+
+def write_statement(path, rng, lost, planted):
+    """Stream one row per order (plus noise) to `path`; count planted issues."""
+    query = db.session.execute(
+        db.select(Order.id, Order.status, Order.mpesa_receipt, Order.total_amount, Order.payment_requested_at)
+        .order_by(Order.id).execution_options(yield_per=20000)
+    )
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        out.write("Account Holder:,Bench Events Ltd\nShort Code:,174379\nAccount:,Utility Account\n\n")
+        writer = csv.writer(out)
+        writer.writerow(PORTAL_HEADER)
+
+        def row(receipt, when, amount, account="", reason="Pay Bill Online", linked="", withdrawn=""):
+            nonlocal rows
+            rows += 1
+            writer.writerow((receipt, f"{when:%d-%m-%Y %H:%M:%S}", f"{when:%d-%m-%Y %H:%M:%S}",
+                             f"Pay Bill Online from 2547{rng.randrange(10**8):08d}", "Completed",
+                             f"{amount:,.2f}" if amount else "", withdrawn, "", "True", reason,
+                             "2547XXXXXX - Customer", linked, account))
+
+        for order_id, status, receipt, amount, paid_at in query:
+            account = account_reference(order_id)
+            if status == "paid":
+                if rng.random() < 0.001:
+                    planted["not_in_statement"] += 1
+                    continue
+                if rng.random() < 0.001:
+                    planted["amount_mismatch"] += 1
+                    amount -= 100
+                row(receipt, paid_at, amount, account)
+                if rng.random() < 0.0005:
+                    planted["duplicate_payment"] += 1
+                    row(f"D{order_id:09d}", paid_at + timedelta(minutes=2), amount, account)
+                if rng.random() < 0.0005:
+                    planted["reversed"] += 1
+                    row(f"V{order_id:09d}", paid_at + timedelta(days=1), 0, reason="Reversal",
+                        linked=receipt, withdrawn=f"{amount:,.2f}")
+            elif status == "pending" and rng.random() < lost:
+                planted["recovered"] += 1
+                row(f"L{order_id:09d}", paid_at, amount, account)
+            elif status == "expired" and rng.random() < 0.001:
+                planted["paid_after_expiry"] += 1
+                row(f"X{order_id:09d}", paid_at, amount, account)
+            if rng.random() < 0.05:
+                row(f"C{order_id:09d}", paid_at, 0, reason="Business Charge", withdrawn="0.50")
+            if rng.random() < 0.001:
+                planted["unmatched_payment"] += 1
+                row(f"U{order_id:09d}", paid_at, 250, f"INV{order_id}")
+    db.session.rollback()
+    return rows
+
+
+def seed(args):
+    """Fill the database and write the statement; prints the planted counts as JSON."""
+    app = build_app(args.database_url)
+    rng = random.Random(7)
+    planted = dict.fromkeys(("recovered", "amount_mismatch", "duplicate_payment", "reversed",
+                             "paid_after_expiry", "unmatched_payment", "not_in_statement"), 0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        bulk_seed(attendees=5000, organizers=100, events=1000, orders=args.orders, reviews=0, logs=0)
+        # As if Daraja had been in use: pushed orders, receipts on the paid ones.
+        db.session.execute(text(
+            "UPDATE orders SET payment_requested_at = created_at, "
+            "mpesa_receipt = CASE WHEN status = 'paid' THEN 'R' || substr('00000000' || id, -9) END"
+        ))
+        rebuild_sales_rollups()
+        db.session.commit()
+        planted["rows"] = write_statement(args.statement, rng, args.lost, planted)
+    print(json.dumps(planted))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=500000)
+    parser.add_argument("--lost", type=float, default=0.05, help="share of pending orders whose callback was lost")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--database-url")
+    parser.add_argument("--statement", help=argparse.SUPPRESS)
+    parser.add_argument("--seed-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.seed_only:
+        seed(args)
+        return
+
+    # Seeding holds every row in memory at some point, so it runs in its own
+    # process and the peak RSS below is the reconciliation's alone.
+    directory = tempfile.mkdtemp()
+    database_url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench_reconciliation.db')}"
+    statement = os.path.join(directory, "statement.csv")
+    report = os.path.join(directory, "statement-issues.csv")
+    seeded = subprocess.run(
+        [sys.executable, __file__, "--seed-only", "--orders", str(args.orders), "--lost", str(args.lost),
+         "--database-url", database_url, "--statement", statement],
+        check=True, stdout=subprocess.PIPE, text=True,
+    )
+    planted = json.loads(seeded.stdout.strip().splitlines()[-1])
+    rows = planted.pop("rows")
+    print(f"{args.orders} orders, {rows} statement rows "
+          f"({os.path.getsize(statement) / 2**20:.0f} MB), chunks of {args.chunk_size}")
+
+    app = build_app(database_url)
+    with app.app_context():
+        with open(statement, newline="", encoding="utf-8") as lines, \
+                open(report, "w", newline="", encoding="utf-8") as out:
+            summary = reconcile_statement(lines, out, args.chunk_size)
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+        print(f"{summary['seconds']}s, {summary['rows_per_second']} rows/s, peak RSS {peak_rss} MB")
+        print(f"matched {summary['matched']}, recovered {summary['recovered']}")
+        for kind, count in summary["issues"].items():
+            print(f"  {kind}: {count}")
+        print(f"issues written to {report}")
+
+        issues = summary["issues"]
+        assert summary["recovered"] == planted["recovered"], (summary["recovered"], planted)
+        for kind, count in planted.items():
+            if kind != "recovered":
+                assert issues.get(kind, 0) == count, (kind, issues.get(kind), count)
+        unreconciled = db.session.scalar(
+            db.select(func.count()).select_from(Order)
+            .where(Order.status == "paid", Order.reconciled_at.is_(None))
+        )
+        assert unreconciled == planted["not_in_statement"], unreconciled
+
+        # A second pass finds nothing new to recover.
+        with open(statement, newline="", encoding="utf-8") as lines:
+            again = reconcile_statement(lines, None, args.chunk_size)
+        assert again["recovered"] == 0, again
+        print(f"second run: {again['seconds']}s, {again['rows_per_second']} rows/s, nothing to recover")
+
+
+if __name__ == "__main__":
+    main()
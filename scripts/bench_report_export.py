@@ -0,0 +1,77 @@
+# scripts/bench_report_export.py
+#
+# Streams GET /admin/reports?format=csv|ndjson over growing order counts and
+# reports the peak Python memory (tracemalloc) while consuming the response.
+# With streaming the peak should stay flat as the row count grows; the JSON
+# mode is measured at the smallest size for comparison. "stored MB" is what a
+# report job (utils/reports.py) keeps in Report.report_data for the same output.
+#
+#   python scripts/bench_report_export.py
+#   python scripts/bench_report_export.py --sizes 100000 1000000
+
+import argparse
+import time
+import tracemalloc
+
+from common import build_app, bulk_seed, temp_database_url
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restful import Api
+from models import db, User
+from resources.admin import AdminReports
+from utils.reports import REPORT_COLUMNS, compress_report, export_rows, report_orders
+
+
+def consume(client, path, headers):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(path, headers=headers, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50000, 200000, 500000])
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_report_export.db"))
+    app.config["JWT_SECRET_KEY"] = "bench-report-export"
+    JWTManager(app)
+    Api(app).add_resource(AdminReports, "/admin/reports")
+    client = app.test_client()
+
+    print(f"{'orders':>8} {'format':<7}{'MB out':>9}{'seconds':>9}{'peak MB':>9}{'stored MB':>11}{'job s':>8}")
+    for n, orders in enumerate(args.sizes):
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            bulk_seed(attendees=5000, events=2000, orders=orders, reviews=0, logs=0)
+            admin = User(first_name="Admin", last_name="Bench", email="admin@bench.com",
+                         phone="0799999999", password="x", role="admin")
+            db.session.add(admin)
+            db.session.commit()
+            headers = {"Authorization": "Bearer " + create_access_token(identity=admin.id)}
+
+        formats = ("csv", "ndjson", "json") if n == 0 else ("csv", "ndjson")
+        for fmt in formats:
+            path = "/admin/reports" if fmt == "json" else f"/admin/reports?format={fmt}"
+            size, elapsed, peak = consume(client, path, headers)
+            stored = job_seconds = ""
+            if fmt != "json":
+                with app.app_context():
+                    started = time.perf_counter()
+                    data, _ = compress_report(export_rows(report_orders()), REPORT_COLUMNS, fmt)
+                    job_seconds = f"{time.perf_counter() - started:.2f}"
+                    stored = f"{len(data) / 1e6:.1f}"
+            print(f"{orders:>8} {fmt:<7}{size / 1e6:>9.1f}{elapsed:>9.2f}{peak / 1e6:>9.1f}{stored:>11}{job_seconds:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# scripts/bench_rollups.py
+#
+# Times the sales chart queries read from the rollup tables
+# (utils/rollups.py) against computing the same series from orders, and
+# checks both give the same numbers. Seeded orders are all marked paid.
+#
+#   python scripts/bench_rollups.py
+#   python scripts/bench_rollups.py --orders 1000000 --repeat 5
+
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from common import build_app, bulk_seed, temp_database_url
+from sqlalchemy import func, update
+from models import db, Event, Ticket, Order, OrderItem
+from utils.event_stats import LINE_REVENUE
+from utils.rollups import (
+    STEPS, bucket_start, rebuild_sales_rollups, platform_sales_series, organizer_sales_series
+)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return result, min(times) * 1000
+
+
+def scan_series(granularity, start, end, organizer_id=None):
+    """The series computed straight from orders, bucketed in Python."""
+    query = db.session.query(
+        Order.id, Order.created_at, func.sum(OrderItem.quantity), func.sum(LINE_REVENUE)
+    ).join(Order.order_items).join(OrderItem.ticket)\
+        .filter(Order.status == "paid", Order.created_at >= start, Order.created_at < end)\
+        .group_by(Order.id, Order.created_at)
+    if organizer_id is not None:
+        query = query.join(Ticket.event).filter(Event.organizer_id == organizer_id)
+    buckets = defaultdict(lambda: [0, 0, 0])
+    for _, created_at, quantity, revenue in query:
+        totals = buckets[bucket_start(created_at, granularity)]
+        totals[0] += 1
+        totals[1] += quantity
+        totals[2] += revenue
+    series = []
+    bucket = start
+    while bucket < end:
+        orders, tickets, revenue = buckets.get(bucket, (0, 0, 0))
+        series.append({"bucket": bucket.isoformat(), "orders": orders, "tickets": tickets, "revenue": revenue})
+        bucket += STEPS[granularity]
+    return series
+
+
+def same(a, b):
+    return len(a) == len(b) and all(
+        x["bucket"] == y["bucket"] and x["orders"] == y["orders"] and x["tickets"] == y["tickets"]
+        and abs(x["revenue"] - y["revenue"]) < 1e-6
+        for x, y in zip(a, b)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_rollups.db"))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        bulk_seed(orders=args.orders, reviews=0, logs=0)
+        db.session.execute(update(Order).values(status="paid"))
+        started = time.perf_counter()
+        rebuild_sales_rollups()
+        db.session.commit()
+        print(f"rebuild_sales_rollups: {time.perf_counter() - started:.1f}s for {args.orders} orders\n")
+
+        now = datetime.now()
+        day_end = bucket_start(now, "day") + STEPS["day"]
+        hour_end = bucket_start(now, "hour") + STEPS["hour"]
+        cases = [
+            ("platform, day x 365", "day", day_end - 365 * STEPS["day"], day_end, None),
+            ("platform, hour x 744", "hour", hour_end - 744 * STEPS["hour"], hour_end, None),
+            ("organizer 7, day x 365", "day", day_end - 365 * STEPS["day"], day_end, 7),
+            ("organizer 7, hour x 744", "hour", hour_end - 744 * STEPS["hour"], hour_end, 7),
+        ]
+
+        print(f"{'series':<26}{'scan ms':>10}{'rollup ms':>11}{'speedup':>9}")
+        for label, granularity, start, end, organizer_id in cases:
+            if organizer_id is None:
+                read = lambda: platform_sales_series(granularity, start, end)
+            else:
+                read = lambda: organizer_sales_series(organizer_id, granularity, start, end)
+            expected, slow = best_of(lambda: scan_series(granularity, start, end, organizer_id), args.repeat)
+            series, fast = best_of(read, args.repeat)
+            assert same(series, expected), label
+            print(f"{label:<26}{slow:>10.1f}{fast:>11.1f}{slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# scripts/bench_search.py
+#
+# Latency of /events/search at catalog scale. Seeds events, builds the
+# full-text index, then times search_events() (ranked page + total + both
+# facets, i.e. everything EventSearch.get runs) over a mix of queries, then
+# checks each query's first page against a full ranking of its matches.
+#
+#   python scripts/bench_search.py --events 1000000
+#   python scripts/bench_search.py --database-url postgresql://...
+
+import argparse
+import random
+import time
+
+from common import build_app, bulk_seed, temp_database_url
+from sqlalchemy import text
+from models import db
+from utils.search import _matches, ensure_search_index, query_tokens, rebuild_search_index, search_events
+
+QUERIES = [
+    ("music", None, None), ("tech event", None, None), ("sports", "Sports", None),
+    ("food", None, "family"), ("art event 12", None, None), ("business", None, "networking"),
+    ("even", None, None), ("synthetic benchmarking", "Music", None), ("festival", None, None),
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def assert_best_first(q, category, tag, limit=20):
+    """The page search_events() returns must be the top of a full ranking."""
+    matches, id_column, score, params = _matches(query_tokens(q), category, tag)
+    everything = db.session.execute(text(f"SELECT {score} {matches}"), params).scalars().all()
+    best = sorted(everything, reverse=True)[:limit]
+    events, _, _, _ = search_events(q, category=category, tag=tag, limit=limit)
+    got = [event["score"] for event in events]
+    assert got == best, f"{q!r}: page scores {got[:3]}... but the best matches score {best[:3]}..."
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_search.db"))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        ensure_search_index(db.session.connection())
+
+        started = time.perf_counter()
+        bulk_seed(attendees=100, organizers=100, events=args.events, orders=0, reviews=0, logs=0)
+        rebuild_search_index()
+        db.session.commit()
+        print(f"Seeded and indexed {args.events} events in {time.perf_counter() - started:.1f}s")
+
+        rng = random.Random(7)
+        samples = {}
+        for _ in range(args.searches):
+            q, category, tag = rng.choice(QUERIES)
+            started = time.perf_counter()
+            events, total, facets, _ = search_events(q, category=category, tag=tag, limit=20)
+            samples.setdefault(q, []).append((time.perf_counter() - started) * 1000)
+
+        for q, category, tag in QUERIES:
+            assert_best_first(q, category, tag)
+
+    everything = [ms for runs in samples.values() for ms in runs]
+    print(f"\n{'query':<26}{'runs':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for q, runs in samples.items():
+        print(f"{q:<26}{len(runs):>6}{percentile(runs, 50):>10.2f}{percentile(runs, 99):>10.2f}")
+    print(f"{'all':<26}{len(everything):>6}{percentile(everything, 50):>10.2f}{percentile(everything, 99):>10.2f}")
+    print("ok: every query's first page holds its best-scoring matches")
+
+
+if __name__ == "__main__":
+    main()
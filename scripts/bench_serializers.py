@@ -0,0 +1,117 @@
+# scripts/bench_serializers.py
+#
+# Compares SerializerMixin.to_dict(only=...) with the compiled serializers in
+# utils/serializers.py. Checks that both produce the same dicts first, then
+# times them on:
+#   - every model in models.py, 10k in-memory instances serialized column by column
+#   - the hot endpoint schemas (OrderList, EventReviews, EventDetail) on
+#     seeded rows, plus EventList's column-projected row path
+#
+#   python scripts/bench_serializers.py
+#   python scripts/bench_serializers.py --rows 50000 --repeat 5
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from common import build_app, bulk_seed, temp_database_url
+from sqlalchemy import Boolean, DateTime, Float, Integer, inspect
+from sqlalchemy.orm import joinedload
+from models import db, Event, Order, Review
+from utils.serializers import Serializer
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000
+
+
+def synthetic(model, n):
+    """n transient instances with every column filled in.
+
+    Values go straight into the instance dict, skipping the @validates hooks,
+    which reject the synthetic emails and phone numbers.
+    """
+    now = datetime(2030, 1, 1, 12, 0, 0)
+    mapper = inspect(model)
+    columns = mapper.columns
+    objs = []
+    for i in range(n):
+        values = {}
+        for column in columns:
+            if isinstance(column.type, DateTime):
+                values[column.key] = now + timedelta(minutes=i)
+            elif isinstance(column.type, Boolean):
+                values[column.key] = i % 2 == 0
+            elif isinstance(column.type, Float):
+                values[column.key] = i * 1.5
+            elif isinstance(column.type, Integer):
+                values[column.key] = i
+            else:
+                values[column.key] = f"{column.key}-{i}"
+        obj = mapper.class_manager.new_instance()
+        obj.__dict__.update(values)
+        objs.append(obj)
+    return objs
+
+
+def compare(label, objs, fields, serializer, repeat):
+    assert [o.to_dict(only=fields) for o in objs[:100]] == serializer.many(objs[:100]), label
+    slow = best_of(lambda: [o.to_dict(only=fields) for o in objs], repeat)
+    fast = best_of(lambda: serializer.many(objs), repeat)
+    print(f"{label:<28}{len(objs):>8}{slow:>12.1f}{fast:>12.1f}{slow / fast:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_serializers.db"))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        print(f"{'schema':<28}{'rows':>8}{'to_dict ms':>12}{'compiled ms':>12}{'speedup':>10}")
+        for mapper in sorted(db.Model.registry.mappers, key=lambda m: m.class_.__name__):
+            model = mapper.class_
+            fields = tuple(c.key for c in mapper.columns if c.key != "password")
+            compare(model.__name__, synthetic(model, args.rows), fields, Serializer(model, fields), args.repeat)
+
+        bulk_seed(attendees=args.rows, events=args.rows, orders=args.rows, reviews=args.rows, logs=0)
+        db.session.commit()
+
+        from resources.orders import ORDER
+        from resources.reviews import REVIEW
+        from resources.events import EVENT_DETAIL, event_list_serializer, EVENT_LIST_FIELDS
+
+        orders = Order.query.options(*ORDER.options).limit(args.rows).all()
+        compare("OrderList.get", orders, ORDER.fields, ORDER, args.repeat)
+
+        reviews = Review.query.options(*REVIEW.options).limit(args.rows).all()
+        compare("EventReviews.get", reviews, REVIEW.fields, REVIEW, args.repeat)
+
+        events = Event.query.options(*EVENT_DETAIL.options).limit(args.rows).all()
+        compare("EventDetail.get", events, EVENT_DETAIL.fields, EVENT_DETAIL, args.repeat)
+
+        # EventList never loads ORM objects: query + serialize rows vs query
+        # full objects + to_dict.
+        serializer = event_list_serializer(EVENT_LIST_FIELDS)
+        rows_query = serializer.query().order_by(Event.start_time, Event.id).limit(args.rows)
+        objs_query = Event.query.options(joinedload(Event.organizer))\
+            .order_by(Event.start_time, Event.id).limit(args.rows)
+        assert serializer.rows(rows_query.limit(100).all()) == \
+            [e.to_dict(only=serializer.fields) for e in objs_query.limit(100).all()]
+        slow = best_of(lambda: [e.to_dict(only=serializer.fields) for e in objs_query.all()], args.repeat)
+        fast = best_of(lambda: serializer.rows(rows_query.all()), args.repeat)
+        print(f"{'EventList.get (with query)':<28}{args.rows:>8}{slow:>12.1f}{fast:>12.1f}{slow / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# scripts/bench_stk_push.py
+#
+# How many POST /payments/stk-push requests a fixed number of sync web
+# workers (gunicorn's default worker class: one request per worker at a
+# time) get through when the gateway is slow. The gateway is
+# fake_daraja.FakeGateway with --latency per push.
+#
+# "inline" sends the push inside the request (MPESA_PUSH_WORKERS=0), so every
+# web worker is held for the whole round trip. "async" claims the order,
+# answers 202 and leaves the push to the utils/daraja.py pool. For both it
+# prints request throughput and latency, how long until every push was
+# accepted, and how many OAuth tokens and TCP connections the client used.
+#
+#   python scripts/bench_stk_push.py
+#   python scripts/bench_stk_push.py --orders 2000 --latency 1.0 --web-workers 4 --concurrency 32
+
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common import build_app, bulk_seed, temp_database_url
+from fake_daraja import FakeGateway, serve_gateway
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restful import Api
+from sqlalchemy import text
+from models import db, Order
+from resources.payments import STKPush, PaymentStatus
+from utils.daraja import daraja
+
+
+def reset_orders():
+    db.session.execute(
+        text("UPDATE orders SET status = 'pending', mpesa_receipt = NULL, checkout_request_id = NULL, "
+             "payment_status = NULL, payment_error = NULL, payment_requested_at = NULL, expires_at = :expires"),
+        {"expires": datetime.now() + timedelta(minutes=15)},
+    )
+    db.session.commit()
+
+
+def run(app, client, headers, order_ids, web_workers):
+    latencies, statuses = [], []
+
+    def worker(n):
+        local, codes = [], []
+        for order_id in order_ids[n::web_workers]:
+            started = time.perf_counter()
+            response = client.post("/payments/stk-push", json={"order_id": order_id}, headers=headers)
+            local.append(time.perf_counter() - started)
+            codes.append(response.status_code)
+        latencies.extend(local)
+        statuses.extend(codes)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(web_workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    answered = time.perf_counter() - started
+
+    with app.app_context():
+        while db.session.query(Order).filter(Order.payment_status == "pushing").count():
+            db.session.rollback()
+            time.sleep(0.05)
+        waiting = db.session.query(Order).filter(Order.payment_status == "awaiting_callback").count()
+    pushed = time.perf_counter() - started
+    latencies.sort()
+    return answered, pushed, latencies, statuses, waiting
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds the gateway takes per push")
+    parser.add_argument("--web-workers", type=int, default=4, help="simulated sync gunicorn workers")
+    parser.add_argument("--concurrency", type=int, default=16, help="MPESA_PUSH_WORKERS for the async run")
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_stk_push.db"))
+    app.config.update(
+        JWT_SECRET_KEY="bench-stk-push",
+        MPESA_CONSUMER_KEY="key", MPESA_CONSUMER_SECRET="secret", MPESA_SHORTCODE="174379",
+        MPESA_PASSKEY="passkey", MPESA_CALLBACK_URL="http://127.0.0.1:1/payments/callback",
+        MPESA_MAX_PENDING=args.orders,
+    )
+    JWTManager(app)
+    api = Api(app)
+    api.add_resource(STKPush, "/payments/stk-push")
+    api.add_resource(PaymentStatus, "/payments/<string:order_id>")
+    client = app.test_client()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        bulk_seed(attendees=1000, organizers=50, events=100, orders=args.orders, reviews=0, logs=0)
+        order_ids = [o for (o,) in db.session.query(Order.order_id).order_by(Order.id)]
+        headers = {"Authorization": "Bearer " + create_access_token(identity=1)}
+
+    print(f"{args.orders} pushes, gateway latency {args.latency * 1000:.0f} ms, {args.web_workers} web workers")
+    print(f"{'mode':<8}{'req/s':>8}{'p50 ms':>8}{'p99 ms':>8}{'all pushed s':>14}{'pushes/s':>10}"
+          f"{'tokens':>8}{'conns':>7}{'non-202':>9}")
+    for mode, workers in (("inline", 0), ("async", args.concurrency)):
+        gateway = FakeGateway(latency=args.latency)
+        server = serve_gateway(gateway)
+        app.config["MPESA_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+        app.config["MPESA_PUSH_WORKERS"] = workers
+        daraja.init_app(app)
+        with app.app_context():
+            reset_orders()
+
+        answered, pushed, latencies, statuses, waiting = run(app, client, headers, order_ids, args.web_workers)
+        server.shutdown()
+        failed = sum(1 for s in statuses if s != 202)
+        assert waiting == gateway.pushes == args.orders, (waiting, gateway.pushes)
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"{mode:<8}{len(statuses) / answered:>8.1f}{p50:>8.1f}{p99:>8.1f}{pushed:>14.2f}"
+              f"{args.orders / pushed:>10.1f}{len(gateway.tokens):>8}{gateway.connections:>7}{failed:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# scripts/bench_user_import.py
+#
+# Times utils/accounts.import_users (validation, two IN lookups and one
+# executemany per batch) against adding the same accounts one ORM object and
+# one commit at a time, and counts the statements a single POST /signup
+# issues. Imported records carry a bcrypt password_hash so the numbers are
+# about the database work, not hashing.
+#
+#   python scripts/bench_user_import.py
+#   python scripts/bench_user_import.py --users 100000
+
+import argparse
+import time
+
+import bcrypt
+from common import build_app, count_queries, temp_database_url
+from flask_jwt_extended import JWTManager
+from flask_restful import Api
+from models import db, User
+from resources.auth import Register
+from utils.accounts import import_users
+from utils.passwords import passwords
+
+
+def records(n, prefix, password_hash):
+    return [{
+        "first_name": "Import",
+        "last_name": f"User{i}",
+        "email": f"{prefix}{i}@import.com",
+        "phone": f"07{prefix[0]}{i:07d}",
+        "password_hash": password_hash,
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("bench_user_import.db"))
+    app.config["JWT_SECRET_KEY"] = "bench-user-import"
+    app.config["BCRYPT_LOG_ROUNDS"] = 4
+    JWTManager(app)
+    passwords.init_app(app)
+    Api(app).add_resource(Register, "/signup")
+    password_hash = bcrypt.hashpw(b"imported", bcrypt.gensalt(4)).decode()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        started = time.perf_counter()
+        for record in records(args.users, "a", password_hash):
+            db.session.add(User(password=record.pop("password_hash"), **record))
+            db.session.commit()
+        one_by_one = time.perf_counter() - started
+
+        started = time.perf_counter()
+        created, skipped = import_users(records(args.users, "b", password_hash))
+        bulk = time.perf_counter() - started
+        assert created == args.users and not skipped, skipped
+
+        started = time.perf_counter()
+        created, skipped = import_users(records(args.users, "b", password_hash))
+        rejected = time.perf_counter() - started
+        assert created == 0 and len(skipped) == args.users
+
+    print(f"{'import':<32}{'users':>8}{'seconds':>9}{'users/s':>10}")
+    print(f"{'ORM add + commit per user':<32}{args.users:>8}{one_by_one:>9.2f}{args.users / one_by_one:>10.0f}")
+    print(f"{'import_users':<32}{args.users:>8}{bulk:>9.2f}{args.users / bulk:>10.0f}")
+    print(f"{'import_users, all duplicates':<32}{args.users:>8}{rejected:>9.2f}{args.users / rejected:>10.0f}")
+
+    client = app.test_client()
+    body = {"first_name": "New", "last_name": "User", "email": "new@signup.com", "phone": "0711111111",
+            "password": "pw", "role": "attendee"}
+    with app.app_context():
+        for label, payload in (("new account", body), ("duplicate email", {**body, "phone": "0722222222"})):
+            with count_queries(db.engine) as statements:
+                status = client.post("/signup", json=payload).status_code
+            print(f"POST /signup, {label}: {status}, {len(statements)} statements "
+                  f"({', '.join(s.split()[0] for s in statements)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# scripts/check_query_counts.py
+#
+# Asserts that the order endpoints run a constant number of SQL statements
+# however long the attendee's history is. Attendees get 1, 20 and 200
+# orders with two line items each (tickets of different events); the script
+# fails if /orders or /orders/<id> needs more statements for a bigger history.
+#
+# Then seeds --report-orders orders (every third with a second line item)
+# and checks that an /admin/reports page is a single statement with one row
+# per order, on the first page, a cursor page and a filtered page.
+#
+#   python scripts/check_query_counts.py
+#   python scripts/check_query_counts.py --database-url postgresql://...
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from common import build_app, bulk_seed, count_queries, temp_database_url
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restful import Api
+from sqlalchemy import insert
+from models import db, User, Event, Ticket, Order, OrderItem
+from resources.orders import OrderList, OrderDetail, ORDER
+from resources.admin import AdminReports
+
+HISTORY_SIZES = (1, 20, 200)
+
+
+def seed():
+    now = datetime.now()
+    db.session.execute(insert(User), [{
+        "id": i, "first_name": f"User{i}", "last_name": "Check", "email": f"user{i}@check.com",
+        "phone": f"07{i:08d}", "password": "x", "role": "organizer" if i == 1 else "attendee",
+    } for i in range(1, len(HISTORY_SIZES) + 2)])
+    db.session.execute(insert(Event), [{
+        "id": i, "title": f"Event {i}", "description": "d", "location": "Nairobi",
+        "start_time": now, "end_time": now + timedelta(hours=2), "organizer_id": 1, "is_approved": True,
+    } for i in range(1, 51)])
+    db.session.execute(insert(Ticket), [{
+        "id": i, "type": "Regular", "price": 100.0, "quantity": 100000, "event_id": i,
+    } for i in range(1, 51)])
+
+    orders, items = [], []
+    for attendee_id, size in enumerate(HISTORY_SIZES, start=2):
+        for _ in range(size):
+            order_id = len(orders) + 1
+            orders.append({
+                "id": order_id, "order_id": f"CHECK-{order_id}", "status": "paid", "total_amount": 200.0,
+                "created_at": now, "attendee_id": attendee_id,
+            })
+            for k in range(2):
+                items.append({"order_id": order_id, "ticket_id": (2 * order_id + k) % 50 + 1, "quantity": 1})
+    db.session.execute(insert(Order), orders)
+    db.session.execute(insert(OrderItem), items)
+    db.session.commit()
+
+
+def measure(client, path, user_id):
+    headers = {"Authorization": "Bearer " + create_access_token(identity=user_id)}
+    with count_queries(db.engine) as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, (path, response.status_code, response.json)
+    return len(statements)
+
+
+def check_reports(client, report_orders):
+    db.drop_all()
+    db.create_all()
+    bulk_seed(attendees=5000, events=2000, orders=report_orders, reviews=0, logs=0)
+    # Second line items, on a different event, for every third order.
+    tickets = db.session.query(Ticket.id).count()
+    db.session.execute(insert(OrderItem), [
+        {"order_id": o, "ticket_id": (o * 7) % tickets + 1, "quantity": 1}
+        for o in range(1, report_orders + 1, 3)
+    ])
+    admin = User(first_name="Admin", last_name="Check", email="admin@check.com",
+                 phone="0799999999", password="x", role="admin")
+    db.session.add(admin)
+    db.session.commit()
+
+    headers = {"Authorization": "Bearer " + create_access_token(identity=admin.id)}
+    client.get("/admin/reports?limit=1", headers=headers)  # warm the principal cache
+
+    print(f"\n{report_orders} orders, /admin/reports")
+    ok = True
+    cursor = None
+    for label, path in (
+        ("first page", "/admin/reports?limit=500"),
+        ("next page", None),
+        ("event_name filter", "/admin/reports?limit=500&event_name=music"),
+        ("date range", "/admin/reports?limit=500&start_date=2000-01-01&end_date=2100-01-01"),
+    ):
+        path = path or f"/admin/reports?limit=500&cursor={cursor}"
+        with count_queries(db.engine) as statements:
+            response = client.get(path, headers=headers)
+        assert response.status_code == 200, (path, response.json)
+        cursor = cursor or response.headers.get("X-Next-Cursor")
+        ids = [row["order_id"] for row in response.json]
+        duplicates = len(ids) - len(set(ids))
+        multi = sum(1 for row in response.json if len(row["events"]) > 1)
+        print(f"  {label:<18} statements={len(statements)} rows={len(ids)} "
+              f"duplicates={duplicates} multi-event rows={multi}")
+        ok = ok and len(statements) <= 2 and duplicates == 0
+    return ok
+
+
+def lazy_baseline(user_id):
+    """What OrderList.get cost before: no loader options."""
+    db.session.expunge_all()
+    with count_queries(db.engine) as statements:
+        ORDER.many(Order.query.filter_by(attendee_id=user_id).all())
+    db.session.rollback()
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report-orders", type=int, default=100000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("check_query_counts.db"))
+    app.config["JWT_SECRET_KEY"] = "check-query-counts"
+    JWTManager(app)
+    api = Api(app)
+    api.add_resource(OrderList, "/orders")
+    api.add_resource(OrderDetail, "/orders/<int:id>")
+    api.add_resource(AdminReports, "/admin/reports")
+    client = app.test_client()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed()
+
+        print(f"{'orders':>8}{'lazy':>8}{'/orders':>10}{'/orders/<id>':>14}")
+        list_counts, detail_counts = set(), set()
+        for attendee_id, size in enumerate(HISTORY_SIZES, start=2):
+            last_order = db.session.query(Order.id).filter_by(attendee_id=attendee_id)\
+                .order_by(Order.id.desc()).limit(1).scalar()
+            lazy = lazy_baseline(attendee_id)
+            listed = measure(client, "/orders", attendee_id)
+            detail = measure(client, f"/orders/{last_order}", attendee_id)
+            list_counts.add(listed)
+            detail_counts.add(detail)
+            print(f"{size:>8}{lazy:>8}{listed:>10}{detail:>14}")
+
+        reports_ok = check_reports(client, args.report_orders)
+
+    if len(list_counts) > 1 or len(detail_counts) > 1:
+        print("FAIL: statement count grows with order history")
+        sys.exit(1)
+    if not reports_ok:
+        print("FAIL: /admin/reports needs more than two statements or repeats orders")
+        sys.exit(1)
+    print("OK: constant statement count")
+
+
+if __name__ == "__main__":
+    main()
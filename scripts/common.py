@@ -0,0 +1,169 @@
+# scripts/common.py
+#
+# Shared setup for the load tests and benchmarks in this folder. They run
+# against a throwaway Flask app so they never touch development.db.
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+from models import db
+
+
+def temp_database_url(name):
+    return f"sqlite:///{os.path.join(tempfile.mkdtemp(), name)}"
+
+
+def build_app(database_url):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["PASS_CODE_SECRET"] = "bench-pass-codes"  # paying an order issues passes
+    if database_url.startswith("sqlite"):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 60}}
+    db.init_app(app)
+    if database_url.startswith("sqlite"):
+        with app.app_context():
+            event.listen(db.engine, "connect", _sqlite_pragmas)
+    return app
+
+
+def _sqlite_pragmas(dbapi_connection, _):
+    # WAL lets readers run alongside the single writer; NORMAL sync avoids an
+    # fsync per commit, which is what production Postgres is closer to anyway.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect the SQL statements run on `engine` inside the block.
+
+        with count_queries(db.engine) as statements:
+            client.get("/orders")
+        assert len(statements) <= 3, statements
+    """
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def bulk_seed(attendees=10000, organizers=500, events=20000, orders=100000,
+              reviews=20000, logs=20000, chunk=20000, seed=42):
+    """Fill an empty schema with synthetic rows using executemany inserts.
+
+    Orders get one OrderItem each and are spread over the last year. Must be
+    called inside an app context after db.create_all().
+    """
+    import random
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from models import User, Event, Ticket, Order, OrderItem, Review, Log
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    year_ago = now - timedelta(days=365)
+
+    def write(model, rows):
+        for start in range(0, len(rows), chunk):
+            db.session.execute(insert(model), rows[start:start + chunk])
+        db.session.commit()
+
+    user_rows = []
+    for i in range(organizers + attendees):
+        user_rows.append({
+            "id": i + 1,
+            "first_name": f"User{i}",
+            "last_name": "Bench",
+            "email": f"user{i}@bench.com",
+            "phone": f"07{i:08d}",
+            "password": "x",
+            "role": "organizer" if i < organizers else "attendee",
+            "status": "active",
+            "created_at": year_ago + timedelta(seconds=rng.randrange(365 * 86400)),
+        })
+    write(User, user_rows)
+    attendee_ids = range(organizers + 1, organizers + attendees + 1)
+
+    event_rows, ticket_rows = [], []
+    categories = ["Music", "Tech", "Sports", "Food", "Art", "Business"]
+    tags = ["live", "concert", "outdoor", "family", "networking", "workshop", "festival"]
+    cities = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret"]
+    for i in range(events):
+        start = year_ago + timedelta(days=rng.randrange(730), hours=rng.randrange(24))
+        status = rng.choice(["active", "active", "pending", "rejected"])
+        event_rows.append({
+            "id": i + 1,
+            "title": f"{rng.choice(categories)} event {i}",
+            "description": f"Synthetic event number {i} for benchmarking.",
+            "location": rng.choice(cities),
+            "start_time": start,
+            "end_time": start + timedelta(hours=3),
+            "category": rng.choice(categories),
+            "tags": ",".join(rng.sample(tags, 2)),
+            "is_approved": status == "active",
+            "status": status,
+            "attendee_count": 0,
+            "created_at": start - timedelta(days=30),
+            "organizer_id": rng.randrange(1, organizers + 1),
+        })
+        for j in range(2):
+            ticket_rows.append({
+                "id": 2 * i + j + 1,
+                "type": f"Tier {j}",
+                "price": 500.0 + 500 * j,
+                "quantity": 1000,
+                "sold": 0,
+                "event_id": i + 1,
+            })
+    write(Event, event_rows)
+    write(Ticket, ticket_rows)
+
+    ticket_count = len(ticket_rows)
+    del user_rows, event_rows, ticket_rows
+    for start in range(0, orders, chunk):
+        order_rows, item_rows = [], []
+        for n in range(start, min(start + chunk, orders)):
+            quantity = rng.randint(1, 4)
+            ticket_id = rng.randrange(1, ticket_count + 1)
+            created = year_ago + timedelta(seconds=rng.randrange(365 * 86400))
+            order_rows.append({
+                "id": n + 1,
+                "order_id": f"BENCH-{n}",
+                "status": rng.choice(["paid", "paid", "paid", "pending", "expired"]),
+                "total_amount": 500.0 * quantity,
+                "created_at": created,
+                "attendee_id": rng.choice(attendee_ids),
+            })
+            item_rows.append({"id": n + 1, "order_id": n + 1, "ticket_id": ticket_id, "quantity": quantity})
+        db.session.execute(insert(Order), order_rows)
+        db.session.execute(insert(OrderItem), item_rows)
+        db.session.commit()
+
+    write(Review, [{
+        "rating": rng.randint(1, 5),
+        "comment": "Benchmark review",
+        "attendee_id": rng.choice(attendee_ids),
+        "event_id": rng.randrange(1, events + 1),
+        "created_at": year_ago + timedelta(seconds=rng.randrange(365 * 86400)),
+    } for _ in range(reviews)])
+    write(Log, [{
+        "action": rng.choice(["Approved event", "Banned user", "Changed role"]),
+        "meta_data": "bench",
+        "user_id": rng.randrange(1, organizers + 1),
+        "created_at": year_ago + timedelta(seconds=rng.randrange(365 * 86400)),
+    } for _ in range(logs)])
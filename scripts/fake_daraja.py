@@ -0,0 +1,206 @@
+# scripts/fake_daraja.py
+#
+# Local stand-in for Safaricom Daraja's side of an STK push.
+#
+# `gateway` serves the OAuth and STK push endpoints utils/daraja.py calls,
+# with an injected --latency per push, and optionally posts the payment
+# result to the push's CallBackURL --callback-delay seconds later. Point the
+# app at it with MPESA_BASE_URL=http://127.0.0.1:8088 and any credentials.
+#
+# `callback` builds the callback body Daraja posts to our CallBackURL and
+# delivers it, with Daraja's habit of delivering the same result more than
+# once.
+#
+#   python scripts/fake_daraja.py gateway --port 8088 --latency 0.5 --callback-delay 5
+#   python scripts/fake_daraja.py callback ws_CO_123 --amount 1500
+#   python scripts/fake_daraja.py callback ws_CO_123 --amount 1500 --deliveries 3
+#   python scripts/fake_daraja.py callback ws_CO_123 --result-code 1032   # customer cancelled
+#   python scripts/fake_daraja.py callback ws_CO_123 --url http://localhost:5000/payments/callback?token=...
+
+import argparse
+import json
+import random
+import string
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_URL = "http://localhost:5000/payments/callback"
+
+RESULT_DESCRIPTIONS = {
+    0: "The service request is processed successfully.",
+    1: "The balance is insufficient for the transaction.",
+    1032: "Request cancelled by user.",
+    1037: "DS timeout user cannot be reached.",
+    2001: "The initiator information is invalid.",
+}
+
+
+def mpesa_receipt(rng=random):
+    """A receipt number shaped like Daraja's, e.g. "SGR7K2LQ9T"."""
+    return "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(10))
+
+
+def stk_callback(checkout_request_id, amount=None, receipt=None, phone="254708374149", result_code=0,
+                 merchant_request_id=None):
+    """The JSON body Daraja posts for one STK push result."""
+    callback = {
+        "MerchantRequestID": merchant_request_id or f"{random.randint(10000, 99999)}-{random.randint(10**7, 10**8 - 1)}-1",
+        "CheckoutRequestID": checkout_request_id,
+        "ResultCode": result_code,
+        "ResultDesc": RESULT_DESCRIPTIONS.get(result_code, "The transaction failed."),
+    }
+    if result_code == 0:
+        callback["CallbackMetadata"] = {"Item": [
+            {"Name": "Amount", "Value": amount},
+            {"Name": "MpesaReceiptNumber", "Value": receipt or mpesa_receipt()},
+            {"Name": "TransactionDate", "Value": int(datetime.now().strftime("%Y%m%d%H%M%S"))},
+            {"Name": "PhoneNumber", "Value": int(phone)},
+        ]}
+    return {"Body": {"stkCallback": callback}}
+
+
+def deliver(url, body, timeout=10):
+    """POST one callback body. Returns (HTTP status, response JSON)."""
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, json.loads(response.read() or b"null")
+
+
+# ------------------ Gateway ------------------
+
+class FakeGateway:
+    """Answers Daraja's OAuth and STK push requests.
+
+    Counts tokens issued, pushes accepted and TCP connections opened, so
+    callers can check they cache tokens and reuse connections.
+    """
+
+    def __init__(self, latency=0.0, callback_delay=None, result_code=0):
+        self.latency = latency
+        self.callback_delay = callback_delay
+        self.result_code = result_code
+        self.tokens = set()
+        self.pushes = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def handle(self, path, auth, body):
+        """(HTTP status, JSON body) for one request."""
+        if path.startswith("/oauth/v1/generate") and auth.startswith("Basic "):
+            token = uuid.uuid4().hex
+            with self.lock:
+                self.tokens.add(token)
+            return 200, {"access_token": token, "expires_in": "3599"}
+        if path == "/mpesa/stkpush/v1/processrequest":
+            if auth[len("Bearer "):] not in self.tokens:
+                return 401, {"errorCode": "404.001.03", "errorMessage": "Invalid Access Token"}
+            push = json.loads(body)
+            time.sleep(self.latency)
+            checkout_request_id = f"ws_CO_{uuid.uuid4().hex[:20]}"
+            with self.lock:
+                self.pushes += 1
+            if self.callback_delay is not None:
+                result = stk_callback(checkout_request_id, push["Amount"], phone=str(push["PhoneNumber"]),
+                                      result_code=self.result_code)
+                timer = threading.Timer(self.callback_delay, self._callback, (push["CallBackURL"], result))
+                timer.daemon = True
+                timer.start()
+            return 200, {
+                "MerchantRequestID": f"{random.randint(10000, 99999)}-{random.randint(10**7, 10**8 - 1)}-1",
+                "CheckoutRequestID": checkout_request_id,
+                "ResponseCode": "0",
+                "ResponseDescription": "Success. Request accepted for processing",
+                "CustomerMessage": "Success. Request accepted for processing",
+            }
+        return 404, {"errorMessage": "Not found"}
+
+    def _callback(self, url, body):
+        try:
+            deliver(url, body)
+        except Exception as e:
+            print(f"callback to {url} failed: {e!r}")
+
+
+def serve_gateway(gateway, host="127.0.0.1", port=0):
+    """Serve `gateway` over HTTP/1.1 keep-alive on a background thread.
+
+    Returns the server; server.server_port is the port it listens on.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with gateway.lock:
+                gateway.connections += 1
+
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            status, payload = gateway.handle(self.path, self.headers.get("Authorization", ""), body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = _respond
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-daraja", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gateway = commands.add_parser("gateway", help="serve the OAuth and STK push endpoints")
+    gateway.add_argument("--host", default="127.0.0.1")
+    gateway.add_argument("--port", type=int, default=8088)
+    gateway.add_argument("--latency", type=float, default=0.0, help="seconds each push takes")
+    gateway.add_argument("--callback-delay", type=float, help="post the result this many seconds after a push")
+    gateway.add_argument("--result-code", type=int, default=0)
+
+    callback = commands.add_parser("callback", help="post one STK callback")
+    callback.add_argument("checkout_request_id")
+    callback.add_argument("--url", default=DEFAULT_URL)
+    callback.add_argument("--amount", type=float, default=1)
+    callback.add_argument("--receipt")
+    callback.add_argument("--phone", default="254708374149")
+    callback.add_argument("--result-code", type=int, default=0)
+    callback.add_argument("--deliveries", type=int, default=1, help="send the same result this many times")
+    args = parser.parse_args()
+
+    if args.command == "gateway":
+        server = serve_gateway(FakeGateway(args.latency, args.callback_delay, args.result_code), args.host, args.port)
+        print(f"Fake Daraja on http://{args.host}:{server.server_port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    body = stk_callback(args.checkout_request_id, args.amount, args.receipt or mpesa_receipt(),
+                        args.phone, args.result_code)
+    for n in range(args.deliveries):
+        if n:
+            time.sleep(1)
+        print(deliver(args.url, body))
+
+
+if __name__ == "__main__":
+    main()
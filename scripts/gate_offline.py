@@ -0,0 +1,116 @@
+# scripts/gate_offline.py
+#
+# Check-in for a gate laptop without a network connection.
+#
+# `download` saves the event's pass index (GET /events/<id>/gate) while the
+# laptop is still online. `scan` reads codes from a barcode scanner (one per
+# line on stdin), answers from that file and appends every admission to a
+# journal, so a restart neither loses scans nor admits a pass twice. Back
+# online, `upload` posts the journal to /events/<id>/gate/sync, which admits
+# each pass at most once across all gates and lists the conflicts, and then
+# renames the journal so it is not sent again.
+#
+#   python scripts/gate_offline.py download 12 --url http://localhost:5000 --token $JWT
+#   python scripts/gate_offline.py scan 12 < codes.txt
+#   python scripts/gate_offline.py upload 12 --url http://localhost:5000 --token $JWT
+
+import argparse
+import json
+import os
+import sys
+import urllib.request
+from datetime import datetime
+
+from common import build_app  # noqa: F401  (puts the repo on sys.path)
+from utils.passes import normalize_code, well_formed_code
+
+SYNC_BATCH = 5000
+
+
+def paths(event_id, directory):
+    return (os.path.join(directory, f"gate-{event_id}.json"),
+            os.path.join(directory, f"gate-{event_id}.journal.jsonl"))
+
+
+def request(url, token, method="GET", body=None):
+    req = urllib.request.Request(
+        url, method=method, data=json.dumps(body).encode() if body is not None else None,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=60) as response:
+        return json.loads(response.read())
+
+
+class OfflineGate:
+    """The downloaded index plus the journal of scans made since."""
+
+    def __init__(self, index_path, journal_path):
+        with open(index_path, encoding="utf-8") as f:
+            self.checked_in = dict(json.load(f)["codes"])
+        self.journal_path = journal_path
+        if os.path.exists(journal_path):
+            with open(journal_path, encoding="utf-8") as f:
+                for line in f:
+                    scan = json.loads(line)
+                    self.checked_in[scan["ticket_code"]] = scan["scanned_at"]
+        self.journal = open(journal_path, "a", encoding="utf-8")
+
+    def scan(self, code):
+        code = normalize_code(code)
+        if not well_formed_code(code):
+            return "invalid", code
+        if code not in self.checked_in:
+            # Bought after the download, or for another event: let the
+            # supervisor decide, and sync will tell.
+            return "unknown", code
+        if self.checked_in[code] is not None:
+            return "already_used", self.checked_in[code]
+        at = datetime.now().isoformat()
+        self.journal.write(json.dumps({"ticket_code": code, "scanned_at": at}) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.checked_in[code] = at
+        return "admitted", at
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=("download", "scan", "upload"))
+    parser.add_argument("event_id", type=int)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--token", default=os.getenv("GATE_TOKEN"), help="organizer JWT (or GATE_TOKEN)")
+    parser.add_argument("--dir", default=".", help="where the index and journal are kept")
+    args = parser.parse_args()
+    index_path, journal_path = paths(args.event_id, args.dir)
+
+    if args.command == "download":
+        data = request(f"{args.url}/events/{args.event_id}/gate", args.token)
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        print(f"Saved {len(data['codes'])} passes ({data['checked_in']} already checked in) to {index_path}")
+
+    elif args.command == "scan":
+        gate = OfflineGate(index_path, journal_path)
+        for line in sys.stdin:
+            if line.strip():
+                result, detail = gate.scan(line)
+                print(f"{result.upper():<13}{detail}", flush=True)
+
+    else:
+        with open(journal_path, encoding="utf-8") as f:
+            scans = [json.loads(line) for line in f]
+        totals = {"admitted": 0, "already_used": 0, "unknown": 0, "invalid": 0}
+        for start in range(0, len(scans), SYNC_BATCH):
+            result = request(f"{args.url}/events/{args.event_id}/gate/sync", args.token, "POST",
+                             {"scans": scans[start:start + SYNC_BATCH]})
+            totals["admitted"] += result["admitted"]
+            for key in ("already_used", "unknown", "invalid"):
+                totals[key] += len(result[key])
+                for item in result[key]:
+                    print(f"{key}: {item}")
+        os.replace(journal_path, journal_path + f".synced-{datetime.now():%Y%m%dT%H%M%S}")
+        print(f"Uploaded {len(scans)} scans: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# scripts/load_test_checkin.py
+#
+# Replays gate traffic for one big event against the check-in endpoints:
+# every pass scanned once from --gates concurrent scanners, plus the noise
+# real gates see (a share of passes scanned again, mistyped codes, and
+# well-formed codes that were never issued). Part of the passes are held
+# back and checked in by an "offline" gate instead: it downloads the index,
+# scans, and uploads through /gate/sync together with a few passes that were
+# also used online, which must come back as conflicts.
+#
+# Prints request latency percentiles and, separately, the latency of
+# utils/checkin.gate.scan on its own (an admission is one conditional UPDATE
+# and commit; a rescan is answered from memory). The run fails
+# unless every pass ends up checked in exactly once and every answer was the
+# expected one.
+#
+#   python scripts/load_test_checkin.py
+#   python scripts/load_test_checkin.py --orders 400 --seats 250 --gates 16
+
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from common import build_app, temp_database_url
+from flask_jwt_extended import JWTManager, create_access_token
+from flask_restful import Api
+from sqlalchemy import func, insert, select
+from models import db, User, Event, Ticket, Order, OrderItem, EventPass
+from resources.checkin import CheckIn, GateIndex, GateSync
+from utils.checkin import gate, ADMITTED, ALREADY_USED, INVALID, UNKNOWN
+from utils.passes import ALPHABET, issue_passes, ticket_code
+
+
+def setup(orders, seats):
+    db.drop_all()
+    db.create_all()
+    organizer = User(first_name="Org", last_name="Gate", email="org@gate.com",
+                     phone="0799999998", password="x", role="organizer")
+    db.session.add(organizer)
+    db.session.flush()
+    concert = Event(title="Stadium concert", description="Load test", location="Nairobi",
+                    start_time=datetime.now() + timedelta(hours=1),
+                    end_time=datetime.now() + timedelta(hours=5),
+                    organizer_id=organizer.id, is_approved=True, status="active")
+    db.session.add(concert)
+    db.session.flush()
+    ticket = Ticket(type="General", price=500, quantity=orders * seats, sold=orders * seats, event_id=concert.id)
+    db.session.add(ticket)
+    db.session.flush()
+    db.session.execute(insert(Order), [
+        {"id": n, "order_id": f"GATE-{n}", "status": "paid", "total_amount": 500.0 * seats,
+         "attendee_id": organizer.id} for n in range(1, orders + 1)
+    ])
+    db.session.execute(insert(OrderItem), [
+        {"id": n, "order_id": n, "ticket_id": ticket.id, "quantity": seats} for n in range(1, orders + 1)
+    ])
+    for start in range(1, orders + 1, 100):
+        issue_passes(list(range(start, min(start + 100, orders + 1))))
+    db.session.commit()
+    codes = db.session.scalars(select(EventPass.ticket_code)).all()
+    return organizer.id, concert.id, codes
+
+
+def mistype(code, rng):
+    i = rng.randrange(len(code) - 1)
+    wrong = rng.choice([c for c in ALPHABET if c != code[i]])
+    return code[:i] + wrong + code[i + 1:]
+
+
+def build_traffic(codes, rescans, typos, unknown, rng):
+    """[(code, expected result)] in arrival order. Which scan of a rescanned
+    pass is admitted depends on which gate gets there first, so both count
+    as ADMITTED here and check() sorts it out."""
+    traffic = [(code, ADMITTED) for code in codes]
+    traffic += [(code, ADMITTED) for code in rng.sample(codes, int(len(codes) * rescans))]
+    # One wrong character always breaks the check character.
+    traffic += [(mistype(code, rng), INVALID) for code in rng.sample(codes, int(len(codes) * typos))]
+    # Well-formed, but for order items that do not exist.
+    traffic += [(ticket_code(10_000_000 + n, 0), UNKNOWN) for n in range(int(len(codes) * unknown))]
+    rng.shuffle(traffic)
+    return traffic
+
+
+def replay(client, url, headers, traffic, gates):
+    latencies, answers = [], []
+    lock = threading.Lock()
+
+    def worker(n):
+        local, results = [], []
+        # Each gate sees its own share of the queue, in order.
+        for code, expected in traffic[n::gates]:
+            started = time.perf_counter()
+            response = client.post(url, json={"ticket_code": code}, headers=headers)
+            local.append(time.perf_counter() - started)
+            results.append((code, expected, response.get_json()["result"]))
+        with lock:
+            latencies.extend(local)
+            answers.extend(results)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(gates)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, sorted(latencies), answers
+
+
+def check(answers):
+    """Wrong answers: anything unexpected, or a pass not admitted exactly once."""
+    wrong = [a for a in answers if a[1] != ADMITTED and a[2] != a[1]]
+    admissions = Counter()
+    for code, expected, result in answers:
+        if expected == ADMITTED:
+            if result == ADMITTED:
+                admissions[code] += 1
+            elif result != ALREADY_USED:
+                wrong.append((code, expected, result))
+    scanned = {code for code, expected, _ in answers if expected == ADMITTED}
+    wrong += [(code, ADMITTED, f"admitted {admissions[code]} times")
+              for code in scanned if admissions[code] != 1]
+    return wrong
+
+
+def pct(latencies, p):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--seats", type=int, default=250, help="passes per order")
+    parser.add_argument("--gates", type=int, default=8, help="concurrent scanners")
+    parser.add_argument("--rescans", type=float, default=0.05, help="share of passes scanned twice")
+    parser.add_argument("--typos", type=float, default=0.02, help="share of scans mistyped")
+    parser.add_argument("--unknown", type=float, default=0.01, help="share of scans for codes never issued")
+    parser.add_argument("--offline", type=float, default=0.05, help="share of passes scanned by the offline gate")
+    parser.add_argument("--direct", type=float, default=0.05, help="share of passes scanned in-process to time lookups")
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    app = build_app(args.database_url or temp_database_url("load_test_checkin.db"))
+    app.config["JWT_SECRET_KEY"] = "load-test-checkin"
+    JWTManager(app)
+    api = Api(app)
+    api.add_resource(CheckIn, "/events/<int:event_id>/checkin")
+    api.add_resource(GateIndex, "/events/<int:event_id>/gate")
+    api.add_resource(GateSync, "/events/<int:event_id>/gate/sync")
+    gate.init_app(app)
+    client = app.test_client()
+    rng = random.Random(11)
+
+    with app.app_context():
+        organizer_id, event_id, codes = setup(args.orders, args.seats)
+        headers = {"Authorization": "Bearer " + create_access_token(identity=organizer_id)}
+    rng.shuffle(codes)
+    offline_count = int(len(codes) * args.offline)
+    direct_count = int(len(codes) * args.direct)
+    offline_codes = codes[:offline_count]
+    direct_codes = codes[offline_count:offline_count + direct_count]
+    online_codes = codes[offline_count + direct_count:]
+    print(f"{len(codes)} passes for event {event_id}; {len(online_codes)} scanned online by "
+          f"{args.gates} gates, {len(offline_codes)} offline, {len(direct_codes)} in-process")
+
+    # The offline gate downloads its copy before the doors open.
+    started = time.perf_counter()
+    export = client.get(f"/events/{event_id}/gate", headers=headers).get_json()
+    print(f"index load + export: {len(export['codes'])} passes in {time.perf_counter() - started:.2f}s")
+
+    with app.app_context():
+        index = gate.get(event_id)
+        lookups = []
+        for code in direct_codes:
+            started = time.perf_counter()
+            result, _, _ = gate.scan(index, code)
+            lookups.append(time.perf_counter() - started)
+            assert result == ADMITTED, (code, result)
+        lookups.sort()
+    print(f"in-process scan ms: p50 {pct(lookups, 0.5):.4f}  p99 {pct(lookups, 0.99):.4f}  "
+          f"max {lookups[-1] * 1000:.3f}")
+
+    with app.app_context():
+        traffic = build_traffic(online_codes, args.rescans, args.typos, args.unknown, rng)
+    elapsed, latencies, answers = replay(client, f"/events/{event_id}/checkin", headers, traffic, args.gates)
+    expected = Counter(result for _, _, result in answers)
+    print(f"online: {len(traffic)} scans in {elapsed:.2f}s, {len(traffic) / elapsed:.0f} scans/s {dict(expected)}")
+    print(f"request latency ms: p50 {pct(latencies, 0.5):.2f}  p99 {pct(latencies, 0.99):.2f}  "
+          f"max {latencies[-1] * 1000:.1f}")
+    wrong = check(answers)
+    assert not wrong, wrong[:10]
+
+    # The offline gate's journal: its own passes, plus a few that were also
+    # admitted online while it was cut off.
+    doors = datetime.now() - timedelta(minutes=30)
+    conflicts = rng.sample(online_codes, min(len(online_codes), 50))
+    journal = [{"ticket_code": code, "scanned_at": (doors + timedelta(seconds=n)).isoformat()}
+               for n, code in enumerate(offline_codes + conflicts)]
+    started = time.perf_counter()
+    synced = {ADMITTED: 0, ALREADY_USED: [], UNKNOWN: [], INVALID: []}
+    for start in range(0, len(journal), 5000):
+        response = client.post(f"/events/{event_id}/gate/sync", json={"scans": journal[start:start + 5000]},
+                               headers=headers)
+        assert response.status_code == 200, response.get_json()
+        result = response.get_json()
+        synced[ADMITTED] += result[ADMITTED]
+        for key in (ALREADY_USED, UNKNOWN, INVALID):
+            synced[key] += result[key]
+    print(f"offline sync: {len(journal)} scans in {time.perf_counter() - started:.2f}s, "
+          f"{synced[ADMITTED]} admitted, {len(synced[ALREADY_USED])} conflicts")
+    assert synced[ADMITTED] == len(offline_codes), synced[ADMITTED]
+    assert sorted(c["ticket_code"] for c in synced[ALREADY_USED]) == sorted(conflicts)
+    assert not synced[UNKNOWN] and not synced[INVALID]
+
+    with app.app_context():
+        checked_in, with_time = db.session.execute(
+            select(func.count(), func.count(EventPass.checked_in_at)).where(EventPass.att_status.is_(True))
+        ).one()
+        offline_times = dict(db.session.execute(
+            select(EventPass.ticket_code, EventPass.checked_in_at)
+            .where(EventPass.ticket_code.in_(offline_codes[:500]))
+        ).all())
+    assert checked_in == with_time == len(codes), (checked_in, with_time, len(codes))
+    assert all(at < datetime.now() - timedelta(minutes=20) for at in offline_times.values())
+    print(f"ok: {checked_in} of {len(codes)} passes checked in once each, offline scans kept their scan time")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# scripts/load_test_reservations.py
+#
+# Hammers a single Ticket with concurrent orders and checks nothing oversold.
+#
+#   python scripts/load_test_reservations.py --orders 20000 --threads 32 --quantity 5000
+#   python scripts/load_test_reservations.py --shards 8 --database-url postgresql://...
+#
+# Each worker runs the same steps as OrderList.post: reserve, insert the
+# order and its item, commit. Uses a throwaway SQLite file unless
+# --database-url is given.
+
+import argparse
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import build_app, temp_database_url
+from sqlalchemy import func
+from models import db, User, Event, Ticket, TicketShard, Order, OrderItem
+from utils.inventory import reserve_tickets, shard_ticket, fold_ticket_shards
+
+
+def setup(app, quantity, shards):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        buyer = User(first_name="Load", last_name="Test", email="load@test.com",
+                     phone="0799999999", password="x", role="attendee")
+        organizer = User(first_name="Org", last_name="Test", email="org@test.com",
+                         phone="0799999998", password="x", role="organizer")
+        db.session.add_all([buyer, organizer])
+        db.session.flush()
+        flash_sale = Event(title="Flash sale", description="Load test", location="Nairobi",
+                      start_time=datetime.now() + timedelta(days=1),
+                      end_time=datetime.now() + timedelta(days=1, hours=3),
+                      organizer_id=organizer.id, is_approved=True, status="active")
+        db.session.add(flash_sale)
+        db.session.flush()
+        ticket = Ticket(type="General", price=500, quantity=quantity, sold=0, event_id=flash_sale.id)
+        db.session.add(ticket)
+        db.session.commit()
+        if shards:
+            shard_ticket(ticket, shards)
+            db.session.commit()
+        return buyer.id, ticket.id
+
+
+def worker(app, buyer_id, ticket_id, jobs, results, lock):
+    with app.app_context():
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                quantity = jobs.pop()
+            try:
+                if reserve_tickets(ticket_id, quantity):
+                    order = Order(order_id=str(uuid.uuid4()), attendee_id=buyer_id,
+                                  status="pending", total_amount=500 * quantity)
+                    db.session.add(order)
+                    db.session.add(OrderItem(ticket_id=ticket_id, quantity=quantity, order=order))
+                    db.session.commit()
+                    outcome = "ok"
+                else:
+                    db.session.rollback()
+                    outcome = "sold_out"
+            except Exception:
+                db.session.rollback()
+                outcome = "error"
+            with lock:
+                results[outcome] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--quantity", type=int, default=5000)
+    parser.add_argument("--max-per-order", type=int, default=3)
+    parser.add_argument("--shards", type=int, default=0)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    database_url = args.database_url or temp_database_url("load_test.db")
+
+    app = build_app(database_url)
+    buyer_id, ticket_id = setup(app, args.quantity, args.shards)
+
+    jobs = [random.randint(1, args.max_per_order) for _ in range(args.orders)]
+    results = {"ok": 0, "sold_out": 0, "error": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(app, buyer_id, ticket_id, jobs, results, lock))
+        for _ in range(args.threads)
+    ]
+
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        fold_ticket_shards([ticket_id])
+        db.session.commit()
+        ticket = db.session.get(Ticket, ticket_id)
+        ordered = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0))\
+            .filter(OrderItem.ticket_id == ticket_id).scalar()
+        shard_sold = db.session.query(func.coalesce(func.sum(TicketShard.sold), 0))\
+            .filter(TicketShard.ticket_id == ticket_id).scalar()
+
+    print(f"database       {database_url}")
+    print(f"shards         {args.shards or 'none'}")
+    print(f"attempts       {args.orders} in {elapsed:.2f}s ({args.orders / elapsed:.0f} orders/s)")
+    print(f"placed         {results['ok']}")
+    print(f"sold out       {results['sold_out']}")
+    print(f"errors         {results['error']}")
+    print(f"capacity       {ticket.quantity}")
+    print(f"ticket.sold    {ticket.sold}")
+    print(f"order items    {ordered}")
+
+    oversold = ordered > ticket.quantity or ticket.sold != ordered
+    if args.shards:
+        oversold = oversold or shard_sold != ordered
+    if oversold:
+        print("FAIL: counters and order items disagree or capacity exceeded")
+        sys.exit(1)
+    print("OK: no overselling")
+
+
+if __name__ == "__main__":
+    main()
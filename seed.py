@@ -1,5 +1,11 @@
 from models import db, User, Event, Ticket, Order, OrderItem, Review, Report, Log
-from app import app, bcrypt  # 👈 Make sure bcrypt is imported from app
+from app import app
+from utils.passwords import passwords
+from utils.search import rebuild_search_index
+from utils.facets import rebuild_facets
+from utils.event_stats import rebuild_event_stats
+from utils.metrics import reconcile_metrics
+from utils.rollups import rebuild_sales_rollups
 from datetime import datetime, timedelta
 import random
 
@@ -20,9 +26,9 @@ with app.app_context():
     users = []
 
     # Admins
-    users.append(User(first_name="Alice", last_name="Admin", email="alice@admin.com", phone="0700000001", password=bcrypt.generate_password_hash("admin123").decode('utf-8'), role="admin"))
-    users.append(User(first_name="Bob", last_name="Boss", email="bob@admin.com", phone="0700000002", password=bcrypt.generate_password_hash("admin123").decode('utf-8'), role="admin"))
-    users.append(User(first_name="Celestine", last_name="Mecheo", email="celestine@example.com", phone="0700000062", password=bcrypt.generate_password_hash("celestine123").decode('utf-8'), role="admin"))
+    users.append(User(first_name="Alice", last_name="Admin", email="alice@admin.com", phone="0700000001", password=passwords.hash("admin123"), role="admin"))
+    users.append(User(first_name="Bob", last_name="Boss", email="bob@admin.com", phone="0700000002", password=passwords.hash("admin123"), role="admin"))
+    users.append(User(first_name="Celestine", last_name="Mecheo", email="celestine@example.com", phone="0700000062", password=passwords.hash("celestine123"), role="admin"))
 
     # Organizers
     for i in range(1, 4):
@@ -31,7 +37,7 @@ with app.app_context():
             last_name="Org",
             email=f"org{i}@events.com",
             phone=f"070100000{i}",
-            password=bcrypt.generate_password_hash("org123").decode('utf-8'),
+            password=passwords.hash("org123"),
             role="organizer"
         ))
 
@@ -42,7 +48,7 @@ with app.app_context():
             last_name="User",
             email=f"attendee{i}@mail.com",
             phone=f"071000000{i}",
-            password=bcrypt.generate_password_hash("pass123").decode('utf-8'),
+            password=passwords.hash("pass123"),
             role="attendee"
         ))
 
@@ -96,7 +102,7 @@ with app.app_context():
                 attendee_id=attendee.id,
                 status="paid",
                 total_amount=ticket.price * quantity,
-                mpesa_receipt=f"MPESA{random.randint(100000,999999)}"
+                mpesa_receipt=f"MPESA{attendee.id:05d}{i}"
             )
             db.session.add(order)
             db.session.flush()
@@ -135,4 +141,12 @@ with app.app_context():
         db.session.add(log)
 
     db.session.commit()
+
+    print("🔎 Rebuilding search index and facets...")
+    rebuild_search_index()
+    rebuild_facets()
+    rebuild_event_stats()
+    reconcile_metrics()
+    rebuild_sales_rollups()
+    db.session.commit()
     print("✅ Seeding complete!")
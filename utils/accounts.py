@@ -0,0 +1,218 @@
+# utils/accounts.py
+#
+# Account creation without pre-check queries. Register inserts straight away
+# and lets the users.email / users.phone unique constraints reject
+# duplicates; duplicate_field() tells which one fired. Bulk imports validate
+# a batch in Python, look up the batch's existing emails and phones in two
+# IN queries, and insert the rest with one executemany per batch.
+# delete_user() takes an account out of every counter and index it is in.
+
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Order, OrderItem, Ticket, normalize_email
+from utils.event_stats import remove_event_stats, record_payments, record_review
+from utils.facets import remove_event_facets
+from utils.inventory import release_tickets, sold_counts
+from utils.metrics import bump_metric, event_status_changed
+from utils.passwords import passwords
+from utils.rollups import record_sales, remove_event_sales
+from utils.search import remove_event
+
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ROWS = 50000
+# Each plaintext password costs a bcrypt hash inside the request; larger
+# imports must send password_hash instead.
+MAX_PLAINTEXT_IMPORT_ROWS = 500
+IMPORT_ROLES = ("attendee", "organizer", "admin")
+REQUIRED_FIELDS = ("first_name", "last_name", "email", "phone")
+
+DUPLICATE_MESSAGES = {
+    "email": "Email already registered.",
+    "phone": "Phone number already registered.",
+}
+
+
+def duplicate_field(error):
+    """"email" or "phone" if `error` is a users unique-constraint violation."""
+    # Postgres names the constraint; SQLite only says "UNIQUE constraint
+    # failed: users.email".
+    constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None) or ""
+    message = str(error.orig)
+    for field in ("email", "phone"):
+        if constraint == f"uq_users_{field}" or f"users.{field}" in message or f"uq_users_{field}" in message:
+            return field
+    return None
+
+
+# ------------------ Bulk import ------------------
+
+def _is_bcrypt_hash(value):
+    return isinstance(value, str) and value.startswith(("$2a$", "$2b$", "$2y$")) and len(value) == 60
+
+
+def validate_import_row(row):
+    """(users-table row, plain password or None) for one import record.
+
+    Raises ValueError.
+    """
+    missing = [f for f in REQUIRED_FIELDS if not str(row.get(f) or "").strip()]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    role = str(row.get("role") or "attendee").strip().lower()
+    if role not in IMPORT_ROLES:
+        raise ValueError(f"role must be one of: {', '.join(IMPORT_ROLES)}")
+    password_hash = row.get("password_hash")
+    if password_hash and not _is_bcrypt_hash(password_hash):
+        raise ValueError("password_hash must be a bcrypt hash")
+    if not password_hash and not row.get("password"):
+        raise ValueError("Missing password or password_hash")
+    user = {
+        "first_name": str(row["first_name"]).strip()[:50],
+        "last_name": str(row["last_name"]).strip()[:50],
+        "email": normalize_email(str(row["email"])),
+        "phone": str(row["phone"]).strip(),
+        "password": password_hash or None,
+        "role": role,
+        "status": "active",
+    }
+    return user, (None if password_hash else str(row["password"]))
+
+
+def _insert_batch(rows):
+    """Insert `rows`; returns the rows that hit a unique constraint anyway
+    (accounts created concurrently), as (row, field) pairs."""
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(User), rows)
+        return []
+    except IntegrityError:
+        pass
+    # Someone else registered one of these meanwhile: fall back to one
+    # savepoint per row to find out which.
+    rejected = []
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(User), [row])
+        except IntegrityError as e:
+            rejected.append((row, duplicate_field(e) or "email"))
+    return rejected
+
+
+def plaintext_rows(records):
+    """How many of `records` carry a password to hash rather than a password_hash."""
+    return sum(
+        1 for row in records
+        if isinstance(row, dict) and row.get("password") and not row.get("password_hash")
+    )
+
+
+def import_users(records, batch_size=IMPORT_BATCH_SIZE):
+    """Create accounts from `records` (dicts). Returns (created, skipped).
+
+    skipped lists {"row", "email", "message"} for every record that was not
+    imported. Plain passwords are hashed on the password pool; supply
+    password_hash (bcrypt) to skip that. Commits once per batch.
+    """
+    created = 0
+    skipped = []
+    for start in range(0, len(records), batch_size):
+        batch = []
+        seen_email, seen_phone = set(), set()
+        for n, record in enumerate(records[start:start + batch_size], start=start):
+            if not isinstance(record, dict):
+                skipped.append({"row": n, "email": None, "message": "Each user must be an object."})
+                continue
+            try:
+                row, password = validate_import_row(record)
+            except ValueError as e:
+                skipped.append({"row": n, "email": record.get("email"), "message": str(e)})
+                continue
+            if row["email"] in seen_email or row["phone"] in seen_phone:
+                skipped.append({"row": n, "email": row["email"], "message": "Duplicate in this import."})
+                continue
+            seen_email.add(row["email"])
+            seen_phone.add(row["phone"])
+            batch.append((n, row, password))
+
+        taken_emails = set(db.session.scalars(select(User.email).where(User.email.in_(seen_email))))
+        taken_phones = set(db.session.scalars(select(User.phone).where(User.phone.in_(seen_phone))))
+        fresh = []
+        for n, row, password in batch:
+            if row["email"] in taken_emails:
+                skipped.append({"row": n, "email": row["email"], "message": DUPLICATE_MESSAGES["email"]})
+            elif row["phone"] in taken_phones:
+                skipped.append({"row": n, "email": row["email"], "message": DUPLICATE_MESSAGES["phone"]})
+            else:
+                fresh.append((n, row, password))
+
+        to_hash = [password for _, _, password in fresh if password is not None]
+        hashes = iter(passwords.hash_many(to_hash))
+        now = datetime.now()
+        rows = []
+        row_numbers = {}
+        for n, row, password in fresh:
+            if password is not None:
+                row["password"] = next(hashes)
+            row["created_at"] = now
+            rows.append(row)
+            row_numbers[row["email"]] = n
+
+        rejected = _insert_batch(rows) if rows else []
+        for row, field in rejected:
+            skipped.append({"row": row_numbers[row["email"]], "email": row["email"],
+                            "message": DUPLICATE_MESSAGES[field]})
+        created += len(rows) - len(rejected)
+        bump_metric("users", len(rows) - len(rejected))
+        db.session.commit()
+    skipped.sort(key=lambda s: s["row"])
+    return created, skipped
+
+
+# ------------------ Deletion ------------------
+
+def delete_user(user):
+    """Delete `user` with their events, orders and reviews, and take them out
+    of the search index, facets, event stats, rollups, metrics and seat counts.
+
+    Seats held or bought by their orders go back on sale through
+    release_tickets(). Returns (deleted event ids, ids of other events they
+    reviewed) for cache invalidation; the caller commits.
+    """
+    event_ids = [event.id for event in user.events]
+    reviewed_ids = {review.event_id for review in user.reviews if review.event_id not in event_ids}
+
+    # Their orders stop counting: paid ones come off the stats, and every
+    # seat still taken by one is released, except on their own events,
+    # which go away below.
+    paid = [order for order in user.orders if order.status == "paid"]
+    if paid:
+        record_payments([order.id for order in paid], sign=-1)
+        record_sales(paid, sign=-1)
+        bump_metric("revenue", -sum(order.total_amount for order in paid))
+    taken = db.session.query(OrderItem.ticket_id, func.sum(OrderItem.quantity))\
+        .join(OrderItem.order).join(OrderItem.ticket)\
+        .filter(Order.attendee_id == user.id, Order.status.in_(("pending", "paid")),
+                Ticket.event_id.notin_(event_ids))\
+        .group_by(OrderItem.ticket_id).all()
+    for ticket_id, quantity in taken:
+        release_tickets(ticket_id, quantity)
+    if taken:
+        bump_metric("ticket_sales", -sum(quantity for _, quantity in taken))
+
+    for event in user.events:
+        remove_event(event.id)
+        remove_event_facets(event)
+        remove_event_stats(event.id)
+        remove_event_sales(event.id)
+        event_status_changed(event.status, None)
+        bump_metric("ticket_sales", -sum(sold_counts(event.tickets).values()))
+    for review in user.reviews:
+        if review.event_id in reviewed_ids:
+            record_review(review.event_id, review.rating, sign=-1)
+
+    bump_metric("users", -1)
+    db.session.delete(user)
+    return event_ids, reviewed_ids
@@ -0,0 +1,170 @@
+# utils/audit.py
+#
+# Audit trail of admin and organizer actions, stored in logs. Resources call
+# audit_log.record() after their commit; the row goes onto an in-process
+# queue and a background thread writes queued rows in bulk inserts: a batch
+# is written once it reaches AUDIT_BATCH_SIZE rows or AUDIT_FLUSH_INTERVAL
+# seconds after its first row, so a request never waits on an audit insert.
+#
+# Backpressure: when the queue is full, record() waits up to
+# AUDIT_ENQUEUE_TIMEOUT for room and then writes its row itself, so a slow
+# database slows the callers down instead of dropping entries. At exit the
+# writer drains whatever is still queued. AUDIT_FLUSH_INTERVAL=0 turns the
+# queue off and every record() writes synchronously.
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+from sqlalchemy import insert
+from models import db, Log
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+DEFAULT_ENQUEUE_TIMEOUT = 0.5  # seconds
+WRITE_RETRIES = 3
+
+_STOP = object()
+
+
+class AuditLog:
+    def __init__(self):
+        self.app = None
+        self.queue = None
+        self.thread = None
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self.enqueue_timeout = DEFAULT_ENQUEUE_TIMEOUT
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self.stopped = False
+        self._starting = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get("AUDIT_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        self.flush_interval = app.config.get("AUDIT_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+        self.enqueue_timeout = app.config.get("AUDIT_ENQUEUE_TIMEOUT", DEFAULT_ENQUEUE_TIMEOUT)
+        self.queue_size = app.config.get("AUDIT_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+
+    def _start(self):
+        # The writer starts with the first record(), so importing the app
+        # starts no thread.
+        with self._starting:
+            if self.queue is not None or self.stopped:
+                return
+            self.queue = queue.Queue(self.queue_size)
+            self.thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+            self.thread.start()
+        atexit.register(self.shutdown)
+
+    # ------------------ Producers ------------------
+
+    def record(self, action, user_id=None, **meta):
+        """Log `action` by `user_id` with `meta` as JSON meta_data. Call after commit."""
+        row = {
+            "action": action,
+            "user_id": user_id,
+            "meta_data": json.dumps(meta, default=str) if meta else None,
+            "created_at": datetime.now(),
+        }
+        if self.queue is None and self.flush_interval > 0:
+            self._start()
+        if self.queue is None:
+            self._write([row])
+            return
+        try:
+            self.queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            logger.warning("Audit log queue full; writing synchronously")
+            self._write([row])
+
+    # ------------------ Writer ------------------
+
+    def _write(self, rows):
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                with self._context():
+                    with db.engine.begin() as conn:
+                        conn.execute(insert(Log), rows)
+                return True
+            except Exception:
+                if attempt == WRITE_RETRIES:
+                    logger.exception("Dropped %s audit log rows: %r", len(rows), rows)
+                    return False
+                time.sleep(0.1 * attempt)
+
+    def _context(self):
+        # The writer thread has no app context of its own; request threads do.
+        return self.app.app_context() if self.app is not None else nullcontext()
+
+    def _collect(self, batch):
+        """Fill `batch` until it is full or the flush interval has passed
+        since its first row. Returns True once shutdown was requested."""
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return True
+            batch.append(row)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            stopping = self._collect(batch)
+            if batch:
+                self._write(batch)
+        self.flush()
+
+    def flush(self):
+        """Write everything queued right now from the calling thread."""
+        if self.queue is None:
+            return
+        batch = []
+        while True:
+            try:
+                row = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def shutdown(self, timeout=10):
+        """Stop the writer after it has written every queued row."""
+        self.stopped = True
+        if self.thread is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.thread = None
+        self.flush()
+        # Anything recorded from here on is written synchronously.
+        self.queue = None
+
+
+audit_log = AuditLog()
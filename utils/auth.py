@@ -0,0 +1,70 @@
+# utils/auth.py
+#
+# Shared role guards. Access tokens carry the user's role and status as
+# claims, and a small per-process LRU cache keeps (role, status) per user
+# for PRINCIPAL_TTL seconds, so an authorized request normally needs no
+# User query at all.
+#
+# The cache, not the token, has the final say: a token minted before a
+# promotion, demotion or ban is checked against the cached principal, and
+# only "active" users get through. UserRole.patch and UserStatus.patch
+# invalidate the entry in this process; other workers pick the change up
+# when the short TTL runs out.
+
+from collections import namedtuple
+from functools import wraps
+
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User
+from utils.cache import LRUCache
+
+PRINCIPAL_TTL = 10  # seconds; how long another worker may keep honouring a ban
+PRINCIPAL_CACHE_SIZE = 10000
+
+Principal = namedtuple("Principal", ["id", "role", "status"])
+
+
+principals = LRUCache(PRINCIPAL_TTL, PRINCIPAL_CACHE_SIZE)
+
+
+def token_claims(user):
+    """Extra claims to embed with create_access_token(additional_claims=...)."""
+    return {"role": user.role, "status": user.status}
+
+
+def load_principal(user_id):
+    principal = principals.get(user_id)
+    if principal is None:
+        row = db.session.query(User.id, User.role, User.status).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        principal = Principal(*row)
+        principals.set(user_id, principal)
+    return principal
+
+
+def current_principal():
+    return load_principal(get_jwt_identity())
+
+
+def invalidate_principal(user_id):
+    principals.delete(user_id)
+
+
+def role_required(role, message):
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            principal = current_principal()
+            if not principal or principal.role != role:
+                return {"message": message}, 403
+            if (principal.status or "active") != "active":
+                return {"message": f"Account is {principal.status}"}, 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+organizer_required = role_required("organizer", "Organizer access required")
+admin_required = role_required("admin", "Admin access required")
@@ -0,0 +1,243 @@
+# utils/cache.py
+#
+# Response cache for the anonymous read endpoints. Bodies are stored with a
+# content-hash ETag so clients can revalidate with If-None-Match and get a
+# 304. Entries are dropped by the writes that change them (see the
+# invalidate_* helpers below); RESPONSE_CACHE_TTL bounds staleness for any
+# change that is not tracked.
+#
+# Setting RESPONSE_CACHE_URL to a redis:// URL shares entries and
+# invalidations between web workers and the background workers; the redis
+# package is only needed in that case. Without it the cache is off unless
+# RESPONSE_CACHE_TTL is set, and then it is a per-process LRU that only sees
+# its own process's invalidations, so it suits a single-process deployment.
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request
+from flask_restful.representations.json import output_json
+from flask_restful.utils import unpack
+
+DEFAULT_TTL = 30  # seconds
+DEFAULT_SIZE = 2048
+
+
+class LRUCache:
+    """Thread-safe LRU map whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl=DEFAULT_TTL, maxsize=DEFAULT_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    # Counters never expire or get evicted: a generation that went back to
+    # an earlier value would bring stale entries back to life.
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+class RedisCache:
+    """Same interface as LRUCache, backed by a shared Redis."""
+
+    PREFIX = "response-cache:"
+
+    def __init__(self, url, ttl=DEFAULT_TTL):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL needs the redis package (pip install redis)")
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self.client.get(self.PREFIX + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.setex(self.PREFIX + key, self.ttl, json.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.PREFIX + k for k in keys])
+
+    def counter(self, key):
+        return int(self.client.get(self.PREFIX + "counter:" + key) or 0)
+
+    def incr(self, key):
+        return self.client.incr(self.PREFIX + "counter:" + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.PREFIX + "*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        ttl = app.config.get("RESPONSE_CACHE_TTL", DEFAULT_TTL)
+        if ttl <= 0:
+            self.backend = None
+        elif app.config.get("RESPONSE_CACHE_URL"):
+            self.backend = RedisCache(app.config["RESPONSE_CACHE_URL"], ttl)
+        else:
+            self.backend = LRUCache(ttl, app.config.get("RESPONSE_CACHE_SIZE", DEFAULT_SIZE))
+
+    def get(self, key):
+        return self.backend.get(key) if self.backend else None
+
+    def set(self, key, value):
+        if self.backend:
+            self.backend.set(key, value)
+
+    def delete(self, *keys):
+        if self.backend:
+            self.backend.delete(*keys)
+
+    def generation(self, name):
+        return self.backend.counter(name) if self.backend else 0
+
+    def bump(self, name):
+        if self.backend:
+            self.backend.incr(name)
+
+
+response_cache = ResponseCache()
+
+
+# ------------------ Keys ------------------
+
+# The listing varies with every filter and cursor, so instead of tracking
+# each key, list keys embed a generation that writes bump.
+EVENT_LIST = "events"
+
+
+def event_list_key():
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return f"{EVENT_LIST}:{response_cache.generation(EVENT_LIST)}:{args}"
+
+
+def event_key(id):
+    return f"event:{id}"
+
+
+def tickets_key(event_id):
+    return f"tickets:{event_id}"
+
+
+def reviews_key(event_id):
+    return f"reviews:{event_id}"
+
+
+# ------------------ Invalidation ------------------
+# Call after the write has committed; invalidating earlier would let a
+# concurrent reader put the old rows straight back.
+
+def invalidate_event(event_id, listing=True):
+    response_cache.delete(event_key(event_id))
+    if listing:
+        response_cache.bump(EVENT_LIST)
+
+
+def invalidate_event_children(event_id):
+    response_cache.delete(tickets_key(event_id), reviews_key(event_id))
+
+
+def invalidate_tickets(event_id):
+    response_cache.delete(tickets_key(event_id))
+
+
+def invalidate_reviews(event_id):
+    response_cache.delete(reviews_key(event_id))
+
+
+# ------------------ Decorator ------------------
+
+def _etag(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+def _render(entry):
+    response = Response(entry["body"], 200, mimetype="application/json")
+    for name, value in entry["headers"].items():
+        response.headers[name] = value
+    response.set_etag(entry["etag"])
+    # Clients may keep the body but must revalidate; a 304 costs one cache read.
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+def cached_response(key, headers=("X-Next-Cursor",)):
+    """Cache a Resource.get's 200 responses under key(**view_args).
+
+    Any other status is passed through uncached. `headers` lists response
+    headers worth keeping alongside the body.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if response_cache.backend is None:
+                return fn(*args, **kwargs)
+
+            cache_key = key(**kwargs)
+            entry = response_cache.get(cache_key)
+            if entry is None:
+                rv = fn(*args, **kwargs)
+                if not isinstance(rv, Response):
+                    # data, (data, code) or (data, code, headers), as flask-restful allows
+                    rv = output_json(*unpack(rv))
+                if rv.status_code != 200:
+                    return rv
+                body = rv.get_data()
+                entry = {
+                    "body": body.decode("utf-8"),
+                    "etag": _etag(body),
+                    "headers": {h: rv.headers[h] for h in headers if h in rv.headers},
+                }
+                response_cache.set(cache_key, entry)
+            return _render(entry)
+        return wrapper
+    return decorator
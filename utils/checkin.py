@@ -0,0 +1,259 @@
+# utils/checkin.py
+#
+# Gate check-in. Each event's passes are loaded once into an in-process
+# EventIndex (ticket_code -> pass), a read-through cache: a code with a bad
+# check character, a code the event does not have and a pass the index
+# already knows is used are answered from memory, without a database round
+# trip.
+#
+# Admitting a pass is a conditional UPDATE ... WHERE att_status is not true,
+# committed before the gate is answered; only the scan whose UPDATE matched
+# the row gets "admitted". That holds across threads, web workers and
+# servers, so the index never has to be the authority. A well-formed code the
+# index does not know is looked up in the database once, because it may have
+# been issued after the index was loaded.
+#
+# Gates that lose the network keep scanning against an export of the index
+# (GET /events/<id>/gate, see scripts/gate_offline.py) and upload their scans
+# later. sync() applies them in scan order with the same conditional UPDATE,
+# so a pass used both online and offline is admitted once and the other scan
+# is reported as a conflict.
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import case, or_, select, update
+from models import db, Event, EventPass, Order, OrderItem, Ticket
+from utils.passes import normalize_code, well_formed_code
+
+DEFAULT_MAX_EVENTS = 32
+LOAD_BATCH_SIZE = 10000
+SYNC_BATCH_SIZE = 500
+
+ADMITTED = "admitted"
+ALREADY_USED = "already_used"
+UNKNOWN = "unknown"
+WRONG_EVENT = "wrong_event"
+INVALID = "invalid"
+
+_passes = EventPass.__table__
+_NOT_USED = or_(_passes.c.att_status.is_(None), _passes.c.att_status.is_(False))
+
+
+def _pass_query(*where):
+    return (
+        select(EventPass.id, EventPass.ticket_code, EventPass.checked_in_at, EventPass.att_status, Ticket.event_id)
+        .join(OrderItem, EventPass.order_item_id == OrderItem.id)
+        .join(Ticket, OrderItem.ticket_id == Ticket.id)
+        .join(Order, OrderItem.order_id == Order.id)
+        .where(Order.status == "paid", *where)
+    )
+
+
+def _checked_in_at(row):
+    # Passes marked used before check-in times were kept count as used at datetime.min.
+    return row.checked_in_at or (datetime.min if row.att_status else None)
+
+
+def event_organizer(event_id):
+    """The organizer of event `event_id`, or None if there is no such event."""
+    return db.session.scalar(select(Event.organizer_id).where(Event.id == event_id))
+
+
+class EventIndex:
+    """One event's passes: ticket_code -> slot, with the pass id and when it
+    was checked in (None if not yet, as far as this process knows) per slot."""
+
+    def __init__(self, event_id, organizer_id):
+        self.event_id = event_id
+        self.organizer_id = organizer_id
+        self.slots = {}
+        self.pass_ids = []
+        self.checked_in = []
+        self.lock = threading.Lock()
+        self.loaded_at = datetime.now()
+
+    def add(self, pass_id, code, checked_in_at):
+        """The slot for `code`, added if it is new."""
+        with self.lock:
+            slot = self.slots.get(code)
+            if slot is None:
+                self.pass_ids.append(pass_id)
+                self.checked_in.append(checked_in_at)
+                slot = self.slots[code] = len(self.pass_ids) - 1
+            return slot
+
+    def summary(self):
+        return {
+            "event_id": self.event_id,
+            "passes": len(self.pass_ids),
+            "checked_in": sum(1 for at in self.checked_in if at is not None),
+            "loaded_at": self.loaded_at.isoformat(),
+        }
+
+    def export(self):
+        """The index as plain JSON, for a gate that has to work offline."""
+        return {
+            **self.summary(),
+            "codes": [[code, self.checked_in[slot].isoformat() if self.checked_in[slot] else None]
+                      for code, slot in self.slots.items()],
+        }
+
+
+class Gate:
+    """The loaded EventIndexes, least recently used first."""
+
+    def __init__(self):
+        self.indexes = OrderedDict()
+        self.max_events = DEFAULT_MAX_EVENTS
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_events = app.config.get("CHECKIN_MAX_EVENTS", DEFAULT_MAX_EVENTS)
+
+    # ------------------ Indexes ------------------
+
+    def load(self, event_id, organizer_id=None):
+        """(Re)load event `event_id`'s index from the database. None if there is no such event."""
+        if organizer_id is None:
+            organizer_id = event_organizer(event_id)
+            if organizer_id is None:
+                return None
+        index = EventIndex(event_id, organizer_id)
+        rows = db.session.execute(
+            _pass_query(Ticket.event_id == event_id).execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        for row in rows:
+            index.add(row.id, row.ticket_code, _checked_in_at(row))
+        db.session.rollback()
+
+        with self._lock:
+            self.indexes[event_id] = index
+            self.indexes.move_to_end(event_id)
+            while len(self.indexes) > self.max_events:
+                self.indexes.popitem(last=False)
+        return index
+
+    def cached(self, event_id):
+        """The index for `event_id` if it is loaded, else None."""
+        return self.indexes.get(event_id)
+
+    def get(self, event_id, organizer_id=None):
+        """The index for `event_id`, loading it on first use. None if there is no such event."""
+        with self._lock:
+            index = self.indexes.get(event_id)
+            if index is not None:
+                self.indexes.move_to_end(event_id)
+                return index
+        return self.load(event_id, organizer_id)
+
+    def unload(self, event_id):
+        with self._lock:
+            self.indexes.pop(event_id, None)
+
+    # ------------------ Scanning ------------------
+
+    def scan(self, index, code, at=None):
+        """Check in `code` at `index`'s event. Returns (result, pass id, checked in at)."""
+        at = at or datetime.now()
+        code = normalize_code(code)
+        if not well_formed_code(code):
+            return INVALID, None, None
+        outcome, slot = self._find(index, code)
+        if outcome is not None:
+            return outcome, None, None
+        pass_id = index.pass_ids[slot]
+        if index.checked_in[slot] is not None:
+            return ALREADY_USED, pass_id, index.checked_in[slot]
+
+        marked = db.session.execute(
+            update(_passes)
+            .where(_passes.c.id == pass_id, _NOT_USED)
+            .values(att_status=True, checked_in_at=at)
+        ).rowcount
+        db.session.commit()
+        if marked:
+            index.checked_in[slot] = at
+            return ADMITTED, pass_id, at
+        # Admitted by another thread or process since the index was loaded.
+        self._refresh(index, [slot])
+        return ALREADY_USED, pass_id, index.checked_in[slot]
+
+    def sync(self, index, scans):
+        """Apply offline scans [(code, scanned at)] in the order they happened.
+
+        Returns {"admitted": n, "already_used": [...], "unknown": [...], "invalid": [...]}.
+        """
+        result = {ADMITTED: 0, ALREADY_USED: [], UNKNOWN: [], INVALID: []}
+        first = {}  # slot -> (code, at) of its earliest scan
+        conflicts = []
+        for code, at in sorted(scans, key=lambda scan: scan[1]):
+            code = normalize_code(code)
+            if not well_formed_code(code):
+                result[INVALID].append(code)
+                continue
+            outcome, slot = self._find(index, code)
+            if outcome is not None:
+                result[UNKNOWN].append(code)
+            elif slot in first or index.checked_in[slot] is not None:
+                conflicts.append((code, at, slot))
+            else:
+                first[slot] = (code, at)
+
+        slots = list(first)
+        admitted = set()
+        for start in range(0, len(slots), SYNC_BATCH_SIZE):
+            times = {index.pass_ids[slot]: first[slot][1] for slot in slots[start:start + SYNC_BATCH_SIZE]}
+            admitted.update(db.session.scalars(
+                update(_passes)
+                .where(_passes.c.id.in_(times), _NOT_USED)
+                .values(att_status=True, checked_in_at=case(times, value=_passes.c.id))
+                .returning(_passes.c.id)
+            ))
+        # Committed before answering: the gate deletes its journal once we do.
+        db.session.commit()
+
+        lost = []
+        for slot, (code, at) in first.items():
+            if index.pass_ids[slot] in admitted:
+                index.checked_in[slot] = at
+                result[ADMITTED] += 1
+            else:
+                lost.append(slot)
+                conflicts.append((code, at, slot))
+        self._refresh(index, lost)
+        for code, at, slot in conflicts:
+            used = index.checked_in[slot]
+            result[ALREADY_USED].append({"ticket_code": code, "scanned_at": at.isoformat(),
+                                         "checked_in_at": used.isoformat() if used else None})
+        return result
+
+    def _find(self, index, code):
+        """(None, slot) for a pass of `index`'s event, else (UNKNOWN or WRONG_EVENT, None)."""
+        slot = index.slots.get(code)
+        if slot is not None:
+            return None, slot
+        # Issued after the index was loaded, or not for this event.
+        row = db.session.execute(_pass_query(EventPass.ticket_code == code)).first()
+        db.session.rollback()
+        if row is None:
+            return UNKNOWN, None
+        if row.event_id != index.event_id:
+            return WRONG_EVENT, None
+        return None, index.add(row.id, code, _checked_in_at(row))
+
+    def _refresh(self, index, slots):
+        """Reread when `slots` were checked in, after losing the UPDATE to another scan."""
+        for start in range(0, len(slots), SYNC_BATCH_SIZE):
+            batch = {index.pass_ids[slot]: slot for slot in slots[start:start + SYNC_BATCH_SIZE]}
+            rows = db.session.execute(
+                select(EventPass.id, EventPass.checked_in_at, EventPass.att_status)
+                .where(EventPass.id.in_(batch))
+            )
+            for row in rows:
+                index.checked_in[batch[row.id]] = _checked_in_at(row)
+        db.session.rollback()
+
+
+gate = Gate()
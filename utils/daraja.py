@@ -0,0 +1,307 @@
+# utils/daraja.py
+#
+# Outbound client for Safaricom Daraja STK pushes. STKPush marks the order as
+# "pushing", hands the push to this client and answers 202 at once, so a web
+# worker never waits on the gateway. The push itself runs on a pool of
+# MPESA_PUSH_WORKERS threads (also the cap on concurrent gateway calls); at
+# most MPESA_MAX_PENDING pushes wait for one, after which submit() raises
+# DarajaBusy (a 503). The outcome lands on Order.payment_status, which the
+# client polls; the payment itself arrives later as a callback
+# (utils/payments.py).
+#
+# Connections are kept alive and reused from a small pool, and the OAuth
+# token is cached until shortly before Daraja expires it. Every call has a
+# socket timeout of MPESA_TIMEOUT seconds. With MPESA_PUSH_WORKERS=0 the push
+# runs inside the request instead. Without credentials the client is
+# disabled and STKPush keeps its mocked, immediate payment.
+
+import base64
+import http.client
+import json
+import logging
+import math
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from sqlalchemy import and_, or_, update
+from models import db, Order, PaymentCallback
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://sandbox.safaricom.co.ke"
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 10  # seconds
+PENDING_PER_WORKER = 8
+TOKEN_MARGIN = 60  # seconds before expiry to fetch a new token
+PUSH_RETRY_AFTER = 60  # seconds before a push stuck in "pushing" (worker died) may be sent again
+ACCOUNT_PREFIX = "ORD"
+
+
+class DarajaError(Exception):
+    pass
+
+
+class DarajaBusy(Exception):
+    pass
+
+
+def msisdn(phone):
+    """`phone` as Daraja wants it (2547XXXXXXXX). Raises ValueError."""
+    digits = re.sub(r"[\s+-]", "", str(phone or ""))
+    if re.fullmatch(r"0[17]\d{8}", digits):
+        digits = "254" + digits[1:]
+    if not re.fullmatch(r"254[17]\d{8}", digits):
+        raise ValueError("Phone must be a Kenyan mobile number, e.g. 0712345678")
+    return digits
+
+
+def account_reference(order_id):
+    """AccountReference for order pk `order_id`. Daraja allows 12 characters,
+    too few for Order.order_id, and it comes back on M-Pesa statements."""
+    return f"{ACCOUNT_PREFIX}{order_id}"
+
+
+def order_from_reference(reference):
+    """The order pk in an AccountReference, or None."""
+    reference = (reference or "").strip().upper()
+    if reference.startswith(ACCOUNT_PREFIX) and reference[len(ACCOUNT_PREFIX):].isdigit():
+        return int(reference[len(ACCOUNT_PREFIX):])
+    return None
+
+
+class DarajaClient:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.timeout = DEFAULT_TIMEOUT
+        self.workers = DEFAULT_WORKERS
+        self.executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = None
+        self._idle = queue.LifoQueue()
+        self._token = None
+        self._token_expires = 0
+        self._token_lock = threading.Lock()
+        self.connections_opened = 0
+        self.tokens_fetched = 0
+
+    def init_app(self, app):
+        self.app = app
+        config = app.config
+        self.consumer_key = config.get("MPESA_CONSUMER_KEY")
+        self.consumer_secret = config.get("MPESA_CONSUMER_SECRET")
+        self.shortcode = config.get("MPESA_SHORTCODE")
+        self.passkey = config.get("MPESA_PASSKEY")
+        self.callback_url = config.get("MPESA_CALLBACK_URL")
+        self.enabled = all((self.consumer_key, self.consumer_secret, self.shortcode,
+                            self.passkey, self.callback_url))
+        self.timeout = config.get("MPESA_TIMEOUT", DEFAULT_TIMEOUT)
+
+        url = urlsplit(config.get("MPESA_BASE_URL") or DEFAULT_BASE_URL)
+        self.scheme, self.host, self.port = url.scheme, url.hostname, url.port
+        self.prefix = url.path.rstrip("/")
+
+        self.workers = config.get("MPESA_PUSH_WORKERS", DEFAULT_WORKERS)
+        pending = config.get("MPESA_MAX_PENDING") or max(self.workers, 1) * PENDING_PER_WORKER
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self._slots = threading.BoundedSemaphore(pending)
+        self._close_idle()
+        self._idle = queue.LifoQueue(max(self.workers, DEFAULT_WORKERS))
+        self._token = None
+
+    # ------------------ HTTP ------------------
+
+    def _connect(self):
+        self.connections_opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _close_idle(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _request(self, method, path, body=None, headers=None):
+        """(status, parsed JSON body or None). Raises DarajaError on network errors."""
+        for attempt in (1, 2):
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._connect(), False
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                # The gateway closed an idle keep-alive connection: nothing
+                # was processed, so one retry on a fresh one is safe.
+                if reused and attempt == 1:
+                    continue
+                raise DarajaError(f"Gateway connection failed: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise DarajaError(f"Gateway request failed: {e!r}")
+
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    self._idle.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            try:
+                return response.status, json.loads(data) if data else None
+            except ValueError:
+                return response.status, None
+
+    # ------------------ Daraja API ------------------
+
+    def access_token(self, refresh=False):
+        with self._token_lock:
+            if self._token and not refresh and time.monotonic() < self._token_expires:
+                return self._token
+            credentials = base64.b64encode(f"{self.consumer_key}:{self.consumer_secret}".encode()).decode()
+            status, data = self._request("GET", "/oauth/v1/generate?grant_type=client_credentials",
+                                         headers={"Authorization": f"Basic {credentials}"})
+            if status != 200 or not isinstance(data, dict) or not data.get("access_token"):
+                raise DarajaError(f"OAuth failed with HTTP {status}")
+            self.tokens_fetched += 1
+            self._token = data["access_token"]
+            self._token_expires = time.monotonic() + int(data.get("expires_in", 3599)) - TOKEN_MARGIN
+            return self._token
+
+    def stk_push(self, reference, amount, phone):
+        """Ask Daraja to prompt `phone` for `amount`. Returns the CheckoutRequestID."""
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        password = base64.b64encode(f"{self.shortcode}{self.passkey}{timestamp}".encode()).decode()
+        body = json.dumps({
+            "BusinessShortCode": self.shortcode,
+            "Password": password,
+            "Timestamp": timestamp,
+            "TransactionType": "CustomerPayBillOnline",
+            "Amount": int(math.ceil(amount)),
+            "PartyA": phone,
+            "PartyB": self.shortcode,
+            "PhoneNumber": phone,
+            "CallBackURL": self.callback_url,
+            "AccountReference": reference,
+            "TransactionDesc": "Event tickets",
+        })
+        for refresh in (False, True):
+            headers = {"Authorization": f"Bearer {self.access_token(refresh)}",
+                       "Content-Type": "application/json"}
+            status, data = self._request("POST", "/mpesa/stkpush/v1/processrequest", body, headers)
+            if status != 401:
+                break
+        data = data if isinstance(data, dict) else {}
+        if status == 200 and str(data.get("ResponseCode")) == "0" and data.get("CheckoutRequestID"):
+            return data["CheckoutRequestID"]
+        raise DarajaError(data.get("errorMessage") or data.get("ResponseDescription") or f"HTTP {status}")
+
+    # ------------------ Pushes ------------------
+
+    def submit(self, order_id, phone):
+        """Send the STK push for claimed order `order_id` (its pk), in the
+        background. Call after the claim has committed."""
+        if self.workers <= 0:
+            self._push(order_id, phone)
+            return
+        if not self._slots.acquire(blocking=False):
+            raise DarajaBusy()
+        with self._executor_lock:
+            # Created by the first push, so only a serving process has one.
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="stk-push")
+        try:
+            future = self.executor.submit(self._run, order_id, phone)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _run(self, order_id, phone):
+        with self.app.app_context():
+            try:
+                self._push(order_id, phone)
+            except Exception:
+                db.session.rollback()
+                logger.exception("STK push for order %s crashed", order_id)
+
+    def _push(self, order_id, phone):
+        order = db.session.get(Order, order_id)
+        try:
+            checkout_request_id = self.stk_push(account_reference(order.id), order.total_amount, phone)
+        except DarajaError as e:
+            logger.warning("STK push for order %s failed: %s", order.order_id, e)
+            finish_push(order_id, error=str(e))
+        else:
+            finish_push(order_id, checkout_request_id=checkout_request_id)
+        db.session.commit()
+
+
+# ------------------ Order state ------------------
+
+def claim_push(order_id, now=None):
+    """Mark pending order `order_id` (pk) as pushing, unless a push is already
+    under way. Returns True if the caller should send one.
+
+    An order awaiting its callback is never pushed again: a new push would
+    replace checkout_request_id, and the first prompt's result would then
+    match no order. Daraja always calls back, with a timeout result if the
+    customer ignores the prompt, and lost callbacks are recovered by
+    `flask reconcile-payments`.
+    """
+    now = now or datetime.now()
+    result = db.session.execute(
+        update(Order)
+        .where(
+            Order.id == order_id,
+            Order.status == "pending",
+            or_(
+                Order.payment_status.is_(None),
+                Order.payment_status.in_(("push_failed", "declined")),
+                and_(Order.payment_status == "pushing",
+                     Order.payment_requested_at < now - timedelta(seconds=PUSH_RETRY_AFTER)),
+            ),
+        )
+        .values(payment_status="pushing", payment_error=None, payment_requested_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def finish_push(order_id, checkout_request_id=None, error=None):
+    """Record what Daraja said about the push for order `order_id` (pk)."""
+    if error is not None:
+        values = {"payment_status": "push_failed", "payment_error": error[:200]}
+    else:
+        values = {"payment_status": "awaiting_callback", "checkout_request_id": checkout_request_id}
+    db.session.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.payment_status == "pushing")
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if checkout_request_id:
+        # A callback that beat us here found no order; settle it again.
+        db.session.execute(
+            update(PaymentCallback)
+            .where(PaymentCallback.checkout_request_id == checkout_request_id,
+                   PaymentCallback.outcome == "unknown_order")
+            .values(status="new", outcome=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+daraja = DarajaClient()
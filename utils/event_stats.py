@@ -0,0 +1,125 @@
+# utils/event_stats.py
+#
+# Per-event dashboard aggregates. EventStats holds paid tickets, paid
+# revenue and review count/sum for each event, and TicketStats paid tickets
+# and revenue for each ticket type, adjusted in the same transaction as the
+# payment or review that changes them, so the organizer dashboard reads one
+# row per event and ticket type instead of re-aggregating orders and
+# reviews. Pending holds are not counted; Ticket.sold still tracks those.
+#
+# Revenue is what the customer paid, Order.total_amount, shared across the
+# order's items by quantity, so the per-event and per-ticket figures add up
+# to the platform revenue metric even after a ticket's price changes.
+
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.orm import aliased
+from models import db, EventStats, TicketStats, Order, OrderItem, Ticket
+
+_items = aliased(OrderItem)
+
+# An order item's share of its order's total; queries using it join Order.
+LINE_REVENUE = Order.total_amount * OrderItem.quantity / (
+    select(func.sum(_items.quantity)).where(_items.order_id == OrderItem.order_id).scalar_subquery()
+)
+
+
+def bump_event_stats(event_id, **deltas):
+    """Add `deltas` (tickets_sold=, revenue=, review_count=, review_sum=) to one event's row."""
+    result = db.session.execute(
+        update(EventStats)
+        .where(EventStats.event_id == event_id)
+        .values({k: getattr(EventStats, k) + v for k, v in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.execute(insert(EventStats).values(event_id=event_id, **deltas))
+
+
+def bump_ticket_stats(ticket_id, **deltas):
+    """Add `deltas` (tickets_sold=, revenue=) to one ticket type's row."""
+    result = db.session.execute(
+        update(TicketStats)
+        .where(TicketStats.ticket_id == ticket_id)
+        .values({k: getattr(TicketStats, k) + v for k, v in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.session.execute(insert(TicketStats).values(ticket_id=ticket_id, **deltas))
+
+
+def create_event_stats(event_id):
+    db.session.add(EventStats(event_id=event_id, tickets_sold=0, revenue=0, review_count=0, review_sum=0))
+
+
+def remove_event_stats(event_id):
+    db.session.query(EventStats).filter(EventStats.event_id == event_id).delete(synchronize_session=False)
+    db.session.query(TicketStats).filter(
+        TicketStats.ticket_id.in_(select(Ticket.id).where(Ticket.event_id == event_id))
+    ).delete(synchronize_session=False)
+
+
+def remove_ticket_stats(ticket_id):
+    db.session.query(TicketStats).filter(TicketStats.ticket_id == ticket_id).delete(synchronize_session=False)
+
+
+def record_payment(order_id, sign=1):
+    """Count a newly paid order's tickets and revenue against their events.
+
+    sign=-1 takes them off again, e.g. when the order is deleted.
+    """
+    record_payments([order_id], sign)
+
+
+def record_payments(order_ids, sign=1):
+    """record_payment() for many orders: one aggregate query, one bump per
+    ticket type and one per event."""
+    sales = db.session.query(
+        Ticket.event_id, OrderItem.ticket_id, func.sum(OrderItem.quantity), func.sum(LINE_REVENUE)
+    ).join(OrderItem.ticket).join(OrderItem.order)\
+        .filter(OrderItem.order_id.in_(order_ids)).group_by(Ticket.event_id, OrderItem.ticket_id).all()
+    events = {}
+    for event_id, ticket_id, quantity, revenue in sales:
+        bump_ticket_stats(ticket_id, tickets_sold=sign * quantity, revenue=sign * revenue)
+        totals = events.setdefault(event_id, [0, 0])
+        totals[0] += quantity
+        totals[1] += revenue
+    for event_id, (quantity, revenue) in events.items():
+        bump_event_stats(event_id, tickets_sold=sign * quantity, revenue=sign * revenue)
+
+
+def record_review(event_id, rating, sign=1):
+    bump_event_stats(event_id, review_count=sign, review_sum=sign * rating)
+
+
+# ------------------ Reconciliation ------------------
+
+REBUILD_SQL = (
+    "INSERT INTO event_stats (event_id, tickets_sold, revenue, review_count, review_sum) "
+    "SELECT e.id, "
+    " coalesce((SELECT sum(oi.quantity) FROM order_items oi"
+    "  JOIN tickets t ON t.id = oi.ticket_id JOIN orders o ON o.id = oi.order_id"
+    "  WHERE t.event_id = e.id AND o.status = 'paid'), 0), "
+    " coalesce((SELECT sum(o.total_amount * oi.quantity"
+    "   / (SELECT sum(q.quantity) FROM order_items q WHERE q.order_id = o.id)) FROM order_items oi"
+    "  JOIN tickets t ON t.id = oi.ticket_id JOIN orders o ON o.id = oi.order_id"
+    "  WHERE t.event_id = e.id AND o.status = 'paid'), 0), "
+    " (SELECT count(*) FROM reviews r WHERE r.event_id = e.id), "
+    " coalesce((SELECT sum(r.rating) FROM reviews r WHERE r.event_id = e.id), 0) "
+    "FROM events e"
+)
+
+REBUILD_TICKET_SQL = (
+    "INSERT INTO ticket_stats (ticket_id, tickets_sold, revenue) "
+    "SELECT oi.ticket_id, sum(oi.quantity), "
+    " sum(o.total_amount * oi.quantity / (SELECT sum(q.quantity) FROM order_items q WHERE q.order_id = o.id)) "
+    "FROM order_items oi JOIN orders o ON o.id = oi.order_id JOIN tickets t ON t.id = oi.ticket_id "
+    "WHERE o.status = 'paid' GROUP BY oi.ticket_id"
+)
+
+
+def rebuild_event_stats():
+    """Recompute every event's aggregates from orders and reviews."""
+    db.session.query(EventStats).delete(synchronize_session=False)
+    db.session.query(TicketStats).delete(synchronize_session=False)
+    db.session.execute(text(REBUILD_SQL))
+    db.session.execute(text(REBUILD_TICKET_SQL))
@@ -0,0 +1,76 @@
+# utils/export.py
+#
+# Streaming CSV / NDJSON encoders. Rows come from a column-projected query
+# run with yield_per, so the database driver hands them over in batches
+# (a server-side cursor on Postgres) and the worker holds one batch and one
+# output chunk at a time, whatever the size of the result.
+
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_BATCH_SIZE = 1000
+CHUNK_ROWS = 500
+
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        return "; ".join(str(v) for v in value)
+    return _plain(value)
+
+
+def encode_csv(rows, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for n, row in enumerate(rows, start=1):
+        writer.writerow([_cell(v) for v in row])
+        if n % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(rows, header):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps({k: _plain(v) for k, v in zip(header, row)}))
+        if len(chunk) == CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson}
+
+
+def stream_query(query):
+    """Iterate `query` in batches instead of loading the whole result."""
+    return query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def export_response(rows, header, fmt, filename):
+    """Stream `rows` (one value per header entry) as an attachment.
+
+    `rows` is consumed lazily while the response is sent, e.g. a
+    stream_query() or a generator over one.
+    """
+    return attachment(stream_with_context(ENCODERS[fmt](rows, header)), fmt, filename)
+
+
+def attachment(body, fmt, filename, **kwargs):
+    response = Response(body, mimetype=MIMETYPES[fmt], **kwargs)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,140 @@
+# utils/facets.py
+#
+# Normalized facet values for approved events. Each approved event has one
+# EventFacet row per category, location and tag, so filters such as
+# ?tag=live become index lookups instead of LIKE scans over Event.tags.
+# FacetCount keeps the number of approved events per value and is adjusted
+# on every write, so the unfiltered counts cost one small indexed read.
+
+from collections import Counter, defaultdict
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Event, EventFacet, FacetCount
+
+FACETS = ("category", "location", "tag")
+FACET_LIMIT = 20
+
+
+def normalize(value):
+    return " ".join((value or "").split()).lower()
+
+
+def facet_values(event):
+    """The (facet, value) pairs an event contributes; empty unless approved."""
+    if not event.is_approved:
+        return set()
+    values = set()
+    if normalize(event.category):
+        values.add(("category", normalize(event.category)))
+    if normalize(event.location):
+        values.add(("location", normalize(event.location)))
+    for tag in (event.tags or "").split(","):
+        if normalize(tag):
+            values.add(("tag", normalize(tag)))
+    return values
+
+
+def _bump(facet, value, delta):
+    stmt = update(FacetCount)\
+        .where(FacetCount.facet == facet, FacetCount.value == value)\
+        .values(count=FacetCount.count + delta)\
+        .execution_options(synchronize_session=False)
+    if db.session.execute(stmt).rowcount or delta <= 0:
+        return
+    # First event with this value; a concurrent write may create the row first.
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(FacetCount).values(facet=facet, value=value, count=delta))
+    except IntegrityError:
+        db.session.execute(stmt)
+
+
+def sync_event_facets(event):
+    """Bring an event's facet rows and the counts in line with its current state."""
+    old = {
+        (f, v) for f, v in db.session.query(EventFacet.facet, EventFacet.value)
+        .filter(EventFacet.event_id == event.id)
+    }
+    new = facet_values(event)
+
+    for facet, value in old - new:
+        _bump(facet, value, -1)
+        db.session.query(EventFacet).filter(
+            EventFacet.event_id == event.id,
+            EventFacet.facet == facet,
+            EventFacet.value == value
+        ).delete(synchronize_session=False)
+    for facet, value in new - old:
+        _bump(facet, value, 1)
+        db.session.add(EventFacet(event_id=event.id, facet=facet, value=value))
+
+
+def remove_event_facets(event):
+    for facet, value in db.session.query(EventFacet.facet, EventFacet.value)\
+            .filter(EventFacet.event_id == event.id):
+        _bump(facet, value, -1)
+    db.session.query(EventFacet).filter(EventFacet.event_id == event.id).delete(synchronize_session=False)
+
+
+# ------------------ Reads ------------------
+
+def facet_filter(facet, value):
+    """Clause restricting Event rows to those carrying facet=value."""
+    return Event.id.in_(
+        select(EventFacet.event_id).where(EventFacet.facet == facet, EventFacet.value == normalize(value))
+    )
+
+
+def precomputed_counts(limit=FACET_LIMIT):
+    counts = {}
+    for facet in FACETS:
+        rows = db.session.query(FacetCount.value, FacetCount.count)\
+            .filter(FacetCount.facet == facet, FacetCount.count > 0)\
+            .order_by(FacetCount.count.desc()).limit(limit).all()
+        counts[facet] = [{"value": v, "count": n} for v, n in rows]
+    return counts
+
+
+def filtered_counts(event_ids, limit=FACET_LIMIT):
+    """Facet counts over a filtered set; `event_ids` is a select of Event.id."""
+    rows = db.session.query(EventFacet.facet, EventFacet.value, func.count())\
+        .filter(EventFacet.event_id.in_(event_ids))\
+        .group_by(EventFacet.facet, EventFacet.value).all()
+    grouped = defaultdict(Counter)
+    for facet, value, n in rows:
+        grouped[facet][value] = n
+    return {
+        facet: [{"value": v, "count": n} for v, n in grouped[facet].most_common(limit)]
+        for facet in FACETS
+    }
+
+
+# ------------------ Reconciliation ------------------
+
+def rebuild_facets(chunk=5000):
+    """Recompute every facet row and count from the events table."""
+    db.session.query(EventFacet).delete(synchronize_session=False)
+    db.session.query(FacetCount).delete(synchronize_session=False)
+
+    counts = Counter()
+    last_id = 0
+    while True:
+        events = db.session.query(Event.id, Event.category, Event.location, Event.tags, Event.is_approved)\
+            .filter(Event.is_approved == True, Event.id > last_id)\
+            .order_by(Event.id).limit(chunk).all()
+        if not events:
+            break
+        batch = []
+        for event in events:
+            for facet, value in facet_values(event):
+                counts[(facet, value)] += 1
+                batch.append({"event_id": event.id, "facet": facet, "value": value})
+        if batch:
+            db.session.execute(insert(EventFacet), batch)
+        last_id = events[-1].id
+
+    if counts:
+        db.session.execute(insert(FacetCount), [
+            {"facet": f, "value": v, "count": n} for (f, v), n in counts.items()
+        ])
@@ -0,0 +1,97 @@
+# utils/holds.py
+#
+# Pending orders hold their seats until expires_at. The sweeper flips expired
+# holds to "expired" in batches and hands their OrderItem quantities back to
+# the reservation engine. Each batch is one UPDATE ... RETURNING driven by
+# ix_orders_status_expires_at, so it never scans the whole orders table.
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select, update
+from models import db, Order, OrderItem, Ticket
+from utils.cache import invalidate_tickets
+from utils.inventory import release_tickets, fold_ticket_shards
+from utils.metrics import bump_metric
+
+logger = logging.getLogger(__name__)
+
+HOLD_MINUTES = 15
+SWEEP_BATCH_SIZE = 5000
+
+
+def hold_expiry(now=None):
+    minutes = current_app.config.get("ORDER_HOLD_MINUTES", HOLD_MINUTES)
+    return (now or datetime.now()) + timedelta(minutes=minutes)
+
+
+def expire_holds_batch(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Expire up to `batch_size` overdue holds in one transaction. Returns the count."""
+    now = now or datetime.now()
+
+    overdue = select(Order.id)\
+        .where(Order.status == "pending", Order.expires_at <= now)\
+        .order_by(Order.expires_at)\
+        .limit(batch_size)
+    expired_ids = db.session.execute(
+        update(Order)
+        .where(Order.id.in_(overdue.scalar_subquery()), Order.status == "pending")
+        .values(status="expired")
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    if not expired_ids:
+        db.session.rollback()
+        return 0
+
+    released = db.session.query(Ticket.event_id, OrderItem.ticket_id, func.sum(OrderItem.quantity))\
+        .join(OrderItem.ticket)\
+        .filter(OrderItem.order_id.in_(expired_ids))\
+        .group_by(Ticket.event_id, OrderItem.ticket_id).all()
+    for _, ticket_id, quantity in released:
+        release_tickets(ticket_id, quantity)
+    bump_metric("ticket_sales", -sum(quantity for _, _, quantity in released))
+
+    db.session.commit()
+    for event_id in {event_id for event_id, _, _ in released}:
+        invalidate_tickets(event_id)
+    return len(expired_ids)
+
+
+def expire_holds(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Expire every overdue hold, one batch at a time."""
+    total = 0
+    while True:
+        count = expire_holds_batch(now, batch_size)
+        total += count
+        if count < batch_size:
+            return total
+
+
+def sweep(app):
+    with app.app_context():
+        try:
+            expired = expire_holds()
+            fold_ticket_shards()
+            db.session.commit()
+            if expired:
+                logger.info("Expired %s order holds", expired)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Order hold sweep failed")
+
+
+def start_hold_sweeper(app, interval):
+    """Run sweep() every `interval` seconds on a daemon thread."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            sweep(app)
+
+    thread = threading.Thread(target=loop, name="hold-sweeper", daemon=True)
+    thread.start()
+    return thread
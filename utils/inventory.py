@@ -0,0 +1,237 @@
+# utils/inventory.py
+#
+# Ticket reservation engine. Every change to Ticket.sold goes through a single
+# conditional UPDATE so two workers can never both see the same free seats
+# and oversell. Hot ticket types can be split into TicketShard rows: each
+# shard owns a slice of the quantity, reservations start on a random shard,
+# and concurrent buyers mostly lock different rows instead of queueing on
+# the one tickets row.
+#
+# The helpers only issue statements on db.session; the caller owns the
+# transaction and must roll back when a reservation returns False.
+
+import logging
+import random
+
+from sqlalchemy import case, func, select, update
+from models import db, Ticket, TicketShard
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = 8
+SHARD_MIN_QUANTITY = 1000
+RELEASE_PASSES = 3
+
+
+def _take_from_ticket(ticket_id, quantity):
+    sold = func.coalesce(Ticket.sold, 0)
+    result = db.session.execute(
+        update(Ticket)
+        .where(Ticket.id == ticket_id, sold + quantity <= Ticket.quantity)
+        .values(sold=sold + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _take_from_shard(shard_id, quantity):
+    result = db.session.execute(
+        update(TicketShard)
+        .where(TicketShard.id == shard_id, TicketShard.sold + quantity <= TicketShard.quantity)
+        .values(sold=TicketShard.sold + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _shard_rows(ticket_id):
+    return db.session.query(TicketShard.id, TicketShard.quantity - TicketShard.sold)\
+        .filter(TicketShard.ticket_id == ticket_id)\
+        .order_by(TicketShard.shard_no).all()
+
+
+def reserve_tickets(ticket_id, quantity):
+    """Atomically take `quantity` seats. Returns False if they are not available."""
+    if quantity <= 0:
+        return False
+
+    shards = _shard_rows(ticket_id)
+    if not shards:
+        return _take_from_ticket(ticket_id, quantity)
+
+    # Fast path: one shard covers the whole request. Start at a random shard so
+    # concurrent buyers spread across rows.
+    start = random.randrange(len(shards))
+    ordered = shards[start:] + shards[:start]
+    for shard_id, free in ordered:
+        if free >= quantity and _take_from_shard(shard_id, quantity):
+            return True
+
+    # Slow path: the seats are fragmented across shards. Take what each shard
+    # has; a failed take means someone beat us to it, so the caller rolls the
+    # partial takes back with the rest of the transaction.
+    needed = quantity
+    for shard_id, free in ordered:
+        take = min(free, needed)
+        if take <= 0:
+            continue
+        if not _take_from_shard(shard_id, take):
+            return False
+        needed -= take
+        if needed == 0:
+            return True
+    return False
+
+
+def release_tickets(ticket_id, quantity):
+    """Give `quantity` seats back, e.g. when an order is cancelled or expires."""
+    if quantity <= 0:
+        return
+
+    remaining = quantity
+    for _ in range(RELEASE_PASSES):
+        shards = db.session.query(TicketShard.id, TicketShard.sold)\
+            .filter(TicketShard.ticket_id == ticket_id, TicketShard.sold > 0)\
+            .order_by(TicketShard.shard_no).all()
+        if not shards:
+            break
+        for shard_id, sold in shards:
+            give = min(sold, remaining)
+            if _give_to_shard(shard_id, give):
+                remaining -= give
+                if remaining == 0:
+                    return
+        # A shard changed between the read and the UPDATE; read them again.
+
+    if remaining == quantity and not _shard_rows(ticket_id):
+        sold = func.coalesce(Ticket.sold, 0)
+        db.session.execute(
+            update(Ticket)
+            .where(Ticket.id == ticket_id)
+            .values(sold=case((sold > quantity, sold - quantity), else_=0))
+            .execution_options(synchronize_session=False)
+        )
+    elif remaining:
+        logger.warning("Ticket %s: %s of %s released seats found no shard to return to",
+                       ticket_id, remaining, quantity)
+
+
+def _give_to_shard(shard_id, quantity):
+    result = db.session.execute(
+        update(TicketShard)
+        .where(TicketShard.id == shard_id, TicketShard.sold >= quantity)
+        .values(sold=TicketShard.sold - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def available_tickets(ticket_id):
+    shards = _shard_rows(ticket_id)
+    if shards:
+        return sum(free for _, free in shards)
+    ticket = db.session.get(Ticket, ticket_id)
+    return ticket.quantity - (ticket.sold or 0) if ticket else 0
+
+
+def sold_counts(tickets):
+    """{ticket id: seats taken} for `tickets`, summing the shards of sharded
+    ones, whose Ticket.sold only catches up when the sweeper folds them."""
+    sold = {ticket.id: ticket.sold or 0 for ticket in tickets}
+    if sold:
+        sold.update(
+            db.session.query(TicketShard.ticket_id, func.sum(TicketShard.sold))
+            .filter(TicketShard.ticket_id.in_(list(sold)))
+            .group_by(TicketShard.ticket_id).all()
+        )
+    return sold
+
+
+def shard_ticket(ticket, shards=SHARD_COUNT):
+    """Split a ticket's quantity and sold count across `shards` counter rows.
+
+    Safe to call again after the ticket's quantity changes. The ticket row
+    and its shards are locked and rebuilt in place, so a reservation running
+    meanwhile waits and then re-checks against the new counters instead of
+    being lost. Raises ValueError if the quantity is below the seats sold.
+    """
+    quantity, ticket_sold = db.session.execute(
+        select(Ticket.quantity, func.coalesce(Ticket.sold, 0))
+        .where(Ticket.id == ticket.id)
+        .with_for_update()
+    ).one()
+    existing = db.session.scalars(
+        select(TicketShard)
+        .where(TicketShard.ticket_id == ticket.id)
+        .order_by(TicketShard.shard_no)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).all()
+    sold = sum(shard.sold for shard in existing) if existing else ticket_sold
+    if sold > quantity:
+        raise ValueError(f"{sold} tickets are already sold; quantity cannot be lower")
+
+    by_no = {shard.shard_no: shard for shard in existing}
+    base_qty, extra_qty = divmod(quantity, shards)
+    base_sold, extra_sold = divmod(sold, shards)
+    for shard_no in range(shards):
+        shard_qty = base_qty + (1 if shard_no < extra_qty else 0)
+        # sold <= quantity, so each shard's slice of sold fits inside its slice of quantity
+        shard_sold = base_sold + (1 if shard_no < extra_sold else 0)
+        shard = by_no.pop(shard_no, None)
+        if shard is None:
+            db.session.add(TicketShard(ticket_id=ticket.id, shard_no=shard_no, quantity=shard_qty, sold=shard_sold))
+        else:
+            shard.quantity, shard.sold = shard_qty, shard_sold
+    for shard in by_no.values():
+        db.session.delete(shard)
+    db.session.execute(
+        update(Ticket)
+        .where(Ticket.id == ticket.id)
+        .values(sold=sold)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_ticket_quantity(ticket, quantity):
+    """Change a ticket's quantity, resharding it if it is or becomes big.
+
+    Raises ValueError if `quantity` is below the seats already sold; the
+    caller rolls back.
+    """
+    db.session.execute(
+        update(Ticket)
+        .where(Ticket.id == ticket.id)
+        .values(quantity=quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if quantity >= SHARD_MIN_QUANTITY or _shard_rows(ticket.id):
+        shard_ticket(ticket)
+    else:
+        # Unsharded reservations only touch the ticket row, which the UPDATE
+        # above has locked, so this read is current.
+        sold = db.session.scalar(select(func.coalesce(Ticket.sold, 0)).where(Ticket.id == ticket.id))
+        if sold > quantity:
+            raise ValueError(f"{sold} tickets are already sold; quantity cannot be lower")
+    db.session.refresh(ticket)
+
+
+def fold_ticket_shards(ticket_ids=None):
+    """Copy the sum of each sharded ticket's counters into Ticket.sold.
+
+    Reservations on sharded tickets only touch the shard rows, so Ticket.sold
+    lags until this runs. Availability checks never read it; anything else
+    that needs the current count reads sold_counts().
+    """
+    totals = db.session.query(TicketShard.ticket_id, func.sum(TicketShard.sold))\
+        .group_by(TicketShard.ticket_id)
+    if ticket_ids is not None:
+        totals = totals.filter(TicketShard.ticket_id.in_(ticket_ids))
+
+    for ticket_id, sold in totals.all():
+        db.session.execute(
+            update(Ticket)
+            .where(Ticket.id == ticket_id)
+            .values(sold=sold)
+            .execution_options(synchronize_session=False)
+        )
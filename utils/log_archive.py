@@ -0,0 +1,66 @@
+# utils/log_archive.py
+#
+# Keeps the logs table small by moving old audit rows into gzip-compressed
+# NDJSON files, one file per run (flask archive-logs). Rows are streamed to
+# the file in yield_per batches; only once the file is complete and renamed
+# into place are the same rows deleted, a batch per transaction so writers
+# are never blocked for long. A crash before the rename leaves the table
+# untouched; a crash during the deletes leaves rows that are both archived
+# and still in the table, and the next run archives them again.
+
+import gzip
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from models import db, Log
+
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_COLUMNS = ("id", "created_at", "user_id", "action", "meta_data")
+
+
+def archive_logs(before, directory, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move every log row created before `before` into a file in `directory`.
+
+    Returns (path, rows archived); path is None when there was nothing to do.
+    """
+    rows = db.session.execute(
+        select(*(getattr(Log, c) for c in ARCHIVE_COLUMNS))
+        .where(Log.created_at < before)
+        .order_by(Log.created_at, Log.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    os.makedirs(directory, exist_ok=True)
+    name = f"logs-before-{before:%Y%m%dT%H%M%S}-{datetime.now():%Y%m%dT%H%M%S}.ndjson.gz"
+    path = os.path.join(directory, name)
+    partial = path + ".partial"
+    count = 0
+    max_id = None
+    with gzip.open(partial, "wt", encoding="utf-8") as out:
+        for row in rows:
+            record = dict(zip(ARCHIVE_COLUMNS, row))
+            record["created_at"] = record["created_at"].isoformat() if record["created_at"] else None
+            out.write(json.dumps(record) + "\n")
+            count += 1
+            max_id = row.id if max_id is None else max(max_id, row.id)
+    db.session.rollback()
+
+    if not count:
+        os.remove(partial)
+        return None, 0
+    os.replace(partial, path)
+
+    # Rows inserted after the read started have ids above max_id, so this
+    # deletes exactly what was written to the file.
+    while True:
+        batch = select(Log.id).where(Log.created_at < before, Log.id <= max_id).limit(batch_size)
+        deleted = db.session.execute(
+            delete(Log).where(Log.id.in_(batch.scalar_subquery())).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if deleted < batch_size:
+            break
+    return path, count
+
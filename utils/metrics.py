@@ -0,0 +1,101 @@
+# utils/metrics.py
+#
+# Platform-wide counters for the admin dashboard. Each metric is spread over
+# METRIC_SHARDS rows of platform_metrics and writers add to a random shard in
+# their own transaction, so concurrent orders do not queue on a single
+# counter row. Reading a metric sums its shards: a fixed number of rows
+# however large the platform gets.
+#
+# reconcile_metrics() recomputes every metric from the source tables and
+# writes the difference into shard 0. Run it from cron (flask
+# reconcile-metrics) to catch drift from paths that do not bump counters,
+# such as cascading deletes.
+
+import logging
+import random
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from models import db, PlatformMetric, User, Event, Ticket, TicketShard, Order
+
+logger = logging.getLogger(__name__)
+
+METRIC_SHARDS = 16
+EVENT_STATUSES = ("pending", "active", "rejected")
+METRICS = ("users", "revenue", "ticket_sales") + tuple(f"events_{s}" for s in EVENT_STATUSES)
+
+
+def _add(name, shard, delta):
+    stmt = update(PlatformMetric)\
+        .where(PlatformMetric.name == name, PlatformMetric.shard == shard)\
+        .values(value=PlatformMetric.value + delta)\
+        .execution_options(synchronize_session=False)
+    if db.session.execute(stmt).rowcount:
+        return
+    # First write to this shard. A concurrent writer may create it first, so
+    # insert under a savepoint and fall back to the update.
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(PlatformMetric).values(name=name, shard=shard, value=delta))
+    except IntegrityError:
+        db.session.execute(stmt)
+
+
+def bump_metric(name, delta):
+    if delta:
+        _add(name, random.randrange(METRIC_SHARDS), delta)
+
+
+def event_status_changed(old, new):
+    if old != new:
+        if old:
+            bump_metric(f"events_{old}", -1)
+        if new:
+            bump_metric(f"events_{new}", 1)
+
+
+def read_metrics(names=METRICS):
+    totals = dict(
+        db.session.query(PlatformMetric.name, func.sum(PlatformMetric.value))
+        .filter(PlatformMetric.name.in_(names))
+        .group_by(PlatformMetric.name).all()
+    )
+    return {name: totals.get(name) or 0 for name in names}
+
+
+# ------------------ Reconciliation ------------------
+
+def actual_metrics():
+    """Every metric computed from the source tables (full scans)."""
+    unsharded_sold = db.session.query(func.sum(Ticket.sold))\
+        .filter(~Ticket.id.in_(db.session.query(TicketShard.ticket_id))).scalar() or 0
+    sharded_sold = db.session.query(func.sum(TicketShard.sold)).scalar() or 0
+    statuses = dict(db.session.query(Event.status, func.count(Event.id)).group_by(Event.status).all())
+
+    actual = {
+        "users": db.session.query(func.count(User.id)).scalar(),
+        "revenue": db.session.query(func.sum(Order.total_amount)).filter(Order.status == "paid").scalar() or 0,
+        "ticket_sales": unsharded_sold + sharded_sold,
+    }
+    for status in EVENT_STATUSES:
+        actual[f"events_{status}"] = statuses.get(status, 0)
+    return actual
+
+
+def reconcile_metrics():
+    """Correct every metric to its recomputed value. Returns {name: drift}.
+
+    Writes that commit between the two reads can leave a small error of
+    their own; the next run sees it as drift and corrects it.
+    """
+    actual = actual_metrics()
+    current = read_metrics()
+    drift = {}
+    for name in METRICS:
+        delta = actual[name] - current[name]
+        if abs(delta) > 1e-6:
+            drift[name] = delta
+            _add(name, 0, delta)
+    if drift:
+        logger.warning("Platform metrics drifted: %s", drift)
+    return drift
@@ -0,0 +1,44 @@
+# utils/pagination.py
+#
+# Opaque cursors for keyset pagination. A cursor is the sort key of the last
+# row on a page, e.g. (start_time, id), so the next page is a range scan on
+# an index instead of an OFFSET that re-reads every earlier row.
+
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_size(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(raw) if raw is not None else default
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(*values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """Inverse of encode_cursor. Raises ValueError on anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError("Invalid cursor")
+
+    values = []
+    for value, kind in zip(payload, types):
+        try:
+            values.append(datetime.fromisoformat(value) if kind is datetime else kind(value))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    return tuple(values)
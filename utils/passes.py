@@ -0,0 +1,195 @@
+# utils/passes.py
+#
+# EventPasses, the tickets scanned at the gate. When an order is paid,
+# issue_passes() inserts one pass per seat of each of its OrderItems with a
+# single executemany, however large the group.
+#
+# Codes are computed rather than drawn at random, so they never need a
+# uniqueness query. A pass is identified by (order item id, seat number),
+# packed into 40 bits as item << 12 | seat. Those bits go through a 4-round
+# Feistel permutation keyed with PASS_CODE_SECRET, and the result is written
+# as 8 Crockford base32 characters plus a Luhn mod 32 check character, e.g.
+# "K7Q2M9XDP". A permutation maps distinct inputs to distinct outputs, so two
+# passes can never share a code, and the codes do not reveal how many were
+# sold. The check character catches any single mistyped character and most
+# swapped pairs before a lookup. parse_code() undoes the permutation, so a
+# code can be traced back to its order item without the database.
+
+import hashlib
+import hmac
+from functools import lru_cache
+
+from flask import current_app
+from sqlalchemy import exists, select
+from models import db, EventPass, Order, OrderItem, User
+
+SEAT_BITS = 12
+MAX_PASSES_PER_ITEM = 1 << SEAT_BITS  # 4096 seats per order item
+ITEM_BITS = 28  # order item ids up to ~268 million
+HALF_BITS = (ITEM_BITS + SEAT_BITS) // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+CODE_LENGTH = 9
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32: no I, L, O, U
+ISSUE_BATCH_SIZE = 5000
+
+# Core insert on the table: executemany without the ORM's per-row bookkeeping.
+_INSERT_PASS = EventPass.__table__.insert()
+
+_VALUES = {c: i for i, c in enumerate(ALPHABET)}
+_VALUES.update({"O": 0, "I": 1, "L": 1})  # read as the characters they look like
+
+
+@lru_cache(maxsize=4)
+def _round_keys(secret):
+    # One keyed hasher per round; copying it skips the key setup per call.
+    return tuple(
+        hashlib.blake2b(digest_size=3, key=hmac.new(secret.encode(), b"event-pass-%d" % n, hashlib.sha256).digest())
+        for n in range(ROUNDS)
+    )
+
+
+def _keys():
+    # Its own secret, never JWT_SECRET_KEY: rotating the JWT key must not
+    # change the codes of passes already issued.
+    secret = current_app.config.get("PASS_CODE_SECRET")
+    if not secret:
+        raise RuntimeError("PASS_CODE_SECRET is not set; it is needed to issue and read event passes")
+    return _round_keys(secret)
+
+
+def _f(half, hasher):
+    h = hasher.copy()
+    h.update(half.to_bytes(3, "big"))
+    return int.from_bytes(h.digest(), "big") & HALF_MASK
+
+
+def _permute(n, keys):
+    left, right = n >> HALF_BITS, n & HALF_MASK
+    for key in keys:
+        left, right = right, left ^ _f(right, key)
+    return left << HALF_BITS | right
+
+
+def _unpermute(n, keys):
+    left, right = n >> HALF_BITS, n & HALF_MASK
+    for key in reversed(keys):
+        left, right = right ^ _f(left, key), left
+    return left << HALF_BITS | right
+
+
+def _double(value):
+    value *= 2
+    return value // 32 + value % 32
+
+
+# The body is written 10 bits (two characters) at a time. Counting from the
+# right, Luhn doubles every other character: the second of each pair.
+_PAIRS = [ALPHABET[v >> 5] + ALPHABET[v & 31] for v in range(1024)]
+_PAIR_SUMS = [(v >> 5) + _double(v & 31) for v in range(1024)]
+
+
+def _check_character(body):
+    """Luhn mod 32 over the code body."""
+    total = sum(_PAIR_SUMS[_VALUES[body[i]] << 5 | _VALUES[body[i + 1]]] for i in range(0, len(body), 2))
+    return ALPHABET[-total % 32]
+
+
+def ticket_code(order_item_id, seat, keys=None):
+    """The code of seat `seat` (0-based) of order item `order_item_id`."""
+    if not 0 <= seat < MAX_PASSES_PER_ITEM or not 0 < order_item_id < 1 << ITEM_BITS:
+        raise ValueError("Pass number out of range")
+    n = _permute(order_item_id << SEAT_BITS | seat, keys or _keys())
+    a, b, c, d = n >> 30, n >> 20 & 1023, n >> 10 & 1023, n & 1023
+    total = _PAIR_SUMS[a] + _PAIR_SUMS[b] + _PAIR_SUMS[c] + _PAIR_SUMS[d]
+    return _PAIRS[a] + _PAIRS[b] + _PAIRS[c] + _PAIRS[d] + ALPHABET[-total % 32]
+
+
+def normalize_code(code):
+    """`code` as stored: upper case, without spaces or dashes, O/I/L read as 0/1/1."""
+    code = "".join((code or "").split()).replace("-", "").upper()
+    return "".join(ALPHABET[_VALUES[c]] if c in _VALUES else c for c in code)
+
+
+def well_formed_code(code):
+    """True if normalized `code` has the right length, alphabet and check
+    character. Needs no secret, so offline gates can use it."""
+    return (len(code) == CODE_LENGTH and all(c in _VALUES for c in code)
+            and _check_character(code[:-1]) == code[-1])
+
+
+def parse_code(code, keys=None):
+    """(order item id, seat) for a well-formed code, or None if it is mistyped or forged."""
+    code = normalize_code(code)
+    if not well_formed_code(code):
+        return None
+    n = 0
+    for c in code[:-1]:
+        n = n << 5 | _VALUES[c]
+    n = _unpermute(n, keys or _keys())
+    return n >> SEAT_BITS, n & (MAX_PASSES_PER_ITEM - 1)
+
+
+# ------------------ Issuing ------------------
+
+def _item_rows(where, limit=None):
+    return db.session.execute(
+        select(OrderItem.id, OrderItem.quantity, User.first_name, User.last_name, User.email, User.phone)
+        .join(Order, OrderItem.order_id == Order.id)
+        .outerjoin(User, Order.attendee_id == User.id)
+        .where(where)
+        .order_by(OrderItem.id)
+        .limit(limit)
+    ).all()
+
+
+def _insert_passes(items, keys):
+    count = 0
+    batch = []
+    for item_id, quantity, first_name, last_name, email, phone in items:
+        holder = {
+            "attendee_first_name": first_name or "",
+            "attendee_last_name": last_name or "",
+            "attendee_email": email or "",
+            "attendee_phone": phone or "",
+            "att_status": False,
+            "order_item_id": item_id,
+        }
+        for seat in range(min(quantity, MAX_PASSES_PER_ITEM)):
+            batch.append(dict(holder, ticket_code=ticket_code(item_id, seat, keys)))
+            if len(batch) >= ISSUE_BATCH_SIZE:
+                db.session.execute(_INSERT_PASS, batch)
+                count += len(batch)
+                batch = []
+    if batch:
+        db.session.execute(_INSERT_PASS, batch)
+        count += len(batch)
+    return count
+
+
+def issue_passes(order_ids):
+    """Insert the passes for newly paid orders `order_ids`, in the caller's
+    transaction. Passes carry the buyer's details. Returns how many."""
+    if not order_ids:
+        return 0
+    return _insert_passes(_item_rows(OrderItem.order_id.in_(order_ids)), _keys())
+
+
+def issue_missing_passes(batch_size=ISSUE_BATCH_SIZE):
+    """Issue passes for paid orders that have none (orders paid before passes
+    existed), committing per batch. Returns how many were issued."""
+    keys = _keys()
+    total = 0
+    last_id = 0
+    while True:
+        items = _item_rows(
+            (OrderItem.id > last_id)
+            & (Order.status == "paid")
+            & ~exists().where(EventPass.order_item_id == OrderItem.id),
+            batch_size,
+        )
+        if not items:
+            return total
+        total += _insert_passes(items, keys)
+        db.session.commit()
+        last_id = items[-1][0]
@@ -0,0 +1,116 @@
+# utils/passwords.py
+#
+# Password hashing for Register/Login. bcrypt runs on a bounded thread pool
+# (the bcrypt package releases the GIL while hashing, so threads use every
+# core) sized by PASSWORD_HASH_WORKERS, default one per CPU. Request threads
+# wait for their result, but at most PASSWORD_HASH_MAX_PENDING hashes are
+# queued or running; past that, callers wait PASSWORD_HASH_TIMEOUT seconds
+# for room and then get PasswordHasherBusy (a 503), so a login storm costs a
+# fixed amount of CPU and leaves request threads for everything else. A hash
+# that does not finish within PASSWORD_HASH_TIMEOUT is a 503 too.
+#
+# Bulk imports (hash_many) keep at most half the workers busy, so signups
+# and logins still get through while one runs.
+#
+# BCRYPT_LOG_ROUNDS sets the cost of new hashes. Hashes made with another
+# cost still verify, and Login replaces them once the password is known.
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+DEFAULT_TIMEOUT = 5  # seconds
+PENDING_PER_WORKER = 8
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.rounds = DEFAULT_ROUNDS
+        self.timeout = DEFAULT_TIMEOUT
+        self.workers = 1
+        self.executor = None
+        self._slots = None
+
+    def init_app(self, app):
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", DEFAULT_ROUNDS)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", DEFAULT_TIMEOUT)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1
+        pending = app.config.get("PASSWORD_HASH_MAX_PENDING") or self.workers * PENDING_PER_WORKER
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(pending)
+
+    def _submit(self, fn, *args, timeout=None):
+        """Queue fn(*args) on the pool once a slot is free. Waits up to
+        `timeout` seconds for one (None: as long as it takes)."""
+        if not self._slots.acquire(timeout=timeout):
+            raise PasswordHasherBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        future = self._submit(fn, *args, timeout=self.timeout)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        rounds = self.rounds
+        return self._run(
+            lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+        )
+
+    def hash_many(self, plain):
+        """Hash a list of passwords for a bulk import, in order.
+
+        At most half the workers' worth of them are on the pool at a time,
+        through the same slots as logins, so a login never queues behind
+        more than that.
+        """
+        rounds = self.rounds
+        work = lambda p: bcrypt.hashpw(p.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+        if self.executor is None:
+            return [work(p) for p in plain]
+        window = max(1, self.workers // 2)
+        hashes = []
+        running = deque()
+        for password in plain:
+            if len(running) >= window:
+                hashes.append(running.popleft().result())
+            running.append(self._submit(work, password))
+        hashes.extend(future.result() for future in running)
+        return hashes
+
+    def verify(self, hashed, password):
+        try:
+            return self._run(bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+        except ValueError:
+            # Not a bcrypt hash (e.g. a placeholder); it matches nothing.
+            return False
+
+    def needs_rehash(self, hashed):
+        # "$2b$12$<salt+hash>": the second field is the cost.
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+passwords = PasswordHasher()
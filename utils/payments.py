@@ -0,0 +1,302 @@
+# utils/payments.py
+#
+# M-Pesa payment settlement. Daraja posts an STK callback when the customer
+# answers the prompt, retries it if we do not answer 200 quickly, and may
+# deliver the same result more than once. STKCallback therefore only appends
+# the raw body to the payment_callbacks inbox and acks; a small pool of worker
+# threads claims inbox rows in batches and settles the matching orders.
+#
+# The M-Pesa receipt is the idempotency key: orders.mpesa_receipt is unique,
+# a receipt already on an order is recorded as a duplicate, and settle_order()
+# only ever moves an order from pending to paid, so a retried or replayed
+# callback can never count a sale twice. Claimed rows that a crashed worker
+# left in "processing" are picked up again after CLAIM_TIMEOUT.
+
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Order, PaymentCallback
+from utils.event_stats import record_payments
+from utils.metrics import bump_metric
+from utils.passes import issue_passes
+from utils.rollups import record_sales
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_POLL_INTERVAL = 2.0  # seconds
+CLAIM_TIMEOUT = 300  # seconds a claimed batch may take before others retry it
+ACCEPTED = {"ResultCode": 0, "ResultDesc": "Accepted"}
+
+
+def mark_paid(order, receipt):
+    """Move `order` from pending to paid with `receipt`. False if it was not pending.
+
+    Conditional, so an order the hold sweeper expired is never paid and a
+    repeated payment cannot count twice. Call record_paid() for the orders
+    it returned True for.
+    """
+    result = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status == "pending")
+        .values(status="paid", mpesa_receipt=receipt, expires_at=None, payment_status="paid")
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def record_paid(orders):
+    """Issue the passes for newly paid `orders` and add them to the event
+    stats, sales rollups and revenue metric."""
+    if orders:
+        issue_passes([order.id for order in orders])
+        record_payments([order.id for order in orders])
+        record_sales(orders)
+        bump_metric("revenue", sum(order.total_amount for order in orders))
+
+
+def settle_order(order, receipt):
+    """mark_paid() and record_paid() for a single order."""
+    if not mark_paid(order, receipt):
+        return False
+    record_paid([order])
+    return True
+
+
+def parse_callback(body):
+    """The fields we use from a Daraja STK callback body (a dict).
+
+    Raises ValueError if it is not shaped like one.
+    """
+    try:
+        callback = body["Body"]["stkCallback"]
+        fields = {
+            "checkout_request_id": str(callback["CheckoutRequestID"]),
+            "result_code": int(callback["ResultCode"]),
+            "result_desc": str(callback.get("ResultDesc") or ""),
+            "mpesa_receipt": None,
+            "amount": None,
+            "phone": None,
+        }
+        for item in (callback.get("CallbackMetadata") or {}).get("Item", []):
+            if item.get("Name") == "MpesaReceiptNumber":
+                fields["mpesa_receipt"] = str(item["Value"])
+            elif item.get("Name") == "Amount":
+                fields["amount"] = float(item["Value"])
+            elif item.get("Name") == "PhoneNumber":
+                fields["phone"] = str(item["Value"])
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        raise ValueError(f"Not an STK callback: {e!r}")
+    return fields
+
+
+# ------------------ Inbox ------------------
+
+_INSERT_CALLBACK = insert(PaymentCallback)
+
+
+def append_callback(raw):
+    """Store one callback body exactly as received and commit. Returns the row id.
+
+    The keys are copied out when the body parses so the inbox can be searched
+    by them; a body that does not parse is still kept, and marked invalid by
+    the worker.
+    """
+    try:
+        fields = parse_callback(json.loads(raw))
+    except ValueError:
+        fields = {}
+    # Straight on a pooled connection: no session, and a statement compiled once.
+    with db.engine.begin() as conn:
+        return conn.execute(_INSERT_CALLBACK, {
+            "payload": raw,
+            "checkout_request_id": fields.get("checkout_request_id"),
+            "mpesa_receipt": fields.get("mpesa_receipt"),
+            "result_code": fields.get("result_code"),
+            "received_at": datetime.now(),
+            "status": "new",
+        }).inserted_primary_key[0]
+
+
+def claim_callbacks(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Claim the oldest unprocessed inbox rows. Returns [(id, payload)] and commits.
+
+    Driven by ix_payment_callbacks_status_id; the conditional UPDATE means
+    two workers never claim the same row.
+    """
+    now = now or datetime.now()
+    claimable = or_(
+        PaymentCallback.status == "new",
+        and_(PaymentCallback.status == "processing",
+             PaymentCallback.claimed_at < now - timedelta(seconds=CLAIM_TIMEOUT)),
+    )
+    oldest = select(PaymentCallback.id).where(claimable).order_by(PaymentCallback.id).limit(batch_size)
+    rows = db.session.execute(
+        update(PaymentCallback)
+        .where(PaymentCallback.id.in_(oldest.scalar_subquery()), claimable)
+        .values(status="processing", claimed_at=now)
+        .returning(PaymentCallback.id, PaymentCallback.payload)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return sorted(rows)
+
+
+def _settle(fields, orders, used_receipts, paid):
+    """(outcome, order id) for one parsed callback; appends orders it paid to `paid`."""
+    order = orders.get(fields["checkout_request_id"])
+    order_id = order.id if order else None
+    receipt = fields["mpesa_receipt"]
+    if fields["result_code"] != 0:
+        # Cancelled, timed out or insufficient funds: the hold stays until it
+        # expires, so the customer can try again.
+        if order is not None:
+            db.session.execute(
+                update(Order)
+                .where(Order.id == order.id, Order.status == "pending")
+                .values(payment_status="declined", payment_error=fields["result_desc"][:200])
+                .execution_options(synchronize_session=False)
+            )
+        return "declined", order_id
+    if not receipt:
+        return "invalid", order_id
+    if receipt in used_receipts:
+        return "duplicate", order_id
+    if order is None:
+        return "unknown_order", None
+    if fields["amount"] is not None and fields["amount"] + 0.005 < order.total_amount:
+        return "underpaid", order_id
+
+    try:
+        with db.session.begin_nested():
+            updated = mark_paid(order, receipt)
+    except IntegrityError:
+        # Another worker stored this receipt on an order first.
+        used_receipts.add(receipt)
+        return "duplicate", order_id
+    if updated:
+        used_receipts.add(receipt)
+        paid.append(order)
+        return "paid", order_id
+    status, stored_receipt = db.session.execute(
+        select(Order.status, Order.mpesa_receipt).where(Order.id == order.id)
+    ).one()
+    if stored_receipt == receipt:
+        # Settled by another worker since this batch looked.
+        return "duplicate", order_id
+    # A second successful payment for a paid order, or money received after
+    # the hold expired: both need a refund or a manual fix.
+    return ("already_paid" if status == "paid" else "expired_order"), order_id
+
+
+def process_callbacks(batch_size=DEFAULT_BATCH_SIZE):
+    """Claim and settle one batch of inbox rows. Returns how many were claimed."""
+    rows = claim_callbacks(batch_size)
+    if not rows:
+        return 0
+
+    parsed = []
+    for row_id, payload in rows:
+        try:
+            parsed.append((row_id, parse_callback(json.loads(payload))))
+        except ValueError:
+            parsed.append((row_id, None))
+    valid = [fields for _, fields in parsed if fields is not None]
+
+    # Two queries for the whole batch: the orders the callbacks point at, and
+    # which of their receipts are already on an order.
+    checkout_ids = {f["checkout_request_id"] for f in valid}
+    orders = {
+        o.checkout_request_id: o
+        for o in Order.query.filter(Order.checkout_request_id.in_(checkout_ids))
+    } if checkout_ids else {}
+    receipts = {f["mpesa_receipt"] for f in valid if f["mpesa_receipt"]}
+    used_receipts = set(db.session.scalars(
+        select(Order.mpesa_receipt).where(Order.mpesa_receipt.in_(receipts))
+    )) if receipts else set()
+
+    now = datetime.now()
+    results = []
+    counts = {}
+    paid = []
+    for row_id, fields in parsed:
+        outcome, order_id = _settle(fields, orders, used_receipts, paid) if fields else ("invalid", None)
+        counts[outcome] = counts.get(outcome, 0) + 1
+        results.append({"id": row_id, "status": "done", "outcome": outcome,
+                        "order_id": order_id, "processed_at": now})
+    # The dashboard aggregates once for the whole batch, in the same commit.
+    record_paid(paid)
+    db.session.execute(update(PaymentCallback), results)
+    db.session.commit()
+
+    if set(counts) - {"paid", "duplicate", "declined"}:
+        logger.warning("Payment callbacks needing attention: %s", counts)
+    return len(rows)
+
+
+def process_all_callbacks(batch_size=DEFAULT_BATCH_SIZE):
+    """Settle everything in the inbox from the calling thread. Returns the count."""
+    total = 0
+    while True:
+        count = process_callbacks(batch_size)
+        total += count
+        if count < batch_size:
+            return total
+
+
+# ------------------ Workers ------------------
+
+class PaymentWorkers:
+    """Threads that drain the callback inbox, started by start() (see
+    utils/workers.py).
+
+    Each sleeps PAYMENT_POLL_INTERVAL between empty polls; notify() wakes
+    them as soon as a callback is stored in the same process.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.workers = DEFAULT_WORKERS
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.poll_interval = DEFAULT_POLL_INTERVAL
+        self.threads = []
+        self._wakeup = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get("PAYMENT_WORKERS", DEFAULT_WORKERS)
+        self.batch_size = app.config.get("PAYMENT_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        self.poll_interval = app.config.get("PAYMENT_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+
+    def start(self):
+        """Start PAYMENT_WORKERS threads. Returns them."""
+        for n in range(len(self.threads), self.workers):
+            thread = threading.Thread(target=self._run, name=f"payment-worker-{n}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self.threads
+
+    def notify(self):
+        if self.threads:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    count = process_callbacks(self.batch_size)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Payment callback batch failed")
+                    count = 0
+            if count < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+
+payment_workers = PaymentWorkers()
@@ -0,0 +1,309 @@
+# utils/reconciliation.py
+#
+# Reconciles orders against an M-Pesa statement (the CSV export of the
+# paybill's transactions) when callbacks were lost, delayed or disputed
+# (flask reconcile-payments).
+#
+# The statement is streamed with csv.reader and handled CHUNK_SIZE rows at a
+# time: each chunk is hash-joined against orders with two IN queries, one by
+# receipt (payments we already settled) and one by the AccountReference the
+# STK push sent (utils/daraja.account_reference). Pending orders the statement
+# shows as paid are settled with one conditional UPDATE per batch, matched
+# orders get reconciled_at stamped, and each chunk commits on its own, so
+# memory stays flat however long the statement is and an interrupted run can
+# simply be started again. Anything a person has to look at is streamed to
+# the issue report rather than kept.
+#
+# After the last chunk, paid orders whose push falls inside the statement's
+# time span but that no row matched are reported as not_in_statement.
+
+import csv
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Order
+from utils.daraja import order_from_reference
+from utils.payments import mark_paid, record_paid
+
+CHUNK_SIZE = 5000
+RECOVER_BATCH_SIZE = 500
+HEADER_SEARCH_LINES = 50  # the portal export starts with an account preamble
+UNSETTLED_GRACE = 600  # seconds: a push this close to the statement's end may be paid after it
+REPORT_COLUMNS = ("issue", "line", "receipt", "amount", "account", "order_id", "order_status", "detail")
+
+# Statement header -> field, lower-cased. The first set are the org portal's
+# names; the rest cover hand-made or third-party exports.
+STATEMENT_COLUMNS = {
+    "receipt no.": "receipt", "receipt no": "receipt", "receipt": "receipt",
+    "transaction id": "receipt", "transid": "receipt",
+    "completion time": "completed_at", "transaction time": "completed_at", "completed_at": "completed_at",
+    "transaction status": "status", "status": "status",
+    "paid in": "paid_in", "amount": "paid_in", "paid_in": "paid_in",
+    "a/c no.": "account", "a/c no": "account", "account": "account",
+    "account reference": "account", "billrefnumber": "account",
+    "reason type": "reason",
+    "linked transaction id": "linked", "linked_receipt": "linked",
+}
+_ORDER_COLUMNS = (Order.id, Order.order_id, Order.status, Order.mpesa_receipt,
+                  Order.total_amount, Order.created_at)
+
+
+# ------------------ Statement ------------------
+
+def _amount(value):
+    value = (value or "").replace(",", "").strip()
+    return float(value) if value else 0.0
+
+
+def _timestamp(value):
+    value = (value or "").strip()
+    if len(value) == 19 and value[2] in "-/" and value[5] == value[2]:
+        # The portal's day-first "18-10-2026 14:03:22"; fromisoformat is far
+        # cheaper than strptime over millions of rows.
+        value = f"{value[6:10]}-{value[3:5]}-{value[0:2]}{value[10:]}"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, "%Y%m%d%H%M%S")  # Daraja's TransactionDate
+    except ValueError:
+        return None
+
+
+def read_statement(lines):
+    """Yield (line number, receipt, completed_at, paid in, account, reversed
+    receipt) for each completed transaction in a statement CSV.
+
+    `lines` is an open text file or any iterable of lines. Withdrawals and
+    charges are skipped; a reversal has paid in 0 and the receipt it undoes.
+    Raises ValueError if no header row is found.
+    """
+    reader = csv.reader(lines)
+    for row in reader:
+        fields = [STATEMENT_COLUMNS.get(cell.strip().lower()) for cell in row]
+        if "receipt" in fields and "paid_in" in fields:
+            break
+        if reader.line_num >= HEADER_SEARCH_LINES:
+            raise ValueError("No statement header (Receipt No., Paid In, ...) found")
+    else:
+        raise ValueError("No statement header (Receipt No., Paid In, ...) found")
+
+    index = {}
+    for i, field in enumerate(fields):
+        if field and field not in index:
+            index[field] = i
+    get = {field: (lambda row, i=i: row[i] if i < len(row) else "") for field, i in index.items()}
+
+    def missing(row):
+        return ""
+
+    receipt, paid_in = get["receipt"], get["paid_in"]
+    completed_at = get.get("completed_at", missing)
+    status = get.get("status", missing)
+    account, reason, linked = get.get("account", missing), get.get("reason", missing), get.get("linked", missing)
+
+    for row in reader:
+        if not row or not receipt(row).strip():
+            continue
+        if status(row).strip().lower() not in ("", "completed"):
+            continue
+        amount = _amount(paid_in(row))
+        if amount > 0:
+            yield (reader.line_num, receipt(row).strip(), _timestamp(completed_at(row)), amount,
+                   account(row).strip(), None)
+        elif linked(row).strip() and "revers" in reason(row).lower():
+            yield (reader.line_num, receipt(row).strip(), _timestamp(completed_at(row)), 0.0,
+                   account(row).strip(), linked(row).strip())
+
+
+# ------------------ Matching ------------------
+
+class Reconciliation:
+    """One run over one statement. `report` is an open text file for the
+    issue CSV, or None to only count issues."""
+
+    def __init__(self, report=None, chunk_size=CHUNK_SIZE, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.writer = csv.writer(report) if report is not None else None
+        if self.writer:
+            self.writer.writerow(REPORT_COLUMNS)
+        self.started_at = datetime.now()
+        self.rows = 0
+        self.matched = 0
+        self.recovered = 0
+        self.issues = {}
+        self.first_at = None
+        self.last_at = None
+        self.seconds = 0.0
+
+    def issue(self, kind, line="", receipt="", amount="", account="", order=None, detail=""):
+        self.issues[kind] = self.issues.get(kind, 0) + 1
+        if self.writer:
+            self.writer.writerow((kind, line, receipt, amount, account,
+                                  order.order_id if order else "", order.status if order else "", detail))
+
+    def run(self, lines):
+        """Reconcile every row of the statement in `lines`. Returns summary()."""
+        clock = time.perf_counter()
+        chunk = []
+        for row in read_statement(lines):
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._chunk(chunk)
+                chunk = []
+        if chunk:
+            self._chunk(chunk)
+        if not self.dry_run and self.first_at is not None:
+            self._unsettled()
+        self.seconds = time.perf_counter() - clock
+        return self.summary()
+
+    def summary(self):
+        return {
+            "rows": self.rows,
+            "matched": self.matched,
+            "recovered": self.recovered,
+            "issues": dict(sorted(self.issues.items())),
+            "seconds": round(self.seconds, 2),
+            "rows_per_second": round(self.rows / self.seconds) if self.seconds else None,
+            "dry_run": self.dry_run,
+        }
+
+    def _chunk(self, rows):
+        self.rows += len(rows)
+        for row in rows:
+            completed_at = row[2]
+            if completed_at is not None:
+                if self.first_at is None or completed_at < self.first_at:
+                    self.first_at = completed_at
+                if self.last_at is None or completed_at > self.last_at:
+                    self.last_at = completed_at
+
+        # The hash join: two IN queries for the whole chunk.
+        receipts = {row[1] for row in rows} | {row[5] for row in rows if row[5]}
+        by_receipt = {o.mpesa_receipt: o for o in db.session.execute(
+            select(*_ORDER_COLUMNS).where(Order.mpesa_receipt.in_(receipts)))}
+        references = {order_from_reference(row[4]) for row in rows} - {None}
+        by_id = {o.id: o for o in db.session.execute(
+            select(*_ORDER_COLUMNS).where(Order.id.in_(references)))} if references else {}
+
+        reconciled = set()
+        recover = {}
+        seen = set()
+        for line, receipt, _, amount, account, reversed_receipt in rows:
+            if reversed_receipt:
+                order = by_receipt.get(reversed_receipt)
+                self.issue("reversed", line, receipt, "", account, order, f"reverses {reversed_receipt}")
+                continue
+            if receipt in seen:
+                self.issue("duplicate_row", line, receipt, amount, account)
+                continue
+            seen.add(receipt)
+
+            order = by_receipt.get(receipt)
+            if order is not None:
+                # Settled by a callback (or an earlier run) already.
+                self.matched += 1
+                reconciled.add(order.id)
+                if abs(amount - order.total_amount) > 0.005:
+                    self.issue("amount_mismatch", line, receipt, amount, account, order,
+                               f"order total {order.total_amount:.2f}")
+                continue
+
+            order = by_id.get(order_from_reference(account))
+            if order is None:
+                self.issue("unmatched_payment", line, receipt, amount, account)
+            elif order.id in recover or order.status == "paid":
+                self.issue("duplicate_payment", line, receipt, amount, account, order,
+                           f"already paid with {recover.get(order.id) or order.mpesa_receipt}")
+            elif order.status != "pending":
+                self.issue("paid_after_expiry", line, receipt, amount, account, order)
+            elif amount + 0.005 < order.total_amount:
+                self.issue("underpaid", line, receipt, amount, account, order,
+                           f"order total {order.total_amount:.2f}")
+            else:
+                self.matched += 1
+                recover[order.id] = receipt
+
+        if self.dry_run:
+            self.recovered += len(recover)
+            db.session.rollback()
+            return
+        if recover:
+            reconciled |= self._recover(recover, by_id)
+        if reconciled:
+            db.session.execute(
+                update(Order).where(Order.id.in_(reconciled)).values(reconciled_at=self.started_at)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+    def _recover(self, recover, orders):
+        """Settle pending orders {id: receipt} the statement shows as paid.
+        Returns the ids that were."""
+        paid = set()
+        ids = list(recover)
+        for start in range(0, len(ids), RECOVER_BATCH_SIZE):
+            batch = {order_id: recover[order_id] for order_id in ids[start:start + RECOVER_BATCH_SIZE]}
+            try:
+                with db.session.begin_nested():
+                    done = set(db.session.scalars(
+                        update(Order)
+                        .where(Order.id.in_(batch), Order.status == "pending")
+                        .values(status="paid", mpesa_receipt=case(batch, value=Order.id),
+                                expires_at=None, payment_status="paid", payment_error=None)
+                        .returning(Order.id)
+                        .execution_options(synchronize_session=False)
+                    ))
+            except IntegrityError:
+                # A callback stored one of these receipts since the chunk was
+                # read; fall back to one order at a time.
+                done, taken = set(), set()
+                for order_id, receipt in batch.items():
+                    try:
+                        with db.session.begin_nested():
+                            if mark_paid(orders[order_id], receipt):
+                                done.add(order_id)
+                    except IntegrityError:
+                        taken.add(order_id)
+                        self.issue("duplicate_payment", receipt=receipt, order=orders[order_id],
+                                   detail="receipt already on another order")
+                done_or_taken = done | taken
+            else:
+                done_or_taken = done
+            for order_id in batch.keys() - done_or_taken:
+                self.issue("changed_during_run", receipt=batch[order_id], order=orders[order_id],
+                           detail="order was no longer pending")
+            paid |= done
+
+        record_paid([orders[order_id] for order_id in paid])
+        self.recovered += len(paid)
+        return paid
+
+    def _unsettled(self):
+        """Report paid orders the statement should contain but did not."""
+        until = self.last_at - timedelta(seconds=UNSETTLED_GRACE)
+        rows = db.session.execute(
+            select(*_ORDER_COLUMNS)
+            .where(
+                Order.status == "paid",
+                Order.payment_requested_at >= self.first_at,
+                Order.payment_requested_at < until,
+                or_(Order.reconciled_at.is_(None), Order.reconciled_at < self.started_at),
+            )
+            .order_by(Order.id)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        for order in rows:
+            self.issue("not_in_statement", receipt=order.mpesa_receipt or "",
+                       amount=order.total_amount, order=order)
+        db.session.rollback()
+
+
+def reconcile_statement(lines, report=None, chunk_size=CHUNK_SIZE, dry_run=False):
+    """Reconcile orders against the statement CSV in `lines`. Returns a summary dict."""
+    return Reconciliation(report, chunk_size, dry_run).run(lines)
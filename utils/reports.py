@@ -0,0 +1,347 @@
+# utils/reports.py
+#
+# The orders report behind GET /admin/reports, and report jobs that build it
+# off the request path. A job is a Report row: POST /admin/reports/jobs stores
+# the filters with status "queued", a worker thread from the pool claims it,
+# streams the rows through the CSV/NDJSON encoders in yield_per batches and
+# keeps only the zlib-compressed output in Report.report_data. Clients poll
+# the job and download the stored result.
+#
+# A worker claims a job by moving it to "running" with claimed_at set, and
+# refreshes claimed_at between pages of orders while it builds. Jobs survive
+# restarts as "queued" rows, and a job whose worker died stays "running"
+# until CLAIM_TIMEOUT passes without a refresh, after which it can be claimed
+# again. Every write after the claim is conditional on claimed_at, so a
+# worker that lost its job to another one gives up instead of overwriting it.
+# The report poller started by `flask run-workers` (utils/workers.py) picks
+# both up; `flask run-reports` runs them inline (also the way to run jobs
+# with REPORT_WORKERS=0).
+
+import base64
+import json
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from sqlalchemy import and_, or_, select, update
+from models import db, User, Event, Ticket, Order, OrderItem, Report
+from utils.export import ENCODERS, stream_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+REUSE_SECONDS = 300
+CLAIM_TIMEOUT = 1800  # seconds since a running job's last heartbeat before another worker retries it
+REPORT_PAGE_SIZE = 5000  # orders per query in a job; claimed_at is refreshed between pages
+COMPRESSION_LEVEL = 6
+READ_CHUNK = 64 * 1024
+
+ORDERS_REPORT = "orders"
+REPORT_FILTERS = ("start_date", "end_date", "event_name")
+
+
+# ------------------ Orders report ------------------
+
+REPORT_COLUMNS = ("order_id", "amount", "status", "events", "attendee", "date")
+
+
+def report_orders(start_date=None, end_date=None, event_name=None):
+    """select(Order.id, Order.created_at) narrowed by the report filters.
+
+    Raises ValueError for dates that are not ISO formatted.
+    """
+    orders = select(Order.id, Order.created_at)
+    try:
+        if start_date:
+            orders = orders.where(Order.created_at >= datetime.fromisoformat(start_date))
+        if end_date:
+            orders = orders.where(Order.created_at <= datetime.fromisoformat(end_date))
+    except ValueError:
+        raise ValueError("start_date/end_date must be ISO dates")
+    if event_name:
+        orders = orders.where(
+            select(OrderItem.id)
+            .join(OrderItem.ticket).join(Ticket.event)
+            .where(OrderItem.order_id == Order.id, Event.title.ilike(f"%{event_name}%"))
+            .exists()
+        )
+    return orders
+
+
+def report_rows(query):
+    """Fold (order, line item) rows, sorted by order, into one row per order.
+
+    Yields (orders.id, *REPORT_COLUMNS values).
+    """
+    for _, items in groupby(query, key=lambda r: r.id):
+        items = list(items)
+        first = items[0]
+        titles = []
+        for item in items:
+            if item.title is not None and item.title not in titles:
+                titles.append(item.title)
+        attendee = f"{first.first_name} {first.last_name}" if first.first_name is not None else None
+        yield (first.id, first.order_id, first.total_amount, first.status, titles, attendee, first.created_at)
+
+
+def report_query(orders):
+    """Line-item rows for the orders selected by `orders` (a subquery with id
+    and created_at), in report order."""
+    return db.session.query(
+        Order.id, Order.order_id, Order.total_amount, Order.status, Order.created_at,
+        Event.title, User.first_name, User.last_name
+    ).select_from(orders)\
+        .join(Order, Order.id == orders.c.id)\
+        .outerjoin(Order.attendee)\
+        .outerjoin(Order.order_items).outerjoin(OrderItem.ticket).outerjoin(Ticket.event)\
+        .order_by(orders.c.created_at, orders.c.id, OrderItem.id)
+
+
+def export_rows(orders):
+    """Every order in `orders`, as REPORT_COLUMNS tuples, read in batches."""
+    return (row[1:] for row in report_rows(stream_query(report_query(orders.subquery()))))
+
+
+def export_pages(orders, between_pages, page_size=REPORT_PAGE_SIZE):
+    """export_rows() one keyset page of `orders` at a time, calling
+    between_pages() after each full page. Every page is its own query, so
+    between_pages() may commit."""
+    after = None
+    while True:
+        page = orders
+        if after:
+            page = page.where(
+                Order.created_at >= after[0],
+                or_(Order.created_at > after[0], Order.id > after[1])
+            )
+        count = 0
+        page = page.order_by(Order.created_at, Order.id).limit(page_size).subquery()
+        for row in report_rows(report_query(page).all()):
+            count += 1
+            after = (row[-1], row[0])
+            yield row[1:]
+        if count < page_size:
+            return
+        between_pages()
+
+
+# ------------------ Stored output ------------------
+
+def compress_report(rows, header, fmt):
+    """Encode `rows` and compress the output chunk by chunk.
+
+    Returns (report_data text, row count). Only the compressed bytes are kept
+    in memory.
+    """
+    compressor = zlib.compressobj(COMPRESSION_LEVEL)
+    parts = []
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    for chunk in ENCODERS[fmt](counted(), header):
+        parts.append(compressor.compress(chunk.encode("utf-8")))
+    parts.append(compressor.flush())
+    return base64.b64encode(b"".join(parts)).decode("ascii"), count
+
+
+def compressed_output(report):
+    """The stored zlib stream, e.g. to send as Content-Encoding: deflate."""
+    return base64.b64decode(report.report_data)
+
+
+def report_output(report):
+    """Yield the decompressed output of a finished job in pieces."""
+    raw = compressed_output(report)
+    decompressor = zlib.decompressobj()
+    for start in range(0, len(raw), READ_CHUNK):
+        yield decompressor.decompress(raw[start:start + READ_CHUNK])
+    yield decompressor.flush()
+
+
+# ------------------ Jobs ------------------
+
+def job_params(args):
+    """The report filters present in `args`, validated. Raises ValueError."""
+    params = {name: args[name] for name in REPORT_FILTERS if args.get(name)}
+    report_orders(**params)
+    return params
+
+
+def _stale(now):
+    """Running jobs whose worker has had CLAIM_TIMEOUT to finish (or never recorded a claim)."""
+    return and_(
+        Report.status == "running",
+        or_(Report.claimed_at.is_(None), Report.claimed_at < now - timedelta(seconds=CLAIM_TIMEOUT)),
+    )
+
+
+def _claimable(now):
+    return or_(Report.status == "queued", _stale(now))
+
+
+def find_report_job(kind, params, fmt, now=None):
+    """A job that already covers this request: one still queued or running,
+    or one finished in the last REUSE_SECONDS. A job stuck running past
+    CLAIM_TIMEOUT does not count."""
+    now = now or datetime.now()
+    return Report.query.filter(
+        Report.kind == kind,
+        Report.params == json.dumps(params, sort_keys=True),
+        Report.format == fmt,
+        Report.status != "failed",
+        ~_stale(now),
+        Report.generated_at >= now - timedelta(seconds=REUSE_SECONDS),
+    ).order_by(Report.generated_at.desc()).first()
+
+
+def create_report_job(admin_id, kind, params, fmt):
+    report = Report(
+        kind=kind,
+        params=json.dumps(params, sort_keys=True),
+        format=fmt,
+        status="queued",
+        admin_id=admin_id,
+    )
+    db.session.add(report)
+    return report
+
+
+class ClaimLost(Exception):
+    pass
+
+
+def build_report(report, between_pages):
+    params = json.loads(report.params or "{}")
+    if report.kind == ORDERS_REPORT:
+        rows = export_pages(report_orders(**params), between_pages)
+        return compress_report(rows, REPORT_COLUMNS, report.format)
+    raise ValueError(f"Unknown report kind {report.kind!r}")
+
+
+def _refresh_claim(report_id, claim, values):
+    """UPDATE the job only while `claim` (its claimed_at) is still ours.
+    Returns whether it was."""
+    return db.session.execute(
+        update(Report)
+        .where(Report.id == report_id, Report.status == "running", Report.claimed_at == claim)
+        .values(**values)
+    ).rowcount == 1
+
+
+def run_report(report_id, now=None):
+    """Claim a queued (or stale running) job and build it. Returns False if
+    another worker has it, or took it over while this one was building."""
+    claim = now or datetime.now()
+    claimed = db.session.execute(
+        update(Report)
+        .where(Report.id == report_id, _claimable(claim))
+        .values(status="running", claimed_at=claim)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return False
+
+    def heartbeat():
+        # Between pages, so a job that outlives CLAIM_TIMEOUT is not taken as stale.
+        nonlocal claim
+        beat = datetime.now()
+        if not _refresh_claim(report_id, claim, {"claimed_at": beat}):
+            db.session.rollback()
+            raise ClaimLost()
+        db.session.commit()
+        claim = beat
+
+    report = db.session.get(Report, report_id)
+    try:
+        report_data, row_count = build_report(report, heartbeat)
+        values = {"report_data": report_data, "row_count": row_count, "status": "done"}
+    except ClaimLost:
+        logger.warning("Report job %s was claimed by another worker", report_id)
+        return False
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Report job %s failed", report_id)
+        values = {"status": "failed", "error": str(e)[:500]}
+    values["completed_at"] = datetime.now()
+    if not _refresh_claim(report_id, claim, values):
+        db.session.rollback()
+        logger.warning("Report job %s was claimed by another worker", report_id)
+        return False
+    db.session.commit()
+    return True
+
+
+def run_queued_reports(now=None):
+    """Run every queued job, and every job stuck running past CLAIM_TIMEOUT,
+    in this process, oldest first. Returns the count."""
+    ids = db.session.scalars(
+        select(Report.id).where(_claimable(now or datetime.now())).order_by(Report.generated_at, Report.id)
+    ).all()
+    return sum(run_report(report_id) for report_id in ids)
+
+
+def start_report_poller(app, interval):
+    """Run run_queued_reports() every `interval` seconds on a daemon thread,
+    so jobs left queued by a restart or stuck by a dead worker still run."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    ran = run_queued_reports()
+                    if ran:
+                        logger.info("Ran %s leftover report jobs", ran)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Report poll failed")
+
+    thread = threading.Thread(target=loop, name="report-poller", daemon=True)
+    thread.start()
+    return thread
+
+
+class ReportJobs:
+    """Thread pool running report jobs in the background.
+
+    The pool is created by the first submit(), so only a process that
+    serves job requests ever has one.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.workers = DEFAULT_WORKERS
+        self.executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get("REPORT_WORKERS", DEFAULT_WORKERS)
+
+    def submit(self, report_id):
+        # Call after the job row has committed, or the worker may not see it.
+        if self.workers <= 0:
+            return
+        with self._lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="report")
+        self.executor.submit(self._run, report_id)
+
+    def _run(self, report_id):
+        with self.app.app_context():
+            try:
+                run_report(report_id)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Report job %s crashed", report_id)
+
+
+report_jobs = ReportJobs()
@@ -0,0 +1,236 @@
+# utils/rollups.py
+#
+# Time-series sales for the organizer and admin charts. Each paid order adds
+# its orders/tickets/revenue to an hourly and a daily bucket per ticket type
+# (sales_rollups) and platform-wide (platform_sales_rollups). Every order in
+# an hour lands on the same platform bucket, so those rows are sharded like
+# platform_metrics. A chart reads one row per ticket type (or shard) per
+# bucket in its range instead of scanning orders.
+#
+# Revenue is the order's total_amount shared across its items (see
+# utils/event_stats.LINE_REVENUE). Orders are bucketed by created_at, so a
+# sale can be taken back out of the bucket it went into (sign=-1), and
+# rebuild_sales_rollups() can recompute every bucket from orders
+# (flask rebuild-rollups).
+
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Event, Ticket, Order, OrderItem, SalesRollup, PlatformSalesRollup
+from utils.event_stats import LINE_REVENUE
+
+GRANULARITIES = ("hour", "day")
+STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DEFAULT_BUCKETS = {"hour": 48, "day": 30}
+MAX_BUCKETS = {"hour": 24 * 31, "day": 366 * 3}
+ROLLUP_SHARDS = 16
+REBUILD_BATCH_SIZE = 5000
+
+
+def bucket_start(ts, granularity):
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if granularity == "day" else ts
+
+
+def _add(model, key, deltas, **insert_values):
+    stmt = update(model)\
+        .where(*(getattr(model, k) == v for k, v in key.items()))\
+        .values({k: getattr(model, k) + v for k, v in deltas.items()})\
+        .execution_options(synchronize_session=False)
+    if db.session.execute(stmt).rowcount:
+        return
+    # First sale in this bucket; a concurrent payment may create it first.
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(model).values(**key, **deltas, **insert_values))
+    except IntegrityError:
+        db.session.execute(stmt)
+
+
+def record_sale(order, sign=1):
+    """Add a newly paid order to its buckets; sign=-1 takes it out again."""
+    record_sales([order], sign)
+
+
+def record_sales(orders, sign=1):
+    """record_sale() for many orders, with one bump per bucket they share."""
+    placed = {order.id: order.created_at for order in orders}
+    lines = db.session.query(
+        OrderItem.order_id, OrderItem.ticket_id, Ticket.event_id,
+        func.sum(OrderItem.quantity), func.sum(LINE_REVENUE)
+    ).join(OrderItem.ticket).join(OrderItem.order)\
+        .filter(OrderItem.order_id.in_(placed))\
+        .group_by(OrderItem.order_id, OrderItem.ticket_id, Ticket.event_id).all()
+    if not lines:
+        return
+
+    by_ticket = {}
+    by_platform = {}
+    for granularity in GRANULARITIES:
+        counted = set()
+        for order_id, ticket_id, event_id, quantity, revenue in lines:
+            bucket = bucket_start(placed[order_id], granularity)
+            totals = by_ticket.setdefault((granularity, ticket_id, bucket), [event_id, 0, 0, 0])
+            totals[1] += 1
+            totals[2] += quantity
+            totals[3] += revenue
+            totals = by_platform.setdefault((granularity, bucket), [0, 0, 0])
+            if order_id not in counted:
+                counted.add(order_id)
+                totals[0] += 1
+            totals[1] += quantity
+            totals[2] += revenue
+
+    for (granularity, ticket_id, bucket), (event_id, count, quantity, revenue) in by_ticket.items():
+        _add(SalesRollup,
+             {"granularity": granularity, "ticket_id": ticket_id, "bucket": bucket},
+             {"orders": sign * count, "tickets": sign * quantity, "revenue": sign * revenue},
+             event_id=event_id)
+    shard = random.randrange(ROLLUP_SHARDS)
+    for (granularity, bucket), (count, quantity, revenue) in by_platform.items():
+        _add(PlatformSalesRollup,
+             {"granularity": granularity, "bucket": bucket, "shard": shard},
+             {"orders": sign * count, "tickets": sign * quantity, "revenue": sign * revenue})
+
+
+def remove_event_sales(event_id):
+    db.session.query(SalesRollup).filter(SalesRollup.event_id == event_id).delete(synchronize_session=False)
+
+
+def remove_ticket_sales(ticket_id):
+    db.session.query(SalesRollup).filter(SalesRollup.ticket_id == ticket_id).delete(synchronize_session=False)
+
+
+# ------------------ Reading ------------------
+
+def sales_window(args, now=None):
+    """(granularity, start, end) from ?granularity=hour|day&start=&end=.
+
+    start is rounded down to its bucket and end is exclusive. Raises
+    ValueError for bad input or a range over MAX_BUCKETS buckets.
+    """
+    granularity = args.get("granularity") or "day"
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    step = STEPS[granularity]
+    try:
+        end = datetime.fromisoformat(args["end"]) if args.get("end") else (now or datetime.now())
+        end = bucket_start(end, granularity) + step
+        if args.get("start"):
+            start = bucket_start(datetime.fromisoformat(args["start"]), granularity)
+        else:
+            start = end - DEFAULT_BUCKETS[granularity] * step
+    except ValueError:
+        raise ValueError("start/end must be ISO dates")
+    if start >= end:
+        raise ValueError("start must be before end")
+    if (end - start) / step > MAX_BUCKETS[granularity]:
+        raise ValueError(f"at most {MAX_BUCKETS[granularity]} {granularity} buckets per request")
+    return granularity, start, end
+
+
+def _series(rows, granularity, start, end):
+    # Buckets without sales have no row; charts get them as zeros.
+    found = {bucket: (orders, tickets, revenue) for bucket, orders, tickets, revenue in rows}
+    series = []
+    bucket = start
+    while bucket < end:
+        orders, tickets, revenue = found.get(bucket, (0, 0, 0))
+        series.append({"bucket": bucket.isoformat(), "orders": orders, "tickets": tickets, "revenue": revenue})
+        bucket += STEPS[granularity]
+    return series
+
+
+def ticket_sales_series(granularity, start, end, *filters):
+    """Buckets summed over the ticket rows matching `filters`.
+
+    An order that bought several ticket types counts once per type; orders
+    placed through POST /orders have one.
+    """
+    rows = db.session.query(
+        SalesRollup.bucket, func.sum(SalesRollup.orders), func.sum(SalesRollup.tickets), func.sum(SalesRollup.revenue)
+    ).filter(
+        SalesRollup.granularity == granularity,
+        SalesRollup.bucket >= start,
+        SalesRollup.bucket < end,
+        *filters
+    ).group_by(SalesRollup.bucket).all()
+    return _series(rows, granularity, start, end)
+
+
+def organizer_sales_series(organizer_id, granularity, start, end, event_id=None, ticket_id=None):
+    filters = [SalesRollup.event_id.in_(select(Event.id).where(Event.organizer_id == organizer_id))]
+    if event_id is not None:
+        filters.append(SalesRollup.event_id == event_id)
+    if ticket_id is not None:
+        filters.append(SalesRollup.ticket_id == ticket_id)
+    return ticket_sales_series(granularity, start, end, *filters)
+
+
+def platform_sales_series(granularity, start, end):
+    rows = db.session.query(
+        PlatformSalesRollup.bucket, func.sum(PlatformSalesRollup.orders),
+        func.sum(PlatformSalesRollup.tickets), func.sum(PlatformSalesRollup.revenue)
+    ).filter(
+        PlatformSalesRollup.granularity == granularity,
+        PlatformSalesRollup.bucket >= start,
+        PlatformSalesRollup.bucket < end
+    ).group_by(PlatformSalesRollup.bucket).all()
+    return _series(rows, granularity, start, end)
+
+
+# ------------------ Reconciliation ------------------
+
+def rebuild_sales_rollups():
+    """Recompute every bucket from paid orders. Returns the number of orders.
+
+    Platform totals go to shard 0. Memory grows with the number of buckets,
+    not orders.
+    """
+    db.session.query(SalesRollup).delete(synchronize_session=False)
+    db.session.query(PlatformSalesRollup).delete(synchronize_session=False)
+
+    lines = db.session.query(
+        Order.id, Order.created_at, OrderItem.ticket_id, Ticket.event_id,
+        func.sum(OrderItem.quantity), func.sum(LINE_REVENUE)
+    ).join(Order.order_items).join(OrderItem.ticket)\
+        .filter(Order.status == "paid")\
+        .group_by(Order.id, Order.created_at, OrderItem.ticket_id, Ticket.event_id)\
+        .order_by(Order.id)\
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+
+    tickets = defaultdict(lambda: [0, 0, 0])
+    platform = defaultdict(lambda: [0, 0, 0])
+    event_of = {}
+    orders = 0
+    last_order = None
+    for order_id, created_at, ticket_id, event_id, quantity, revenue in lines:
+        new_order = order_id != last_order
+        orders += new_order
+        last_order = order_id
+        event_of[ticket_id] = event_id
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(created_at, granularity)
+            for totals in (tickets[granularity, ticket_id, bucket], platform[granularity, bucket]):
+                totals[1] += quantity
+                totals[2] += revenue
+            tickets[granularity, ticket_id, bucket][0] += 1
+            platform[granularity, bucket][0] += new_order
+
+    rows = [
+        {"granularity": g, "ticket_id": t, "event_id": event_of[t], "bucket": b,
+         "orders": o, "tickets": q, "revenue": r}
+        for (g, t, b), (o, q, r) in tickets.items()
+    ]
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.session.execute(insert(SalesRollup), rows[start:start + REBUILD_BATCH_SIZE])
+    rows = [
+        {"granularity": g, "bucket": b, "shard": 0, "orders": o, "tickets": q, "revenue": r}
+        for (g, b), (o, q, r) in platform.items()
+    ]
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.session.execute(insert(PlatformSalesRollup), rows[start:start + REBUILD_BATCH_SIZE])
+    return orders
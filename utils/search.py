@@ -0,0 +1,203 @@
+# utils/search.py
+#
+# Full-text index over approved events. SQLite uses an FTS5 virtual table
+# (events_fts, rowid = events.id); Postgres uses an event_search table holding
+# a weighted tsvector with a GIN index. Both are kept in step by calling
+# index_event()/remove_event() in the same transaction as the event write.
+
+import re
+from collections import Counter
+
+from sqlalchemy import text
+from models import db, Event
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_TOKENS = 8
+
+
+def _dialect(bind=None):
+    return (bind or db.session.get_bind()).dialect.name
+
+
+def query_tokens(q):
+    return [t.lower() for t in TOKEN_RE.findall(q or "")][:MAX_QUERY_TOKENS]
+
+
+# ------------------ Schema ------------------
+
+def ensure_search_index(bind):
+    """Create the search structures if missing. Used by migrations and scripts."""
+    if _dialect(bind) == "postgresql":
+        bind.execute(text(
+            "CREATE TABLE IF NOT EXISTS event_search ("
+            " event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,"
+            " document TSVECTOR NOT NULL)"
+        ))
+        bind.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_event_search_document ON event_search USING GIN (document)"
+        ))
+    else:
+        bind.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5("
+            "title, description, tags, location, tokenize='porter unicode61')"
+        ))
+
+
+def drop_search_index(bind):
+    if _dialect(bind) == "postgresql":
+        bind.execute(text("DROP TABLE IF EXISTS event_search"))
+    else:
+        bind.execute(text("DROP TABLE IF EXISTS events_fts"))
+
+
+# ------------------ Writes ------------------
+
+_PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(:title, '')), 'A') || "
+    "setweight(to_tsvector('english', replace(coalesce(:tags, ''), ',', ' ')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(:location, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(:description, '')), 'D')"
+)
+
+
+def remove_event(event_id):
+    if _dialect() == "postgresql":
+        db.session.execute(text("DELETE FROM event_search WHERE event_id = :id"), {"id": event_id})
+    else:
+        db.session.execute(text("DELETE FROM events_fts WHERE rowid = :id"), {"id": event_id})
+
+
+def index_event(event):
+    """(Re)index one event. Unapproved events are removed from the index."""
+    remove_event(event.id)
+    if not event.is_approved:
+        return
+
+    params = {
+        "id": event.id,
+        "title": event.title,
+        "description": event.description,
+        "tags": event.tags,
+        "location": event.location,
+    }
+    if _dialect() == "postgresql":
+        db.session.execute(text(
+            f"INSERT INTO event_search (event_id, document) VALUES (:id, {_PG_DOCUMENT})"
+        ), params)
+    else:
+        db.session.execute(text(
+            "INSERT INTO events_fts (rowid, title, description, tags, location) "
+            "VALUES (:id, :title, :description, replace(coalesce(:tags, ''), ',', ' '), :location)"
+        ), params)
+
+
+def rebuild_search_index():
+    """Reindex every approved event from scratch in set-based statements."""
+    if _dialect() == "postgresql":
+        db.session.execute(text("DELETE FROM event_search"))
+        db.session.execute(text(
+            "INSERT INTO event_search (event_id, document) SELECT id, "
+            + _PG_DOCUMENT.replace(":title", "title").replace(":tags", "tags")
+                          .replace(":location", "location").replace(":description", "description")
+            + " FROM events WHERE is_approved"
+        ))
+    else:
+        db.session.execute(text("DELETE FROM events_fts"))
+        db.session.execute(text(
+            "INSERT INTO events_fts (rowid, title, description, tags, location) "
+            "SELECT id, title, description, replace(coalesce(tags, ''), ',', ' '), location "
+            "FROM events WHERE is_approved = 1"
+        ))
+
+
+# ------------------ Reads ------------------
+
+# The page is ranked over every match in SQL. Facets are counted over the
+# SEARCH_WINDOW newest matching events, and totals stop counting at
+# TOTAL_CAP, so broad queries ("music") do not pay for counting every match.
+SEARCH_WINDOW = 1000
+TOTAL_CAP = 10000
+
+
+def _matches(tokens, category=None, tag=None):
+    """Return (FROM ... WHERE SQL over matching events, id column, score expression, params)."""
+    params = {}
+    if _dialect() == "postgresql":
+        params["q"] = " & ".join(f"{t}:*" for t in tokens)
+        sql = (
+            "FROM event_search s JOIN events e ON e.id = s.event_id, to_tsquery('english', :q) query "
+            "WHERE s.document @@ query"
+        )
+        id_column, score = "s.event_id", "ts_rank_cd(s.document, query)"
+    else:
+        params["q"] = " ".join(f'"{t}"*' for t in tokens)
+        sql = "FROM events_fts"
+        if category or tag:
+            sql += " JOIN events e ON e.id = events_fts.rowid"
+        sql += " WHERE events_fts MATCH :q"
+        # bm25 weights follow the Postgres setweight order: title, description, tags, location
+        id_column, score = "events_fts.rowid", "-bm25(events_fts, 10.0, 1.0, 5.0, 2.0)"
+
+    if category:
+        sql += " AND lower(e.category) = :category"
+        params["category"] = category.lower()
+    if tag:
+        sql += " AND (',' || replace(lower(e.tags), ' ', '') || ',') LIKE :tag"
+        params["tag"] = f"%,{tag.lower().replace(' ', '')},%"
+    return sql, id_column, score, params
+
+
+def search_events(q, category=None, tag=None, limit=20, offset=0):
+    """Ranked page of matching events plus category/tag facet counts.
+
+    Returns (events, total, facets, facets_truncated) or None when the query
+    has no tokens. total is capped at TOTAL_CAP; facets cover the
+    SEARCH_WINDOW newest matches, and facets_truncated says whether that left
+    any out.
+    """
+    tokens = query_tokens(q)
+    if not tokens:
+        return None
+    matches, id_column, score, params = _matches(tokens, category, tag)
+
+    # The database ranks every match and returns just the page, so the best
+    # match is found however many events mention the words.
+    page = db.session.execute(text(
+        f"SELECT {id_column} AS id, {score} AS score {matches} "
+        f"ORDER BY score DESC, {id_column} DESC LIMIT :limit OFFSET :offset"
+    ), {**params, "limit": limit, "offset": offset}).all()
+    scores = {hit.id: hit.score for hit in page}
+
+    window = db.session.scalars(text(
+        f"SELECT {id_column} {matches} ORDER BY {id_column} DESC LIMIT :window"
+    ), {**params, "window": SEARCH_WINDOW}).all()
+    if len(window) < SEARCH_WINDOW:
+        total = len(window)
+    else:
+        total = db.session.execute(text(
+            f"SELECT count(*) FROM (SELECT 1 {matches} LIMIT :cap) h"
+        ), {**params, "cap": TOTAL_CAP}).scalar()
+
+    page_ids = [hit.id for hit in page]
+    by_id = {
+        e.id: e for e in db.session.query(
+            Event.id, Event.title, Event.location, Event.start_time, Event.end_time,
+            Event.category, Event.tags, Event.image_url
+        ).filter(Event.id.in_(page_ids))
+    }
+    events = [{**by_id[i]._asdict(), "score": scores[i]} for i in page_ids if i in by_id]
+
+    categories, tags = Counter(), Counter()
+    for event_category, event_tags in db.session.query(Event.category, Event.tags)\
+            .filter(Event.id.in_(window)):
+        if event_category:
+            categories[event_category] += 1
+        for t in {t.strip().lower() for t in (event_tags or "").split(",")}:
+            if t:
+                tags[t] += 1
+
+    facets = {
+        "category": [{"value": v, "count": n} for v, n in categories.most_common(20)],
+        "tags": [{"value": v, "count": n} for v, n in tags.most_common(20)],
+    }
+    return events, total, facets, total > len(window)
@@ -0,0 +1,212 @@
+# utils/serializers.py
+#
+# Compiled serializers for the hot endpoints. SerializerMixin.to_dict parses
+# its only=(...) rules and type-checks every value on each call. A Serializer
+# takes the same dotted field list once, resolves it against the model's
+# columns and relationships, and generates a plain Python function that
+# builds the dict with attribute reads only. The output matches
+# to_dict(only=fields).
+#
+#   REVIEW = Serializer(Review, ("id", "rating", "attendee.id", "attendee.first_name"))
+#   REVIEW(review)            -> dict
+#   REVIEW.many(reviews)      -> list of dicts
+#   REVIEW.rows(REVIEW.query().filter(...))   # column-projected, no ORM objects
+#   Review.query.options(*REVIEW.options)      # eager-load what REVIEW reads
+
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import count
+
+from sqlalchemy import Date, DateTime, Numeric, inspect
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from models import db
+
+_names = count()
+
+
+def _tree(fields):
+    """("id", "attendee.id") -> {"id": None, "attendee": {"id": None}}"""
+    tree = {}
+    for field in fields:
+        node = tree
+        *path, leaf = field.split(".")
+        for part in path:
+            node = node.setdefault(part, {})
+            if node is None:
+                raise ValueError(f"{field}: parent is already a plain field")
+        node.setdefault(leaf, None)
+    return tree
+
+
+def _converter(model, column, namespace):
+    """Name of a helper in `namespace` that formats values of `column`, or None."""
+    if isinstance(column.type, DateTime):
+        fmt = model.datetime_format
+    elif isinstance(column.type, Date):
+        fmt = model.date_format
+    elif isinstance(column.type, Numeric) and column.type.asdecimal:
+        name = f"_decimal_{next(_names)}"
+        decimal_format = model.decimal_format
+        namespace[name] = lambda v: None if v is None else decimal_format.format(v)
+        return name
+    else:
+        return None
+    name = f"_time_{next(_names)}"
+    namespace[name] = lambda v: None if v is None else v.strftime(fmt)
+    return name
+
+
+def _any_value(model):
+    # Attributes that are not columns (properties and the like) get the same
+    # type dispatch to_dict applies.
+    def convert(v):
+        if isinstance(v, datetime):
+            return v.strftime(model.datetime_format)
+        if isinstance(v, date):
+            return v.strftime(model.date_format)
+        if isinstance(v, Decimal):
+            return model.decimal_format.format(v)
+        return v
+    return convert
+
+
+# ------------------ Object serializers ------------------
+
+def _compile_object(model, tree, namespace):
+    mapper = inspect(model)
+    items = []
+    for field, sub in tree.items():
+        if field in mapper.relationships:
+            if sub is None:
+                raise ValueError(f"{model.__name__}.{field}: list the relationship's fields, e.g. '{field}.id'")
+            rel = mapper.relationships[field]
+            child = _compile_object(rel.mapper.class_, sub, namespace)
+            if rel.uselist:
+                items.append(f"{field!r}: [{child}(x) for x in obj.{field}]")
+            else:
+                items.append(f"{field!r}: {child}(obj.{field})")
+        elif sub is not None:
+            raise ValueError(f"{model.__name__}.{field} is not a relationship")
+        elif field in mapper.columns:
+            convert = _converter(model, mapper.columns[field], namespace)
+            items.append(f"{field!r}: {convert}(obj.{field})" if convert else f"{field!r}: obj.{field}")
+        elif hasattr(model, field):
+            name = f"_any_{next(_names)}"
+            namespace[name] = _any_value(model)
+            items.append(f"{field!r}: {name}(obj.{field})")
+        else:
+            raise ValueError(f"{model.__name__} has no field {field!r}")
+
+    name = f"_{model.__name__.lower()}_{next(_names)}"
+    source = (
+        f"def {name}(obj):\n"
+        f"    if obj is None:\n"
+        f"        return None\n"
+        f"    return {{{', '.join(items)}}}\n"
+    )
+    exec(compile(source, f"<serializer {model.__name__}>", "exec"), namespace)
+    return name
+
+
+# ------------------ Eager loading ------------------
+
+def _loader_options(model, tree, parent=None):
+    """Loader chains covering every relationship in `tree`.
+
+    Collections use selectinload (one extra IN query per level, no row
+    fan-out); to-one relationships are joined into the query that loads
+    their parent.
+    """
+    mapper = inspect(model)
+    options = []
+    for field, sub in tree.items():
+        if sub is None or field not in mapper.relationships:
+            continue
+        rel = mapper.relationships[field]
+        attr = getattr(model, field)
+        if parent is None:
+            loader = selectinload(attr) if rel.uselist else joinedload(attr)
+        else:
+            loader = parent.selectinload(attr) if rel.uselist else parent.joinedload(attr)
+        options += _loader_options(rel.mapper.class_, sub, loader) or [loader]
+    return options
+
+
+# ------------------ Row serializers ------------------
+
+def _compile_rows(model, entity, tree, namespace, columns, joins):
+    """Append the columns a row needs and return the dict expression over `row`."""
+    mapper = inspect(model)
+    items = []
+    for field, sub in tree.items():
+        if field in mapper.relationships:
+            rel = mapper.relationships[field]
+            if rel.uselist or sub is None:
+                raise ValueError(f"{model.__name__}.{field}: rows support to-one relationships with listed fields")
+            child_model = rel.mapper.class_
+            child = aliased(child_model)
+            joins.append(getattr(entity, field).of_type(child))
+            # An outer join with no match reads as None, like a missing relationship.
+            pk = inspect(child_model).primary_key[0].key
+            columns.append(getattr(child, pk))
+            pk_index = len(columns) - 1
+            expr = _compile_rows(child_model, child, sub, namespace, columns, joins)
+            items.append(f"{field!r}: (None if row[{pk_index}] is None else {expr})")
+        elif sub is None and field in mapper.columns:
+            columns.append(getattr(entity, field))
+            convert = _converter(model, mapper.columns[field], namespace)
+            index = len(columns) - 1
+            items.append(f"{field!r}: {convert}(row[{index}])" if convert else f"{field!r}: row[{index}]")
+        else:
+            raise ValueError(f"{model.__name__}.{field} is not a column")
+    return f"{{{', '.join(items)}}}"
+
+
+class Serializer:
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple(fields)
+        tree = _tree(self.fields)
+
+        namespace = {}
+        self._object = namespace[_compile_object(model, tree, namespace)]
+        # Pass to Query.options() so serializing the results issues no lazy loads.
+        self.options = tuple(_loader_options(model, tree))
+
+        # Row mode is optional: schemas with to-many relationships only
+        # serialize objects.
+        self._columns, self._joins, self._row = [], [], None
+        try:
+            expr = _compile_rows(model, model, tree, namespace, self._columns, self._joins)
+        except ValueError:
+            self._columns, self._joins = [], []
+        else:
+            exec(compile(f"def _row(row):\n    return {expr}\n", f"<row serializer {model.__name__}>", "exec"), namespace)
+            self._row = namespace["_row"]
+
+    def __call__(self, obj):
+        return self._object(obj)
+
+    def many(self, objs):
+        serialize = self._object
+        return [serialize(o) for o in objs]
+
+    def query(self, *extra):
+        """Column-projected query over exactly what the schema needs.
+
+        `extra` columns are appended after the schema's own, so callers can
+        read them by label (e.g. a keyset cursor) without affecting output.
+        """
+        if self._row is None:
+            raise ValueError(f"{self.model.__name__} schema cannot be read from rows")
+        query = db.session.query(*self._columns, *extra)
+        for join in self._joins:
+            query = query.outerjoin(join)
+        return query
+
+    def row(self, row):
+        return self._row(row)
+
+    def rows(self, rows):
+        serialize = self._row
+        return [serialize(r) for r in rows]
@@ -0,0 +1,38 @@
+# utils/workers.py
+#
+# The background loops that poll the database. Nothing here starts at import,
+# so `flask db upgrade`, seed.py and the other CLI commands never race them
+# for the database (on SQLite, for the write lock). Run them in a process of
+# their own with `flask run-workers`, or set BACKGROUND_WORKERS=1 to start
+# them inside each web process when it serves its first request.
+
+import threading
+
+from utils.holds import start_hold_sweeper
+from utils.payments import payment_workers
+from utils.reports import start_report_poller
+
+DEFAULT_SWEEP_INTERVAL = 30  # seconds
+DEFAULT_REPORT_POLL_INTERVAL = 60  # seconds
+
+_started = False
+_lock = threading.Lock()
+
+
+def start_workers(app):
+    """Start the background loops once per process. Returns the threads started."""
+    global _started
+    with _lock:
+        if _started:
+            return []
+        _started = True
+
+    threads = []
+    interval = app.config.get("HOLD_SWEEP_INTERVAL", DEFAULT_SWEEP_INTERVAL)
+    if interval > 0:
+        threads.append(start_hold_sweeper(app, interval))
+    threads += payment_workers.start()
+    interval = app.config.get("REPORT_POLL_INTERVAL", DEFAULT_REPORT_POLL_INTERVAL)
+    if interval > 0:
+        threads.append(start_report_poller(app, interval))
+    return threads